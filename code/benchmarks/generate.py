@@ -0,0 +1,280 @@
+import argparse
+import random
+
+# the default knobs of the generator
+default_classes = 100
+default_methods = 8
+default_depth = 4
+default_chain = 4
+default_strings = 0.1
+default_errors = 0.0
+
+# the object identifiers used in expressions, none of which is a keyword
+object_names = ['x', 'y', 'z', 'count', 'total', 'value', 'index', 'result',
+                'self']
+# the binary operators joined into operator chains
+chain_operators = ['+', '-', '*', '/', '<', '<=', '=']
+# the words that string literals are made of
+string_words = ['hello', 'world', 'cool', 'parser', 'token', 'value', 'line',
+                'error', 'class', 'method', '\\n', '\\t', '\\"']
+# the ways in which a method is broken when errors are generated: a character
+# that no scanner rule matches, a missing semicolon, two operators in a row, and
+# an unterminated string
+error_kinds = ['character', 'semicolon', 'operator', 'string']
+
+
+'''
+This class generates random COOL programs, class by class. The same seed and
+knobs always produce the same program. The knobs are:
+- the number of methods per class (every class also has as many attributes)
+- the depth to which expressions are nested
+- the number of operands in every chain of binary operators
+- the fraction of the simple operands that are string literals
+- the fraction of the methods that are broken by a lexical or syntax error
+Expressions nest along a single branch, such that the size of a method grows
+linearly with both the depth and the chain length.
+'''
+class ProgramGenerator:
+    '''
+    :param seed: the seed of the random number generator
+    :param methods: the number of methods per class
+    :param depth: the nesting depth of expressions
+    :param chain: the number of operands in an operator chain
+    :param strings: the fraction of simple operands that are string literals
+    :param errors: the fraction of methods that contain an error
+    '''
+    def __init__(self, seed=0, methods=default_methods, depth=default_depth,
+                 chain=default_chain, strings=default_strings,
+                 errors=default_errors):
+        self.random = random.Random(seed)
+        self.methods = methods
+        self.depth = depth
+        self.chain = max(1, chain)
+        self.strings = strings
+        self.errors = errors
+        self.class_count = 0
+
+    '''
+    This method generates classes until either the given number of classes, or
+    the given number of characters, has been produced.
+
+    :param classes: the number of classes, or None if only the size is limited
+    :param size: the number of characters, or None if only the number of
+                 classes is limited
+    :returns: a generator of the text of every class
+    '''
+    def generate_classes(self, classes=None, size=None):
+        written = 0
+        count = 0
+        while ((classes is None or count < classes) and
+               (size is None or written < size)):
+            text = self.generate_class()
+            written = written + len(text)
+            count = count + 1
+            yield text
+
+    '''
+    :returns: the text of the next class of the program
+    '''
+    def generate_class(self):
+        index = self.class_count
+        self.class_count = self.class_count + 1
+        if index > 0 and self.random.random() < 0.5:
+            header = ('class C' + str(index) + ' inherits C' +
+                      str(self.random.randrange(index)) + ' {\n')
+        else:
+            header = 'class C' + str(index) + ' {\n'
+        features = []
+        for feature in range(self.methods):
+            features.append(self.generate_attribute(feature))
+            method = self.generate_method(feature)
+            if self.random.random() < self.errors:
+                method = self.break_method(method)
+            features.append(method)
+        return header + ''.join(features) + '};\n\n'
+
+    '''
+    :param index: the number of the attribute in its class
+    :returns: the text of an attribute declaration
+    '''
+    def generate_attribute(self, index):
+        if self.random.random() < 0.5:
+            return '    a' + str(index) + ' : String;\n'
+        return ('    a' + str(index) + ' : Int <- ' + self.generate_operand() +
+                ';\n')
+
+    '''
+    :param index: the number of the method in its class
+    :returns: the text of a method definition
+    '''
+    def generate_method(self, index):
+        formals = ', '.join(name + ' : Int' for name in
+                            self.random.sample(['x', 'y', 'z'],
+                                               self.random.randrange(4)))
+        return ('    m' + str(index) + '(' + formals + ') : Object {\n' +
+                '        ' + self.generate_expression(self.depth) + '\n' +
+                '    };\n')
+
+    '''
+    This method breaks a method, by adding one lexical or syntax error to it.
+
+    :param method: the text of the method
+    :returns: the text of the broken method
+    '''
+    def break_method(self, method):
+        kind = self.random.choice(error_kinds)
+        body = method.index('{') + 1
+        if kind == 'character':
+            position = self.random.randrange(body, len(method) - 3)
+            return method[:position] + ' # ' + method[position:]
+        if kind == 'semicolon':
+            return method[:-2] + '\n'
+        if kind == 'operator':
+            position = method.find(' + ', body)
+            if position >= 0:
+                return method[:position] + ' + *' + method[position + 2:]
+        # an unterminated string runs to the end of its line
+        return method[:body] + ' "unterminated' + method[body:]
+
+    '''
+    This method generates an expression, nested to the given depth.
+
+    :param depth: the nesting depth of the expression
+    :returns: the text of the expression
+    '''
+    def generate_expression(self, depth):
+        if depth <= 0:
+            return self.generate_chain(0)
+        form = self.random.randrange(12)
+        if form < 3:
+            return self.generate_chain(depth)
+        inner = self.generate_expression(depth - 1)
+        if form == 3:
+            return ('if ' + self.generate_chain(0) + ' then ' + inner +
+                    ' else ' + self.generate_operand() + ' fi')
+        if form == 4:
+            return ('while ' + self.generate_chain(0) + ' loop ' + inner +
+                    ' pool')
+        if form == 5:
+            return ('{ ' + inner + '; ' + self.generate_chain(0) + '; }')
+        if form == 6:
+            return ('let ' + self.random.choice(object_names[:3]) +
+                    ' : Int <- ' + self.generate_operand() +
+                    ', s : String in ' + inner)
+        if form == 7:
+            return ('case ' + self.generate_operand() + ' of n : Int => ' +
+                    inner + '; s : String => ' + self.generate_operand() +
+                    '; esac')
+        if form == 8:
+            return self.random.choice(object_names[:-1]) + ' <- ' + inner
+        if form == 9:
+            return 'not (' + inner + ')'
+        if form == 10:
+            return (self.generate_operand() + '.m' +
+                    str(self.random.randrange(self.methods)) + '(' + inner +
+                    ', ' + self.generate_operand() + ')')
+        return ('(' + inner + ')@C0.m' +
+                str(self.random.randrange(self.methods)) + '()')
+
+    '''
+    This method generates a chain of binary operators. One of its operands may
+    be a parenthesized expression nested to one level less than the chain.
+
+    :param depth: the nesting depth of the chain
+    :returns: the text of the chain
+    '''
+    def generate_chain(self, depth):
+        operands = [self.generate_operand() for operand in range(self.chain)]
+        if depth > 0:
+            operands[self.random.randrange(self.chain)] = (
+                '(' + self.generate_expression(depth - 1) + ')')
+        text = operands[0]
+        for operand in operands[1:]:
+            text = (text + ' ' + self.random.choice(chain_operators) + ' ' +
+                    operand)
+        return text
+
+    '''
+    :returns: the text of a simple operand
+    '''
+    def generate_operand(self):
+        if self.random.random() < self.strings:
+            return ('"' + ' '.join(self.random.choice(string_words)
+                                   for word in range(self.random.randrange(
+                                       1, 6))) + '"')
+        form = self.random.randrange(8)
+        if form < 3:
+            return str(self.random.randrange(1000))
+        if form < 5:
+            return self.random.choice(object_names)
+        if form == 5:
+            return self.random.choice(['true', 'false', 'isvoid self'])
+        if form == 6:
+            return 'new C' + str(self.random.randrange(self.class_count))
+        return '~' + str(self.random.randrange(100))
+
+
+'''
+This function writes a generated program to a file.
+
+:param path: the name of the file to write
+:param seed: the seed of the generator
+:param classes: the number of classes, or None if only the size is limited
+:param size: the minimum size of the file in bytes, or None if only the
+             number of classes is limited
+:param knobs: the other knobs of the generator (see ProgramGenerator)
+:returns: the size of the file, in bytes
+'''
+def write_program(path, seed=0, classes=None, size=None, **knobs):
+    if classes is None and size is None:
+        classes = default_classes
+    generator = ProgramGenerator(seed, **knobs)
+    written = 0
+    with open(path, 'w') as output_file:
+        for text in generator.generate_classes(classes, size):
+            output_file.write(text)
+            written = written + len(text)
+    return written
+
+
+'''
+This function runs the generator command line, which writes a single program.
+'''
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Generate a random COOL program for benchmarking.')
+    argument_parser.add_argument('filename', help='the file to write')
+    argument_parser.add_argument('--seed', type=int, default=0,
+                                 help='the seed of the generator')
+    argument_parser.add_argument('--size', type=float, default=None,
+                                 help='the size of the program, in megabytes')
+    argument_parser.add_argument('--classes', type=int, default=None,
+                                 help='the number of classes')
+    argument_parser.add_argument('--methods', type=int,
+                                 default=default_methods,
+                                 help='the number of methods per class')
+    argument_parser.add_argument('--depth', type=int, default=default_depth,
+                                 help='the nesting depth of expressions')
+    argument_parser.add_argument('--chain', type=int, default=default_chain,
+                                 help='the number of operands per operator '
+                                      'chain')
+    argument_parser.add_argument('--strings', type=float,
+                                 default=default_strings,
+                                 help='the fraction of operands that are '
+                                      'string literals')
+    argument_parser.add_argument('--errors', type=float,
+                                 default=default_errors,
+                                 help='the fraction of methods with an error')
+    arguments = argument_parser.parse_args()
+
+    size = None
+    if arguments.size is not None:
+        size = int(arguments.size * 1024 * 1024)
+    write_program(arguments.filename, arguments.seed, arguments.classes, size,
+                  methods=arguments.methods, depth=arguments.depth,
+                  chain=arguments.chain, strings=arguments.strings,
+                  errors=arguments.errors)
+
+
+if __name__ == '__main__':
+    main()
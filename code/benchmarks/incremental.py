@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# the benchmarks live next to the parser, one directory down
+code_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, code_directory)
+
+import coolincremental
+import coolparser
+from scan_scaling import generate_input
+
+# the default input sizes, in megabytes
+default_sizes = [0.1, 1, 5]
+# the edits made at the middle of the file, as (deleted, inserted) pairs:
+# inserting an attribute and a line break, and deleting them again
+edits = [(0, ' x : Int;'), (len(' x : Int;'), ''), (0, '\n'), (1, '')]
+
+
+'''
+This function times a full parse of the given text and a series of incremental
+reparses, each after an edit in the middle of the text.
+
+:param text: the text of the program
+:returns: the time of the full parse, and the average time of a reparse, in
+          seconds
+'''
+def time_reparse(text):
+    parser = coolparser.Parser()
+    start = time.perf_counter()
+    result = coolincremental.parse_text(parser, text)
+    full = time.perf_counter() - start
+
+    # edit just after the opening brace of a class near the middle
+    offset = text.index('{', text.index('class ', len(text) // 2)) + 1
+    start = time.perf_counter()
+    for deleted, inserted in edits:
+        result = coolincremental.reparse(parser, result, offset, deleted,
+                                         inserted)
+    incremental = (time.perf_counter() - start) / len(edits)
+    assert result.source == text and not result.errors
+    return full, incremental
+
+
+'''
+This function compares the time of a full parse to that of an incremental
+reparse after a small edit, for every input size.
+'''
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Benchmark incremental reparsing against full parsing.')
+    argument_parser.add_argument('--sizes', type=float, nargs='+',
+                                 default=default_sizes,
+                                 help='the input sizes, in megabytes')
+    arguments = argument_parser.parse_args()
+    # the parser recurses once per class
+    sys.setrecursionlimit(1000000)
+
+    print('%10s %12s %14s %10s' % ('size (MB)', 'full (s)', 'reparse (s)',
+                                   'speedup'))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'input.cl')
+        for size in arguments.sizes:
+            written = generate_input(path, int(size * 1024 * 1024))
+            with open(path, 'r') as input_file:
+                text = input_file.read()
+            full, incremental = time_reparse(text)
+            print('%10.2f %12.3f %14.4f %10.1f' %
+                  (written / (1024.0 * 1024.0), full, incremental,
+                   full / incremental))
+
+
+if __name__ == '__main__':
+    main()
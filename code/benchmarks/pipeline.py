@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# the benchmarks live next to the parser, one directory down
+code_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, code_directory)
+
+import coolbatch
+import coolparser
+import coolpipeline
+import generate
+
+# the default number of files parsed
+default_files = 200
+# the default size of every file, in kilobytes
+default_size = 64
+# the default time it takes to read a file, in milliseconds, on top of the time
+# the local file system takes
+default_latency = 5.0
+
+
+'''
+This function creates a function that reads a file as read_text() does, after
+waiting for the given time, like a file system over a network would. Waiting
+releases the interpreter lock, just as blocking on I/O does.
+
+:param latency: the time to wait before reading every file, in seconds
+:returns: the function reading a file
+'''
+def make_reader(latency):
+    def read_file(filename):
+        time.sleep(latency)
+        return coolpipeline.read_text(filename)
+    return read_file
+
+
+'''
+This function parses the files one after the other, reading each one before
+parsing it, as coolbatch does with a single job.
+
+:param filenames: the names of the files
+:param engine: the scanning engine to use
+:param read_file: the function reading a file
+:returns: the list of the outcomes of the files
+'''
+def run_serial(filenames, engine, read_file):
+    coolbatch.start_worker(engine)
+    outcomes = []
+    for filename in filenames:
+        start = time.perf_counter()
+        text = read_file(filename)
+        outcome = coolbatch.parse_one(filename, text)
+        outcome['seconds'] = round(time.perf_counter() - start, 6)
+        outcomes.append(outcome)
+    return outcomes
+
+
+'''
+This function runs the pipeline benchmark: it writes the given number of
+generated programs, parses them serially and through the pipeline, with the
+same simulated read latency, and prints the throughput of both, along with the
+metrics of the pipeline. Both must give the same outcomes.
+
+:returns: the exit status, 1 if the outcomes differ
+'''
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Benchmark the pipelined batch parse against the serial '
+                    'one.')
+    argument_parser.add_argument('--files', type=int, default=default_files,
+                                 help='the number of files to parse')
+    argument_parser.add_argument('--size', type=float, default=default_size,
+                                 help='the size of every file, in kilobytes')
+    argument_parser.add_argument('--latency', type=float,
+                                 default=default_latency,
+                                 help='the simulated time to read a file, in '
+                                      'milliseconds')
+    argument_parser.add_argument('--scanner',
+                                 choices=coolparser.scanner_engines,
+                                 default=coolparser.scanner_engine,
+                                 help='the scanning engine to use')
+    argument_parser.add_argument('--lexer-stage', action='store_true',
+                                 default=None,
+                                 help='scan in a stage of its own, even if '
+                                      'the interpreter is not free-threaded')
+    arguments = argument_parser.parse_args()
+
+    read_file = make_reader(arguments.latency / 1000.0)
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = []
+        megabytes = 0.0
+        for index in range(arguments.files):
+            path = os.path.join(directory, 'program%d.cl' % index)
+            written = generate.write_program(
+                path, seed=index, size=int(arguments.size * 1024))
+            megabytes = megabytes + written / (1024.0 * 1024.0)
+            filenames.append(path)
+
+        start = time.perf_counter()
+        serial = run_serial(filenames, arguments.scanner, read_file)
+        serial_seconds = time.perf_counter() - start
+
+        pipeline = coolpipeline.Pipeline(filenames, arguments.scanner,
+                                         read_file=read_file,
+                                         lexer_stage=arguments.lexer_stage)
+        start = time.perf_counter()
+        pipelined = list(pipeline.run())
+        pipeline_seconds = time.perf_counter() - start
+
+    print('%-10s %10s %10s %10s %10s' % ('mode', 'time (s)', 'files/s',
+                                         'MB/s', 'speedup'))
+    for mode, seconds in [('serial', serial_seconds),
+                          ('pipeline', pipeline_seconds)]:
+        print('%-10s %10.3f %10.1f %10.2f %10.2f' %
+              (mode, seconds, arguments.files / seconds, megabytes / seconds,
+               serial_seconds / seconds))
+    print(json.dumps(pipeline.get_metrics(), indent=2))
+
+    for outcomes in [serial, pipelined]:
+        for outcome in outcomes:
+            del outcome['seconds']
+    if serial != pipelined:
+        print('The pipeline gave different outcomes')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
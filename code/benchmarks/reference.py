@@ -0,0 +1,413 @@
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+# the benchmarks live next to the parser, one directory down
+code_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, code_directory)
+
+import coolparser
+import generate
+
+# the reference implementation, an x86-64 Linux executable shipped next to the
+# parser; it stops at the first error, and writes the syntax tree of a program
+# it accepts next to the program
+reference_binary = os.path.join(code_directory, 'cool')
+# the first error reported by the reference implementation: its line, the phase
+# that found it (Lexer or Parser), and the rest of the message
+reference_error = re.compile(r'ERROR: (\d+): (\w+): (.*)')
+# the coordinates quoted in the error messages of the parser
+error_coordinates = re.compile(r'\((\d+), (\d+)\)')
+# the longest a single program may take to be parsed, in seconds
+program_timeout = 60
+# the default numbers of generated and mutated programs
+default_generated = 50
+default_mutated = 200
+# the default fraction by which the throughput of the parser, relative to the
+# reference implementation, may drop below the baseline before it counts as a
+# regression
+default_threshold = 0.2
+# the fragments inserted into programs by mutations
+mutation_fragments = [';', '{', '}', '(', ')', ':', ',', '<-', '=>', '@', '.',
+                      '+', '*', '<', '<=', '=', '~', 'class', 'inherits', 'if',
+                      'then', 'else', 'fi', 'let', 'in', 'case', 'of', 'esac',
+                      'while', 'loop', 'pool', 'new', 'isvoid', 'not', 'x',
+                      'Int', '42', '"text"', '"open', '#']
+# the ways in which a program is mutated
+mutation_kinds = ['delete', 'insert', 'replace', 'duplicate']
+
+
+'''
+This function gathers the programs of the corpus: the example programs shipped
+with the parser, programs produced by the generator, and mutations of both,
+which are mostly broken. The same seed always gives the same corpus.
+
+:param seed: the seed of the generator and of the mutations
+:param generated: the number of generated programs
+:param mutated: the number of mutated programs
+:returns: a list of (name, text) pairs; the names of generated and mutated
+          programs describe how to produce them again
+'''
+def gather_corpus(seed, generated, mutated):
+    programs = []
+    directories = [os.path.join(code_directory, 'cool_examples'),
+                   code_directory]
+    for directory in directories:
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.cl'):
+                with open(os.path.join(directory, name), 'r') as input_file:
+                    programs.append((name, input_file.read()))
+
+    generator_random = random.Random(seed)
+    for index in range(generated):
+        knobs = {'methods': generator_random.randrange(1, 6),
+                 'depth': generator_random.randrange(0, 5),
+                 'chain': generator_random.randrange(1, 6),
+                 'strings': generator_random.choice([0.0, 0.1, 0.5]),
+                 'errors': generator_random.choice([0.0, 0.0, 0.1, 0.3])}
+        generator = generate.ProgramGenerator(seed * 1000 + index, **knobs)
+        programs.append(('generated-%d' % index, ''.join(
+            generator.generate_classes(generator_random.randrange(1, 12)))))
+
+    sources = [program for program in programs if program[1].strip()]
+    mutation_random = random.Random(seed + 1)
+    for index in range(mutated):
+        name, text = mutation_random.choice(sources)
+        text, description = mutate(text, mutation_random)
+        programs.append(('mutated-%d (%s: %s)' % (index, name, description),
+                         text))
+    return programs
+
+
+'''
+This function applies a single random mutation to a program.
+
+:param text: the text of the program
+:param mutation_random: the random number generator
+:returns: a (text, description) pair, holding the mutated program and a
+          description of the mutation
+'''
+def mutate(text, mutation_random):
+    kind = mutation_random.choice(mutation_kinds)
+    position = mutation_random.randrange(len(text))
+    if kind == 'delete':
+        length = mutation_random.randrange(1, 12)
+        return (text[:position] + text[position + length:],
+                'delete %d at %d' % (length, position))
+    fragment = mutation_random.choice(mutation_fragments)
+    if kind == 'insert':
+        return (text[:position] + ' ' + fragment + ' ' + text[position:],
+                'insert %r at %d' % (fragment, position))
+    if kind == 'replace':
+        found = re.compile(r'\w+').search(text, position)
+        if found is not None:
+            return (text[:found.start()] + fragment + text[found.end():],
+                    'replace %r at %d with %r' % (found.group(),
+                                                  found.start(), fragment))
+    lines = text.split('\n')
+    row = mutation_random.randrange(len(lines))
+    lines.insert(row, lines[row])
+    return '\n'.join(lines), 'duplicate line %d' % (row + 1)
+
+
+'''
+This function runs the reference implementation on a program. It writes the
+syntax tree of a program it accepts next to the program, which is removed.
+
+:param path: the name of the file of the program
+:returns: an (outcome, seconds) pair, where outcome is a dictionary holding
+          whether the program was accepted and, if not, the phase and the line
+          of the first error and its message
+'''
+def run_reference(path):
+    start = time.perf_counter()
+    try:
+        process = subprocess.run([reference_binary, '--parse',
+                                  os.path.basename(path)],
+                                 cwd=os.path.dirname(path),
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT,
+                                 universal_newlines=True,
+                                 timeout=program_timeout)
+    except subprocess.TimeoutExpired:
+        return ({'accepted': False, 'phase': 'timeout', 'line': None,
+                 'message': ''}, time.perf_counter() - start)
+    seconds = time.perf_counter() - start
+    if os.path.exists(path + '-ast'):
+        os.unlink(path + '-ast')
+
+    found = reference_error.search(process.stdout)
+    if found is not None:
+        return ({'accepted': False, 'phase': found.group(2),
+                 'line': int(found.group(1)), 'message': found.group(3)},
+                seconds)
+    if process.returncode != 0:
+        return ({'accepted': False, 'phase': 'crash', 'line': None,
+                 'message': process.stdout.strip()[-200:]}, seconds)
+    return {'accepted': True}, seconds
+
+
+'''
+This function parses a program in this process, and reduces the outcome to what
+the reference implementation reports: whether the program was accepted and, if
+not, the first error. The lexical errors come first, as the reference
+implementation scans the whole program before parsing it.
+
+:param parser: the parser
+:param path: the name of the file of the program
+:returns: an (outcome, seconds) pair, as returned by run_reference()
+'''
+def run_parser(parser, path):
+    start = time.perf_counter()
+    try:
+        result = parser.parse_file(path)
+    except Exception as exception:
+        return ({'accepted': False, 'phase': 'crash', 'line': None,
+                 'message': type(exception).__name__ + ': ' + str(exception)},
+                time.perf_counter() - start)
+    seconds = time.perf_counter() - start
+    if result.ok():
+        return {'accepted': True}, seconds
+    first = result.errors[0]
+    phase = 'Lexer' if first.startswith('Lexical error') else 'Parser'
+    found = error_coordinates.search(first)
+    line = int(found.group(1)) if found is not None else None
+    return ({'accepted': False, 'phase': phase, 'line': line,
+             'message': first}, seconds)
+
+
+'''
+This function times the command line of the parser on a program, in a fresh
+interpreter, as the reference implementation is run.
+
+:param options: the command line options of the parser
+:param path: the name of the file of the program
+:returns: the wall time, in seconds
+'''
+def time_process(options, path):
+    start = time.perf_counter()
+    try:
+        subprocess.run([sys.executable, '-m', 'coolparser', path] + options,
+                       cwd=code_directory, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, timeout=program_timeout)
+    except subprocess.TimeoutExpired:
+        pass
+    return time.perf_counter() - start
+
+
+'''
+This function classifies how the outcomes of a program differ.
+
+:param reference: the outcome of the reference implementation
+:param ours: the outcome of the parser
+:returns: 'outcome' if only one of them accepted the program, 'phase' if the
+          first errors were found by different phases, 'line' if they are on
+          different lines, or None if they agree
+'''
+def compare(reference, ours):
+    if reference['accepted'] != ours['accepted']:
+        return 'outcome'
+    if reference['accepted']:
+        return None
+    if reference['phase'] != ours['phase']:
+        return 'phase'
+    if reference['line'] != ours['line']:
+        return 'line'
+    return None
+
+
+'''
+This function compares a report to a baseline report: every disagreement that
+the baseline does not have, and a drop of the relative throughput of the
+parser beyond the threshold, is a regression.
+
+:param report: the report of the run
+:param baseline: the baseline report
+:param threshold: the fraction by which the relative throughput may drop
+:returns: the list of regressions, as lines of text
+'''
+def find_regressions(report, baseline, threshold):
+    known = set((entry['program'], entry['disagreement'])
+                for entry in baseline['disagreements'])
+    regressions = ['new disagreement (%s) on %s' % (entry['disagreement'],
+                                                    entry['program'])
+                   for entry in report['disagreements']
+                   if (entry['program'], entry['disagreement']) not in known]
+    for key in ['relative_process', 'relative_in_process']:
+        expected = baseline['throughput'].get(key)
+        measured = report['throughput'].get(key)
+        if expected and measured and measured < expected * (1 - threshold):
+            regressions.append('%s went from %.3f to %.3f' %
+                               (key, expected, measured))
+    return regressions
+
+
+'''
+This function formats an outcome in a line of the report.
+
+:param outcome: the outcome dictionary
+:returns: the text of the outcome
+'''
+def format_outcome(outcome):
+    if outcome['accepted']:
+        return 'accepted'
+    return '%s error at line %s: %s' % (outcome['phase'], outcome['line'],
+                                        outcome['message'][:100])
+
+
+'''
+This function runs the harness: every program of the corpus is parsed by both
+the reference implementation and the parser, their outcomes are compared, and
+both are timed, as processes (the reference implementation can only be run as
+one) and, for the parser, also in this process. The disagreements and the
+relative throughput are reported, and can be saved as a baseline, and compared
+to a previous baseline, in which case the exit status is 1 on any regression.
+Everything runs offline, on the corpus generated from the seed.
+
+:returns: the exit status, 2 if the reference implementation cannot be run
+'''
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Compare the parser to the reference implementation.')
+    argument_parser.add_argument('--seed', type=int, default=0,
+                                 help='the seed of the generated and mutated '
+                                      'programs')
+    argument_parser.add_argument('--generated', type=int,
+                                 default=default_generated,
+                                 help='the number of generated programs')
+    argument_parser.add_argument('--mutated', type=int,
+                                 default=default_mutated,
+                                 help='the number of mutated programs')
+    argument_parser.add_argument('--scanner',
+                                 choices=coolparser.scanner_engines,
+                                 default=coolparser.scanner_engine,
+                                 help='the scanning engine to use')
+    argument_parser.add_argument('--expressions',
+                                 choices=['recursive', 'iterative'],
+                                 default=coolparser.expression_engine,
+                                 help='the expression engine to use')
+    argument_parser.add_argument('--grammar', metavar='FILE', default=None,
+                                 help='parse with a table compiled from this '
+                                      'grammar file')
+    argument_parser.add_argument('--show', type=int, default=20,
+                                 help='the number of disagreements to print')
+    argument_parser.add_argument('--keep', metavar='DIRECTORY',
+                                 help='write the programs with disagreements '
+                                      'to this directory')
+    argument_parser.add_argument('--report', metavar='FILE',
+                                 help='write the full report as JSON')
+    argument_parser.add_argument('--save', metavar='FILE',
+                                 help='save the report as a baseline')
+    argument_parser.add_argument('--baseline', metavar='FILE',
+                                 help='compare the report to a baseline')
+    argument_parser.add_argument('--threshold', type=float,
+                                 default=default_threshold,
+                                 help='the fraction by which the relative '
+                                      'throughput may drop before the '
+                                      'harness fails')
+    arguments = argument_parser.parse_args()
+
+    if not os.access(reference_binary, os.X_OK):
+        print('The reference implementation cannot be run: ' +
+              reference_binary)
+        return 2
+    # the rule methods recurse once per class and per feature
+    sys.setrecursionlimit(100000)
+    parser = coolparser.Parser(lexer=coolparser.Lexer(arguments.scanner),
+                               expressions=arguments.expressions,
+                               grammar=arguments.grammar)
+    options = ['--scanner', arguments.scanner,
+               '--expressions', arguments.expressions]
+    if arguments.grammar is not None:
+        options += ['--grammar', os.path.abspath(arguments.grammar)]
+
+    programs = gather_corpus(arguments.seed, arguments.generated,
+                             arguments.mutated)
+    disagreements = []
+    counts = {'outcome': 0, 'phase': 0, 'line': 0}
+    seconds = {'reference': 0.0, 'process': 0.0, 'in_process': 0.0}
+    size = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for index, (name, text) in enumerate(programs):
+            path = os.path.join(directory, 'program%d.cl' % index)
+            with open(path, 'w') as output_file:
+                output_file.write(text)
+            size = size + len(text.encode('utf-8'))
+            reference, reference_seconds = run_reference(path)
+            ours, our_seconds = run_parser(parser, path)
+            seconds['reference'] = seconds['reference'] + reference_seconds
+            seconds['in_process'] = seconds['in_process'] + our_seconds
+            seconds['process'] = (seconds['process'] +
+                                  time_process(options, path))
+            disagreement = compare(reference, ours)
+            if disagreement is None:
+                continue
+            counts[disagreement] = counts[disagreement] + 1
+            disagreements.append({'program': name,
+                                  'disagreement': disagreement,
+                                  'reference': reference, 'ours': ours})
+            if arguments.keep:
+                os.makedirs(arguments.keep, exist_ok=True)
+                with open(os.path.join(arguments.keep, 'program%d.cl' % index),
+                          'w') as output_file:
+                    output_file.write(text)
+
+    megabytes = size / (1024.0 * 1024.0)
+    throughput = {'megabytes': round(megabytes, 3)}
+    for key, value in seconds.items():
+        throughput[key + '_seconds'] = round(value, 3)
+    # the throughput of the parser as a fraction of that of the reference
+    throughput['relative_process'] = round(
+        seconds['reference'] / max(seconds['process'], 1e-9), 4)
+    throughput['relative_in_process'] = round(
+        seconds['reference'] / max(seconds['in_process'], 1e-9), 4)
+    report = {'seed': arguments.seed, 'programs': len(programs),
+              'scanner': arguments.scanner,
+              'expressions': arguments.expressions,
+              'grammar': arguments.grammar, 'counts': counts,
+              'throughput': throughput, 'disagreements': disagreements}
+
+    print('programs: %d, agreed: %d, disagreed: %d (outcome %d, phase %d, '
+          'line %d)' % (len(programs), len(programs) - len(disagreements),
+                        len(disagreements), counts['outcome'],
+                        counts['phase'], counts['line']))
+    for entry in disagreements[:arguments.show]:
+        print('')
+        print('%s: %s' % (entry['disagreement'], entry['program']))
+        print('    reference: ' + format_outcome(entry['reference']))
+        print('    ours:      ' + format_outcome(entry['ours']))
+    print('')
+    print('%-24s %10s %10s %10s' % ('implementation', 'time (s)', 'MB/s',
+                                    'relative'))
+    for label, key in [('reference (process)', 'reference'),
+                       ('coolparser (process)', 'process'),
+                       ('coolparser (in process)', 'in_process')]:
+        print('%-24s %10.3f %10.3f %10.3f' %
+              (label, seconds[key], megabytes / max(seconds[key], 1e-9),
+               seconds['reference'] / max(seconds[key], 1e-9)))
+
+    if arguments.report:
+        with open(arguments.report, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+    if arguments.save:
+        with open(arguments.save, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+    if arguments.baseline:
+        with open(arguments.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = find_regressions(report, baseline, arguments.threshold)
+        for regression in regressions:
+            print('REGRESSION: ' + regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+# the benchmarks live next to the parser, one directory down
+code_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, code_directory)
+
+import coolparser
+
+# the default input sizes, in megabytes
+default_sizes = [1, 2, 5, 10, 20, 50, 100]
+
+
+'''
+This function builds a benchmark input of (at least) the given size, by
+concatenating the COOL examples shipped with the parser as many times as needed.
+
+:param path: the name of the file to write
+:param size: the minimum size of the file, in bytes
+:returns: the actual size of the file, in bytes
+'''
+def generate_input(path, size):
+    sources = []
+    for filename in sorted(glob.glob(os.path.join(code_directory,
+                                                  'cool_examples', '*.cl'))):
+        with open(filename, 'r') as source_file:
+            sources.append(source_file.read())
+    corpus = '\n'.join(sources) + '\n'
+
+    written = 0
+    with open(path, 'w') as output_file:
+        while written < size:
+            output_file.write(corpus)
+            written = written + len(corpus)
+    return written
+
+
+'''
+This function times a full scan of the given file, consuming the tokens as they
+are produced, such that only the scanner's own working set is kept in memory.
+It is run in a fresh process for every input, so that the peak resident set
+size it reports belongs to that scan only.
+
+:param path: the name of the file to scan
+:param engine: the scanning engine to use
+:param mapped: whether to read the file through a memory map
+:returns: a (seconds, tokens, peak RSS in kilobytes) tuple
+'''
+def time_scan(path, engine, mapped):
+    count = 0
+    lexer = coolparser.Lexer(engine, mapped)
+    start = time.perf_counter()
+    with open(path, 'r') as input_file:
+        for token in lexer.scan_tokens(input_file, keep_lines=False):
+            count = count + 1
+    seconds = time.perf_counter() - start
+    return seconds, count, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+'''
+This function runs the benchmark for every input size, and prints the scan time
+against the input size. The time per megabyte should stay flat if scanning is
+linear, and the peak memory should stay flat if the scan streams its input.
+'''
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Benchmark scan time against input size.')
+    argument_parser.add_argument('--sizes', type=float, nargs='+',
+                                 default=default_sizes,
+                                 help='the input sizes, in megabytes')
+    argument_parser.add_argument('--engine',
+                                 choices=coolparser.scanner_engines,
+                                 default=coolparser.scanner_engine,
+                                 help='the scanning engine to benchmark')
+    argument_parser.add_argument('--mapped', action='store_true',
+                                 help='read the input through a memory map')
+    arguments = argument_parser.parse_args()
+
+    print('%10s %12s %10s %10s %10s %10s' % ('size (MB)', 'tokens',
+                                             'time (s)', 'MB/s', 's/MB',
+                                             'RSS (MB)'))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'input.cl')
+        for size in arguments.sizes:
+            written = generate_input(path, int(size * 1024 * 1024))
+            with multiprocessing.Pool(1) as pool:
+                seconds, count, peak = pool.apply(
+                    time_scan, (path, arguments.engine, arguments.mapped))
+            megabytes = written / (1024.0 * 1024.0)
+            print('%10.2f %12d %10.3f %10.2f %10.4f %10.1f' %
+                  (megabytes, count, seconds, megabytes / seconds,
+                   seconds / megabytes, peak / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
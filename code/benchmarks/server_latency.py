@@ -0,0 +1,130 @@
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# the benchmarks live next to the parser, one directory down
+code_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, code_directory)
+
+import coolclient
+
+# the default number of times every file is parsed by each method
+default_rounds = 5
+
+
+'''
+This function starts a parse server on the given socket, and waits until it is
+ready to accept clients.
+
+:param path: the path of the socket
+:param jobs: the number of worker processes of the server
+:returns: the server process
+'''
+def start_server(path, jobs):
+    server = subprocess.Popen([sys.executable,
+                               os.path.join(code_directory, 'coolserver.py'),
+                               '--socket', path, '-j', str(jobs)])
+    while not os.path.exists(path):
+        if server.poll() is not None:
+            raise RuntimeError('The parse server did not start.')
+        time.sleep(0.01)
+    return server
+
+
+'''
+This function runs a command once for every file, and times each run.
+
+:param command: the command, to which the name of the file is appended
+:param filenames: the names of the files
+:returns: the list of times, in seconds
+'''
+def time_commands(command, filenames):
+    times = []
+    for filename in filenames:
+        start = time.perf_counter()
+        subprocess.run(command + [filename], stdout=subprocess.DEVNULL,
+                       check=False)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+'''
+This function sends a parse request for every file over a single connection to
+the server, and times each request.
+
+:param path: the path of the socket of the server
+:param filenames: the names of the files
+:returns: the list of times, in seconds
+'''
+def time_requests(path, filenames):
+    times = []
+    client = coolclient.Client(path)
+    for filename in filenames:
+        start = time.perf_counter()
+        client.request({'op': 'parse_file',
+                        'file': os.path.abspath(filename), 'format': 'text'})
+        times.append(time.perf_counter() - start)
+    client.close()
+    return times
+
+
+'''
+This function prints the mean, median and 95th percentile of a list of times.
+
+:param name: the name of the method that was timed
+:param times: the list of times, in seconds
+'''
+def report(name, times):
+    times = sorted(times)
+    print('%-24s %10.2f %10.2f %10.2f' %
+          (name, 1000 * sum(times) / len(times), 1000 * times[len(times) // 2],
+           1000 * times[len(times) * 95 // 100]))
+
+
+'''
+This function compares the end-to-end latency per file of the one-shot command
+line parser, of the client command talking to a parse server, and of requests
+sent over a connection that is kept open.
+'''
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Compare per-file latency of the one-shot parser and of '
+                    'the parse server.')
+    argument_parser.add_argument('--rounds', type=int, default=default_rounds,
+                                 help='the number of times each file is '
+                                      'parsed by each method')
+    argument_parser.add_argument('-j', '--jobs', type=int, default=2,
+                                 help='the number of workers of the server')
+    arguments = argument_parser.parse_args()
+
+    filenames = sorted(glob.glob(os.path.join(code_directory, 'cool_examples',
+                                              '*.cl'))) * arguments.rounds
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'server.sock')
+        server = start_server(path, arguments.jobs)
+        try:
+            print('%-24s %10s %10s %10s' % ('method', 'mean (ms)', 'p50 (ms)',
+                                            'p95 (ms)'))
+            report('one-shot coolparser.py',
+                   time_commands([sys.executable,
+                                  os.path.join(code_directory,
+                                               'coolparser.py')], filenames))
+            report('coolclient.py',
+                   time_commands([sys.executable,
+                                  os.path.join(code_directory,
+                                               'coolclient.py'),
+                                  '--socket', path], filenames))
+            report('open connection', time_requests(path, filenames))
+        finally:
+            client = coolclient.Client(path)
+            client.request({'op': 'shutdown'})
+            client.close()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
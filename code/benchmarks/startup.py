@@ -0,0 +1,172 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# the benchmarks live next to the parser, one directory down
+code_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, code_directory)
+
+import coolparser
+
+# the default number of times every command is run
+default_runs = 20
+# the default number of modules listed by import time
+default_top = 15
+
+
+'''
+This function times a command, run from the directory of the parser in a fresh
+interpreter every time, such that every run is a cold start.
+
+:param command: the command, as a list of arguments
+:param runs: the number of runs
+:returns: the list of the wall times of the runs, in milliseconds
+'''
+def time_command(command, runs):
+    times = []
+    for run in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=code_directory, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=False)
+        times.append(1000 * (time.perf_counter() - start))
+    return times
+
+
+'''
+This function writes the coolparser.py script of a revision of the repository,
+which the current script is compared with.
+
+:param revision: the git revision
+:param directory: the directory to write the script to
+:returns: the path of the script, or None if git cannot show it
+'''
+def write_baseline_script(revision, directory):
+    if revision is None:
+        process = subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'],
+                                 cwd=code_directory, stdout=subprocess.PIPE,
+                                 stderr=subprocess.DEVNULL,
+                                 universal_newlines=True, check=False)
+        if process.returncode != 0 or not process.stdout.split():
+            return None
+        # the first commit of the repository, the parser before any of its
+        # optimizations
+        revision = process.stdout.split()[-1]
+    process = subprocess.run(['git', 'show', revision + ':./coolparser.py'],
+                             cwd=code_directory, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, check=False)
+    if process.returncode != 0:
+        return None
+    path = os.path.join(directory, 'coolparser.py')
+    with open(path, 'wb') as script_file:
+        script_file.write(process.stdout)
+    return path
+
+
+'''
+This function measures the import time of every module imported when the parser
+is imported, with the -X importtime option of the interpreter. Every module is
+given the lowest time it took over the runs.
+
+:param runs: the number of runs
+:returns: a dictionary mapping every module to its (self, cumulative) pair of
+          import times, in milliseconds
+'''
+def measure_imports(runs):
+    modules = {}
+    for run in range(runs):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import coolparser'],
+            cwd=code_directory, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+        for line in process.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            fields = line.split(':', 1)[-1].split('|')
+            if len(fields) != 3 or not fields[0].strip().isdigit():
+                continue
+            name = fields[2].strip()
+            measured = (int(fields[0]) / 1000.0, int(fields[1]) / 1000.0)
+            if name in modules:
+                measured = (min(measured[0], modules[name][0]),
+                            min(measured[1], modules[name][1]))
+            modules[name] = measured
+    return modules
+
+
+'''
+This function runs the startup benchmark: it checks that the scanner tables are
+up to date, times cold runs of the parser on a small file, both as a script
+(which only compiles the few lines of coolparser.py, and loads the cached
+bytecode of coolcore) and as a module, next to an interpreter that does nothing
+and to the coolparser.py script of the baseline revision (which was compiled
+whole every time), and lists the modules that take longest to import. The
+bytecode of the modules is written beforehand, since the imports are timed as
+they usually run.
+
+:returns: the exit status, 1 if the scanner tables are out of date
+'''
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Benchmark the cold start of the parser.')
+    argument_parser.add_argument('--file', default='hello-world.cl',
+                                 help='the COOL file to parse, relative to '
+                                      'the directory of the parser')
+    argument_parser.add_argument('--runs', type=int, default=default_runs,
+                                 help='the number of runs of every command')
+    argument_parser.add_argument('--top', type=int, default=default_top,
+                                 help='the number of modules to list')
+    argument_parser.add_argument('--baseline', metavar='REVISION', default=None,
+                                 help='the git revision of the script to '
+                                      'compare with (defaults to the first '
+                                      'commit)')
+    arguments = argument_parser.parse_args()
+
+    stale_tables = coolparser.check_scanner_tables()
+    if stale_tables:
+        print('The scanner tables are out of date: ' +
+              ', '.join(stale_tables) + '; run python coolparser.py '
+              '--write-tables')
+        return 1
+
+    commands = [('interpreter', [sys.executable, '-c', 'pass']),
+                ('script', [sys.executable, 'coolparser.py', arguments.file]),
+                ('module', [sys.executable, '-m', 'coolparser',
+                            arguments.file])]
+    baseline_directory = tempfile.TemporaryDirectory()
+    baseline_script = write_baseline_script(arguments.baseline,
+                                            baseline_directory.name)
+    if baseline_script is None:
+        print('The baseline script cannot be read from git; it is not timed')
+    else:
+        commands.append(('baseline', [sys.executable, baseline_script,
+                                      arguments.file]))
+    # the bytecode of the modules is written first, even where it is not
+    # written by default, such that the module is timed as it usually starts
+    environment = dict(os.environ)
+    environment.pop('PYTHONDONTWRITEBYTECODE', None)
+    subprocess.run([sys.executable, '-c', 'import coolparser'],
+                   cwd=code_directory, env=environment, check=True)
+    print('%-12s %10s %10s %10s' % ('command', 'min (ms)', 'median (ms)',
+                                    'max (ms)'))
+    for name, command in commands:
+        times = time_command(command, arguments.runs)
+        print('%-12s %10.1f %10.1f %10.1f' % (name, min(times),
+                                              statistics.median(times),
+                                              max(times)))
+    baseline_directory.cleanup()
+
+    modules = measure_imports(arguments.runs)
+    print('')
+    print('%-30s %10s %16s' % ('module', 'self (ms)', 'cumulative (ms)'))
+    for name, (own, cumulative) in sorted(modules.items(),
+                                          key=lambda item: -item[1][1])[
+                                              :arguments.top]:
+        print('%-30s %10.2f %16.2f' % (name, own, cumulative))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+# the benchmarks live next to the parser, one directory down
+code_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, code_directory)
+
+import coolparser
+import generate
+
+# the workloads of the suite, as (name, size in megabytes, generator knobs)
+# triples; the sizes are multiplied by the scale given on the command line
+workloads = [('small', 0.05, {}),
+             ('medium', 2, {}),
+             ('deep', 2, {'depth': 10, 'chain': 2}),
+             ('chains', 2, {'depth': 2, 'chain': 16}),
+             ('strings', 2, {'strings': 0.6}),
+             ('broken', 2, {'errors': 0.2}),
+             ('large', 20, {})]
+# the stages timed on every workload
+stages = ['scan', 'program_0', 'parse']
+# the default number of times every stage is run, of which the fastest is kept
+default_repeat = 3
+# the default fraction by which a stage may be slower (or use more memory) than
+# in the baseline before it counts as a regression
+default_threshold = 0.1
+
+
+'''
+This function times a single stage on the given file. It is run in a fresh
+process for every stage, so that the peak resident set size it reports belongs
+to that stage only (and to the scan it depends on, for program_0()).
+
+:param path: the name of the file
+:param stage: 'scan' times Lexer.scan(), 'program_0' times Parser.program_0()
+              on tokens scanned beforehand, and 'parse' times Parser.parse()
+              from the file to the result
+:param engine: the scanning engine to use
+:param expressions: the expression engine to use
+:returns: a (seconds, tokens, peak RSS in kilobytes) tuple
+'''
+def time_stage(path, stage, engine, expressions):
+    # the parser recurses once per class and per feature
+    sys.setrecursionlimit(10000000)
+    parser = coolparser.Parser(lexer=coolparser.Lexer(engine),
+                               expressions=expressions)
+    with open(path, 'r') as input_file:
+        if stage == 'scan':
+            start = time.perf_counter()
+            tokens = parser.lexer.scan(input_file)
+            seconds = time.perf_counter() - start
+        elif stage == 'program_0':
+            tokens = parser.lexer.scan(input_file)
+            parser.reset(tokens)
+            start = time.perf_counter()
+            parser.program_0()
+            seconds = time.perf_counter() - start
+        else:
+            start = time.perf_counter()
+            tokens = parser.parse(input_file).tokens
+            seconds = time.perf_counter() - start
+    return (seconds, len(tokens),
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+'''
+This function runs every stage on a workload, the given number of times each.
+
+:param path: the name of the file of the workload
+:param size: the size of the file, in bytes
+:param arguments: the parsed command line arguments
+:returns: a dictionary mapping every stage to its measurements
+'''
+def run_workload(path, size, arguments):
+    results = {}
+    for stage in stages:
+        runs = []
+        for run in range(arguments.repeat):
+            with multiprocessing.Pool(1) as pool:
+                runs.append(pool.apply(time_stage,
+                                       (path, stage, arguments.scanner,
+                                        arguments.expressions)))
+        seconds = min(run[0] for run in runs)
+        tokens = runs[0][1]
+        results[stage] = {
+            'seconds': round(seconds, 6),
+            'tokens_per_second': round(tokens / seconds),
+            'megabytes_per_second': round(size / (1024.0 * 1024.0) / seconds,
+                                          3),
+            'peak_rss_kb': max(run[2] for run in runs),
+            'tokens': tokens, 'bytes': size}
+    return results
+
+
+'''
+This function compares the results of a run to a baseline.
+
+:param results: the results of the run
+:param baseline: the results of the baseline run
+:param threshold: the fraction by which the time or the peak memory of a stage
+                  may exceed the baseline
+:returns: the list of regressions, as lines of text
+'''
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for workload, workload_results in results['workloads'].items():
+        if workload not in baseline['workloads']:
+            continue
+        for stage, measured in workload_results.items():
+            expected = baseline['workloads'][workload].get(stage)
+            if expected is None or measured['bytes'] != expected['bytes']:
+                continue
+            for key in ['seconds', 'peak_rss_kb']:
+                if measured[key] > expected[key] * (1 + threshold):
+                    regressions.append(
+                        '%s %s: %s went from %s to %s (+%.0f%%)' %
+                        (workload, stage, key, expected[key], measured[key],
+                         100.0 * (measured[key] / expected[key] - 1)))
+    return regressions
+
+
+'''
+This function runs the benchmark suite: every workload is generated (the same
+way for the same seed), and scanned and parsed, and the time, throughput and
+peak memory of every stage are printed. The results can be saved as a baseline,
+and compared to a previous baseline, in which case the exit status is 1 if any
+stage regressed beyond the threshold.
+
+:returns: the exit status
+'''
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Benchmark the scanner and the parser on generated '
+                    'programs.')
+    argument_parser.add_argument('--workloads', nargs='+',
+                                 choices=[workload[0] for workload in
+                                          workloads],
+                                 default=[workload[0] for workload in
+                                          workloads if workload[0] != 'large'],
+                                 help='the workloads to run')
+    argument_parser.add_argument('--scale', type=float, default=1.0,
+                                 help='the factor applied to the size of every '
+                                      'workload')
+    argument_parser.add_argument('--seed', type=int, default=0,
+                                 help='the seed of the generator')
+    argument_parser.add_argument('--repeat', type=int, default=default_repeat,
+                                 help='the number of runs of every stage')
+    argument_parser.add_argument('--scanner',
+                                 choices=coolparser.scanner_engines,
+                                 default=coolparser.scanner_engine,
+                                 help='the scanning engine to use')
+    argument_parser.add_argument('--expressions',
+                                 choices=['recursive', 'iterative'],
+                                 default=coolparser.expression_engine,
+                                 help='the expression engine to use')
+    argument_parser.add_argument('--save', metavar='FILE',
+                                 help='save the results as a baseline')
+    argument_parser.add_argument('--baseline', metavar='FILE',
+                                 help='compare the results to a baseline')
+    argument_parser.add_argument('--threshold', type=float,
+                                 default=default_threshold,
+                                 help='the fraction by which a stage may '
+                                      'regress before the suite fails')
+    arguments = argument_parser.parse_args()
+
+    results = {'python': platform.python_version(),
+               'scanner': arguments.scanner,
+               'expressions': arguments.expressions,
+               'seed': arguments.seed, 'workloads': {}}
+    print('%-10s %-10s %10s %10s %12s %10s %10s' %
+          ('workload', 'stage', 'size (MB)', 'time (s)', 'tokens/s', 'MB/s',
+           'RSS (MB)'))
+    with tempfile.TemporaryDirectory() as directory:
+        for name, megabytes, knobs in workloads:
+            if name not in arguments.workloads:
+                continue
+            path = os.path.join(directory, name + '.cl')
+            size = generate.write_program(
+                path, arguments.seed,
+                size=int(megabytes * arguments.scale * 1024 * 1024), **knobs)
+            workload_results = run_workload(path, size, arguments)
+            os.unlink(path)
+            results['workloads'][name] = workload_results
+            for stage in stages:
+                measured = workload_results[stage]
+                print('%-10s %-10s %10.2f %10.3f %12d %10.2f %10.1f' %
+                      (name, stage, size / (1024.0 * 1024.0),
+                       measured['seconds'], measured['tokens_per_second'],
+                       measured['megabytes_per_second'],
+                       measured['peak_rss_kb'] / 1024.0))
+
+    if arguments.save:
+        with open(arguments.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+    if arguments.baseline:
+        with open(arguments.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = find_regressions(results, baseline, arguments.threshold)
+        for regression in regressions:
+            print('REGRESSION: ' + regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# the benchmarks live next to the parser, one directory down
+code_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, code_directory)
+
+import coolparser
+from scan_scaling import generate_input
+
+# the default input size, in megabytes
+default_size = 10
+
+
+'''
+This function scans the given file into a list of token tuples and a list of
+offsets, which is how the lexer used to hold the tokens of a file.
+
+:param lexer: the lexer to scan with
+:param input_file: the input file
+:returns: the list of tokens and the list of their offsets
+'''
+def scan_tuples(lexer, input_file):
+    tokens = []
+    token_offsets = []
+    for token, offset in lexer.scan_tokens(input_file):
+        tokens.append(token)
+        token_offsets.append(offset)
+    return tokens, token_offsets
+
+
+'''
+This function scans the given file with the given function, and measures the
+memory still held by the tokens once the scan is over, as well as the peak
+memory of the scan.
+
+:param path: the name of the file to scan
+:param scan: a function taking a lexer and an input file, and returning the
+             tokens
+:returns: a (tokens, held bytes, peak bytes, seconds) tuple
+'''
+def measure(path, scan):
+    lexer = coolparser.Lexer()
+    with open(path, 'r') as input_file:
+        tracemalloc.start()
+        start = time.perf_counter()
+        tokens = scan(lexer, input_file)
+        seconds = time.perf_counter() - start
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return tokens, held, peak, seconds
+
+
+'''
+This function times the parser on the tokens of the given file, once they have
+been scanned into a TokenStore.
+
+:param path: the name of the file to parse
+:returns: the time spent in the grammar functions, in seconds
+'''
+def time_parse(path):
+    parser = coolparser.Parser()
+    with open(path, 'r') as input_file:
+        parser.reset(parser.lexer.scan(input_file))
+    start = time.perf_counter()
+    parser.program_0()
+    return time.perf_counter() - start
+
+
+'''
+This function compares the memory held per token by a list of token tuples and
+by a TokenStore, on a generated input of the given size.
+'''
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Compare the memory held per token by token tuples and by '
+                    'the columnar token store.')
+    argument_parser.add_argument('--size', type=float, default=default_size,
+                                 help='the input size, in megabytes')
+    arguments = argument_parser.parse_args()
+    # the parser recurses once per class
+    sys.setrecursionlimit(1000000)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'input.cl')
+        written = generate_input(path, int(arguments.size * 1024 * 1024))
+        print('input: %.2f MB' % (written / (1024.0 * 1024.0)))
+        print('%12s %12s %12s %12s %12s' % ('store', 'tokens', 'bytes/token',
+                                            'peak (MB)', 'scan (s)'))
+        for name, scan in [('tuples', scan_tuples),
+                           ('columnar', lambda lexer, input_file:
+                            lexer.scan(input_file))]:
+            tokens, held, peak, seconds = measure(path, scan)
+            if name == 'tuples':
+                tokens = tokens[0]
+            print('%12s %12d %12.1f %12.1f %12.3f' %
+                  (name, len(tokens), held / float(len(tokens)),
+                   peak / (1024.0 * 1024.0), seconds))
+            del tokens
+        print('parse: %.3f s' % time_parse(path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+
+# the benchmarks live next to the parser, one directory down
+code_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, code_directory)
+
+import coolparser
+from scan_scaling import generate_input, time_scan
+
+# the default input sizes, in megabytes, from 1 MB to 1 GB
+default_sizes = [1, 10, 100, 1024]
+# the default engines compared, the first one being the baseline
+default_engines = ['master', 'vector']
+
+
+'''
+This function runs the benchmark of the vector scanner engine: every input size
+is scanned by every engine, each in a fresh process, and the scan time, the
+throughput and the peak memory of every engine are printed next to its speedup
+over the first engine. The engines must find the same number of tokens, or the
+benchmark fails.
+
+:returns: the exit status, 1 if NumPy is not installed or if the engines
+          disagree on the number of tokens
+'''
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Benchmark the vector scanner engine against the others.')
+    argument_parser.add_argument('--sizes', type=float, nargs='+',
+                                 default=default_sizes,
+                                 help='the input sizes, in megabytes')
+    argument_parser.add_argument('--engines', nargs='+',
+                                 choices=coolparser.scanner_engines,
+                                 default=default_engines,
+                                 help='the scanning engines to compare')
+    arguments = argument_parser.parse_args()
+
+    # the vector engine falls back to the master engine without NumPy, which
+    # would make the comparison meaningless
+    if 'vector' in arguments.engines and \
+            coolparser.Lexer('vector').engine != 'vector':
+        print('NumPy is not installed, so the vector engine is not available')
+        return 1
+
+    print('%10s %8s %12s %10s %10s %10s %10s' % ('size (MB)', 'engine',
+                                                 'tokens', 'time (s)', 'MB/s',
+                                                 'speedup', 'RSS (MB)'))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'input.cl')
+        for size in arguments.sizes:
+            written = generate_input(path, int(size * 1024 * 1024))
+            megabytes = written / (1024.0 * 1024.0)
+            baseline = None
+            counts = set()
+            for engine in arguments.engines:
+                with multiprocessing.Pool(1) as pool:
+                    seconds, count, peak = pool.apply(time_scan,
+                                                      (path, engine, False))
+                if baseline is None:
+                    baseline = seconds
+                counts.add(count)
+                print('%10.2f %8s %12d %10.3f %10.2f %10.2f %10.1f' %
+                      (megabytes, engine, count, seconds,
+                       megabytes / seconds, baseline / seconds,
+                       peak / 1024.0))
+            if len(counts) > 1:
+                print('The engines found different numbers of tokens')
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
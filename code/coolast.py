@@ -0,0 +1,749 @@
+import array
+import json
+import sys
+
+# the tags of the values in the flat array encoding of a tree
+node_tag = 0
+list_tag = 1
+name_tag = 2
+token_tag = 3
+none_tag = 4
+
+# the operators of binary expressions, and their precedence; higher binds
+# tighter
+binary_operators = {'<': 1, '<=': 1, '=': 1, '+': 2, '-': 2, '*': 3, '/': 3}
+
+
+'''
+This class is the base of all the nodes of the abstract syntax tree. Nodes use
+__slots__, so they carry no per-instance dictionary. Names (of classes, types,
+methods, attributes and variables) are interned strings, such that every
+occurrence of a name shares a single string object, and literals are kept as
+indices into the token list instead of copies of their values. Every node also
+records the span of tokens it was parsed from, as the indices of its first and
+last tokens, which can be mapped to source coordinates through the tokens.
+'''
+class Node:
+    __slots__ = ('first', 'last')
+    # the names of the fields of the node, in order
+    fields = ()
+
+    def __init__(self, first, last, *values):
+        self.first = first
+        self.last = last
+        for field, value in zip(self.fields, values):
+            setattr(self, field, value)
+
+    '''
+    This method returns the source span of the node, as the coordinates of its
+    first and last tokens.
+
+    :param tokens: the list of tokens the tree was built from
+    :returns: a ((row, column), (row, column)) pair
+    '''
+    def span(self, tokens):
+        return tokens[self.first][1], tokens[self.last][1]
+
+    def __repr__(self):
+        return (type(self).__name__ + '(' +
+                ', '.join(field + '=' + repr(getattr(self, field))
+                          for field in self.fields) + ')')
+
+
+class Program(Node):
+    __slots__ = fields = ('classes',)
+
+
+class Class(Node):
+    __slots__ = fields = ('name', 'parent', 'features')
+
+
+class Method(Node):
+    __slots__ = fields = ('name', 'formals', 'return_type', 'body')
+
+
+class Attribute(Node):
+    __slots__ = fields = ('name', 'type', 'init')
+
+
+class Formal(Node):
+    __slots__ = fields = ('name', 'type')
+
+
+class Assign(Node):
+    __slots__ = fields = ('name', 'expr')
+
+
+class Dispatch(Node):
+    __slots__ = fields = ('expr', 'static_type', 'method', 'args')
+
+
+class Call(Node):
+    __slots__ = fields = ('method', 'args')
+
+
+class If(Node):
+    __slots__ = fields = ('condition', 'then_expr', 'else_expr')
+
+
+class While(Node):
+    __slots__ = fields = ('condition', 'body')
+
+
+class Block(Node):
+    __slots__ = fields = ('exprs',)
+
+
+class Let(Node):
+    __slots__ = fields = ('bindings', 'body')
+
+
+class Binding(Node):
+    __slots__ = fields = ('name', 'type', 'init')
+
+
+class Case(Node):
+    __slots__ = fields = ('expr', 'branches')
+
+
+class Branch(Node):
+    __slots__ = fields = ('name', 'type', 'body')
+
+
+class New(Node):
+    __slots__ = fields = ('type',)
+
+
+class IsVoid(Node):
+    __slots__ = fields = ('expr',)
+
+
+class Not(Node):
+    __slots__ = fields = ('expr',)
+
+
+class Negate(Node):
+    __slots__ = fields = ('expr',)
+
+
+class BinaryOp(Node):
+    __slots__ = fields = ('operator', 'left', 'right')
+
+
+class Object(Node):
+    __slots__ = fields = ('name',)
+
+
+class Integer(Node):
+    __slots__ = fields = ('token',)
+
+
+class String(Node):
+    __slots__ = fields = ('token',)
+
+
+class Boolean(Node):
+    __slots__ = fields = ('value',)
+
+
+# every node class, in the order of their codes in the flat array encoding
+node_classes = [Program, Class, Method, Attribute, Formal, Assign, Dispatch,
+                Call, If, While, Block, Let, Binding, Case, Branch, New, IsVoid,
+                Not, Negate, BinaryOp, Object, Integer, String, Boolean]
+node_codes = dict((node_class, code)
+                  for code, node_class in enumerate(node_classes))
+
+
+'''
+This class builds the abstract syntax tree of a program from its tokens. It is
+only ever given the tokens of a program the parser has accepted without errors,
+so it needs no error recovery. Binary operators are parsed by precedence
+climbing, which makes them left associative, as in COOL. Expressions are built
+without recursion, so the depth of the tree is not bounded by the recursion
+limit.
+'''
+class TreeBuilder:
+    '''
+    :param tokens: the list of tokens of an error-free program
+    '''
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.token_index = 0
+
+    '''
+    This method returns the type of the current token.
+    '''
+    def peek(self):
+        return self.tokens[self.token_index][0]
+
+    '''
+    This method consumes the current token, which must be of the given type.
+
+    :param token: the expected token type
+    :returns: the index of the consumed token
+    '''
+    def take(self, token):
+        index = self.token_index
+        if self.tokens[index][0] != token:
+            raise ValueError('Unexpected token ' + repr(self.tokens[index]) +
+                             ' while building the tree; expected \'' + token +
+                             '\'.')
+        self.token_index = index + 1
+        return index
+
+    '''
+    This method consumes an identifier, and returns its interned name.
+    '''
+    def take_name(self, token):
+        return sys.intern(self.tokens[self.take(token)][2])
+
+    def program(self):
+        classes = []
+        while self.peek() != 'eof':
+            classes.append(self.class_())
+        return Program(0, max(0, self.token_index - 1), classes)
+
+    def class_(self):
+        first = self.take('class')
+        name = self.take_name('type_id')
+        parent = None
+        if self.peek() == 'inherits':
+            self.take('inherits')
+            parent = self.take_name('type_id')
+        self.take('{')
+        features = []
+        while self.peek() != '}':
+            features.append(self.feature())
+        self.take('}')
+        last = self.take(';')
+        return Class(first, last, name, parent, features)
+
+    def feature(self):
+        first = self.token_index
+        name = self.take_name('obj_id')
+        if self.peek() == '(':
+            self.take('(')
+            formals = []
+            while self.peek() != ')':
+                if formals:
+                    self.take(',')
+                formal_first = self.token_index
+                formal_name = self.take_name('obj_id')
+                self.take(':')
+                formal_type = self.take_name('type_id')
+                formals.append(Formal(formal_first, self.token_index - 1,
+                                      formal_name, formal_type))
+            self.take(')')
+            self.take(':')
+            return_type = self.take_name('type_id')
+            self.take('{')
+            body = self.expr()
+            self.take('}')
+            last = self.take(';')
+            return Method(first, last, name, formals, return_type, body)
+        self.take(':')
+        attribute_type = self.take_name('type_id')
+        init = None
+        if self.peek() == '<-':
+            self.take('<-')
+            init = self.expr()
+        last = self.take(';')
+        return Attribute(first, last, name, attribute_type, init)
+
+    '''
+    This method builds an expression. Expressions nest arbitrarily deep, so
+    they are built on an explicit stack rather than by recursion, like the
+    iterative expression engine of the parser: every rule that is waiting for
+    the value of a subexpression is kept on the stack as a list of its kind and
+    the parts gathered so far, with the innermost rule last. The tree is built
+    in two alternating steps, opening subexpressions until a complete value is
+    found, and handing that value to the rules waiting for it, until one of
+    them needs another subexpression.
+
+    :returns: the node of the expression
+    '''
+    def expr(self):
+        stack = []
+        mode = 'expr'
+        while True:
+            value = None
+            while value is None:
+                mode, value = self.open(mode, stack)
+            while mode is None:
+                if not stack:
+                    return value
+                mode, value = self.close(stack, value)
+
+    '''
+    This method consumes the tokens at the start of an expression, up to its
+    first subexpression or to its end. The mode tells which rule the
+    expression is parsed with: 'expr' for any expression, 'not' for the operand
+    of 'not', which cannot be an assignment, 'unary' for an operand of a binary
+    operator, and 'negation' for the operand of '~', which cannot start with
+    'isvoid'.
+
+    :param mode: the rule the expression is parsed with
+    :param stack: the rules waiting for the value of a subexpression
+    :returns: a (mode, None) pair with the rule of the next subexpression, or a
+              (None, node) pair if the expression is complete
+    '''
+    def open(self, mode, stack):
+        first = self.token_index
+        token = self.peek()
+        if (mode == 'expr' and token == 'obj_id' and
+                self.tokens[first + 1][0] == '<-'):
+            name = self.take_name('obj_id')
+            self.take('<-')
+            stack.append(['assign', first, name])
+            return 'expr', None
+        if mode == 'expr' or mode == 'not':
+            if token == 'not':
+                self.take('not')
+                stack.append(['not', first])
+                return 'not', None
+            stack.append(['binary', 1, None, None])
+            return 'unary', None
+        if mode == 'unary' and token == 'isvoid':
+            self.take('isvoid')
+            stack.append(['isvoid', first])
+            return 'unary', None
+        if token == '~':
+            self.take('~')
+            stack.append(['negate', first])
+            return 'negation', None
+
+        # dynamic dispatches come first, followed by static dispatches
+        stack.append(['dispatches', False])
+        if token == '(':
+            self.take('(')
+            stack.append(['parentheses'])
+            return 'expr', None
+        if token == 'obj_id':
+            name = self.take_name('obj_id')
+            if self.peek() == '(':
+                return self.open_arguments(stack, ['call', first, name, []])
+            return None, Object(first, first, name)
+        if token == 'if':
+            self.take('if')
+            stack.append(['if', first, []])
+            return 'expr', None
+        if token == 'while':
+            self.take('while')
+            stack.append(['while', first, []])
+            return 'expr', None
+        if token == '{':
+            self.take('{')
+            stack.append(['block', first, []])
+            return 'expr', None
+        if token == 'let':
+            self.take('let')
+            frame = ['let', first, [], None]
+            stack.append(frame)
+            return self.open_binding(frame), None
+        if token == 'case':
+            self.take('case')
+            stack.append(['case', first, None, [], None])
+            return 'expr', None
+        if token == 'new':
+            self.take('new')
+            return None, New(first, first + 1, self.take_name('type_id'))
+        if token == 'integer':
+            return None, Integer(first, first, self.take('integer'))
+        if token == 'string':
+            return None, String(first, first, self.take('string'))
+        if token in ['true', 'false']:
+            self.take(token)
+            return None, Boolean(first, first, token == 'true')
+        raise ValueError('Unexpected token ' + repr(self.tokens[first]) +
+                         ' while building the tree.')
+
+    '''
+    This method hands the value of a subexpression to the innermost rule
+    waiting for it, and consumes the tokens that follow it, up to the next
+    subexpression of the rule or to its end.
+
+    :param stack: the rules waiting for the value of a subexpression
+    :param value: the node of the subexpression
+    :returns: a (mode, None) pair with the rule of the next subexpression, or a
+              (None, node) pair if the innermost rule is complete, in which
+              case it has been popped off the stack
+    '''
+    def close(self, stack, value):
+        frame = stack[-1]
+        kind = frame[0]
+        if kind == 'binary':
+            precedence, left, operator = frame[1:]
+            if operator is not None:
+                value = BinaryOp(left.first, value.last, operator, left, value)
+            operator = self.peek()
+            if binary_operators.get(operator, 0) >= precedence:
+                self.take(operator)
+                frame[2] = value
+                frame[3] = operator
+                stack.append(['binary', binary_operators[operator] + 1, None,
+                              None])
+                return 'unary', None
+            stack.pop()
+            return None, value
+        if kind == 'dispatches':
+            if self.peek() == '.' and not frame[1]:
+                self.take('.')
+                static_type = None
+            elif self.peek() == '@':
+                frame[1] = True
+                self.take('@')
+                static_type = self.take_name('type_id')
+                self.take('.')
+            else:
+                stack.pop()
+                return None, value
+            method = self.take_name('obj_id')
+            return self.open_arguments(stack, ['dispatch', value, static_type,
+                                               method, []])
+        if kind == 'call' or kind == 'dispatch':
+            frame[-1].append(value)
+            if self.peek() != ')':
+                self.take(',')
+                return 'expr', None
+            stack.pop()
+            return None, self.close_arguments(frame)
+        if kind == 'parentheses':
+            self.take(')')
+            stack.pop()
+            return None, value
+        if kind == 'assign':
+            stack.pop()
+            return None, Assign(frame[1], value.last, frame[2], value)
+        if kind == 'not':
+            stack.pop()
+            return None, Not(frame[1], value.last, value)
+        if kind == 'isvoid':
+            stack.pop()
+            return None, IsVoid(frame[1], value.last, value)
+        if kind == 'negate':
+            stack.pop()
+            return None, Negate(frame[1], value.last, value)
+
+        first, values = frame[1], frame[2]
+        if kind == 'if':
+            values.append(value)
+            if len(values) == 1:
+                self.take('then')
+                return 'expr', None
+            if len(values) == 2:
+                self.take('else')
+                return 'expr', None
+            stack.pop()
+            return None, If(first, self.take('fi'), *values)
+        if kind == 'while':
+            values.append(value)
+            if len(values) == 1:
+                self.take('loop')
+                return 'expr', None
+            stack.pop()
+            return None, While(first, self.take('pool'), *values)
+        if kind == 'block':
+            values.append(value)
+            self.take(';')
+            if self.peek() != '}':
+                return 'expr', None
+            stack.pop()
+            return None, Block(first, self.take('}'), values)
+        if kind == 'let':
+            if frame[3] is None:
+                stack.pop()
+                return None, Let(first, value.last, values, value)
+            binding_first, name, binding_type = frame[3]
+            values.append(Binding(binding_first, self.token_index - 1, name,
+                                  binding_type, value))
+            return self.open_binding(frame), None
+        # case
+        if frame[2] is None:
+            frame[2] = value
+            self.take('of')
+        else:
+            branch_first, name, branch_type = frame[4]
+            frame[3].append(Branch(branch_first, self.take(';'), name,
+                                   branch_type, value))
+            if self.peek() == 'esac':
+                stack.pop()
+                return None, Case(first, self.take('esac'), frame[2], frame[3])
+        branch_first = self.token_index
+        name = self.take_name('obj_id')
+        self.take(':')
+        frame[4] = (branch_first, name, self.take_name('type_id'))
+        self.take('=>')
+        return 'expr', None
+
+    '''
+    This method consumes the opening parenthesis of the arguments of a call or
+    dispatch, and the closing one too if there are no arguments.
+
+    :param stack: the rules waiting for the value of a subexpression
+    :param frame: the rule of the call or dispatch, whose last part is the list
+                  of its arguments
+    :returns: a (mode, None) pair if the arguments have to be parsed, in which
+              case the rule has been pushed on the stack, or a (None, node)
+              pair with the call or dispatch
+    '''
+    def open_arguments(self, stack, frame):
+        self.take('(')
+        if self.peek() != ')':
+            stack.append(frame)
+            return 'expr', None
+        return None, self.close_arguments(frame)
+
+    '''
+    This method consumes the closing parenthesis of the arguments of a call or
+    dispatch, and builds its node.
+
+    :param frame: the rule of the call or dispatch
+    :returns: the node of the call or dispatch
+    '''
+    def close_arguments(self, frame):
+        last = self.take(')')
+        if frame[0] == 'call':
+            return Call(frame[1], last, frame[2], frame[3])
+        receiver = frame[1]
+        return Dispatch(receiver.first, last, receiver, frame[2], frame[3],
+                        frame[4])
+
+    '''
+    This method consumes the bindings of a let expression up to the next
+    initialisation, or up to its body. The binding whose initialisation is
+    parsed next is kept as the last part of the rule, which is None once the
+    body is parsed.
+
+    :param frame: the rule of the let expression
+    :returns: the mode of the next subexpression
+    '''
+    def open_binding(self, frame):
+        bindings = frame[2]
+        while not bindings or self.peek() == ',':
+            if bindings:
+                self.take(',')
+            binding_first = self.token_index
+            name = self.take_name('obj_id')
+            self.take(':')
+            binding_type = self.take_name('type_id')
+            if self.peek() == '<-':
+                self.take('<-')
+                frame[3] = (binding_first, name, binding_type)
+                return 'expr'
+            bindings.append(Binding(binding_first, self.token_index - 1, name,
+                                    binding_type, None))
+        self.take('in')
+        frame[3] = None
+        return 'expr'
+
+
+'''
+This function builds the abstract syntax tree of an error-free program.
+
+:param tokens: the list of tokens of the program
+:returns: the Program node at the root of the tree
+'''
+def build_tree(tokens):
+    return TreeBuilder(tokens).program()
+
+
+'''
+This function converts a tree into nested dictionaries and lists that can be
+written out as JSON. Each node becomes a dictionary with its type, its span,
+and its fields; literals are resolved to their values through the tokens. The
+tree is walked with an explicit stack, so deep trees do not exceed the
+recursion limit.
+
+:param node: the root of the tree
+:param tokens: the list of tokens the tree was built from
+:returns: the JSON-compatible representation of the tree
+'''
+def to_dict(node, tokens):
+    root = [None]
+    # the values still to be converted, each with the list or dictionary its
+    # conversion goes in and the index or key it goes at
+    stack = [(node, root, 0)]
+
+    while stack:
+        value, container, key = stack.pop()
+        if isinstance(value, list):
+            converted = [None] * len(value)
+            stack.extend((item, converted, index)
+                         for index, item in enumerate(value))
+        elif isinstance(value, Node):
+            converted = {'node': type(value).__name__,
+                         'span': [value.first, value.last]}
+            for field in value.fields:
+                field_value = getattr(value, field)
+                if field == 'token':
+                    converted['value'] = tokens[field_value][2]
+                else:
+                    # the key is added now, so the fields keep their order
+                    converted[field] = None
+                    stack.append((field_value, converted, field))
+        else:
+            converted = value
+        container[key] = converted
+
+    return root[0]
+
+
+'''
+This function serialises a tree to a JSON string. Most trees are written by
+json.dumps(), but it recurses once for every level of the tree, so a tree that
+goes past the recursion limit is written by write_json() instead.
+
+:param node: the root of the tree
+:param tokens: the list of tokens the tree was built from
+:returns: the JSON string
+'''
+def to_json(node, tokens):
+    converted = to_dict(node, tokens)
+    try:
+        return json.dumps(converted)
+    except RecursionError:
+        return write_json(converted)
+
+
+'''
+This function writes the JSON-compatible representation of a tree into the
+same text as json.dumps(), with an explicit stack rather than by recursion.
+
+:param converted: the representation of the tree, as given by to_dict()
+:returns: the JSON string
+'''
+def write_json(converted):
+    encode_string = json.encoder.encode_basestring_ascii
+    pieces = []
+    # the values still to be written, in reverse order, along with the
+    # punctuation around them, which is kept in tuples
+    stack = [converted]
+
+    while stack:
+        value = stack.pop()
+        value_class = value.__class__
+        if value_class is tuple:
+            pieces.append(value[0])
+        elif value_class is str:
+            pieces.append(encode_string(value))
+        elif value_class is int:
+            pieces.append(str(value))
+        elif value_class is dict:
+            pieces.append('{')
+            stack.append(('}',))
+            items = list(value.items())
+            for index in range(len(items) - 1, -1, -1):
+                key, item = items[index]
+                stack.append(item)
+                separator = ', ' if index > 0 else ''
+                stack.append((separator + encode_string(key) + ': ',))
+        elif value_class is list:
+            pieces.append('[')
+            stack.append((']',))
+            for index in range(len(value) - 1, -1, -1):
+                stack.append(value[index])
+                if index > 0:
+                    stack.append((', ',))
+        else:
+            # booleans and None
+            pieces.append(json.dumps(value))
+
+    return ''.join(pieces)
+
+
+'''
+This function encodes a tree as a flat array of integers, in preorder. Every
+value starts with a tag: a node is followed by its code, its span and its
+fields; a list by its length and its items; a name by its index in the string
+table; and a token by its index in the token list.
+
+:param node: the root of the tree
+:returns: an (array, strings) pair, where strings is the table of names
+'''
+def to_array(node):
+    encoded = array.array('i')
+    strings = []
+    string_indices = {}
+    # the values still to be encoded, in reverse order
+    stack = [node]
+
+    while stack:
+        value = stack.pop()
+        if isinstance(value, Node):
+            encoded.extend((node_tag, node_codes[type(value)], value.first,
+                            value.last))
+            stack.extend(reversed([getattr(value, field)
+                                   for field in value.fields]))
+        elif isinstance(value, list):
+            encoded.extend((list_tag, len(value)))
+            stack.extend(reversed(value))
+        elif isinstance(value, str):
+            if value not in string_indices:
+                string_indices[value] = len(strings)
+                strings.append(value)
+            encoded.extend((name_tag, string_indices[value]))
+        elif value is None:
+            encoded.append(none_tag)
+        else:
+            # token indices, and the values of booleans
+            encoded.extend((token_tag, int(value)))
+
+    return encoded, strings
+
+
+'''
+This function decodes a tree from its flat array encoding, with an explicit
+stack rather than by recursion, like to_dict().
+
+:param encoded: the array produced by to_array()
+:param strings: the table of names produced by to_array()
+:returns: the root of the tree
+'''
+def from_array(encoded, strings):
+    position = 0
+    # the nodes and lists being decoded, innermost last, each as its class (or
+    # list), its span, the values decoded so far and the number of its values
+    stack = []
+
+    while True:
+        tag = encoded[position]
+        if tag == node_tag:
+            code, first, last = encoded[position + 1:position + 4]
+            position = position + 4
+            node_class = node_classes[code]
+            stack.append((node_class, first, last, [],
+                          len(node_class.fields)))
+            continue
+        if tag == list_tag:
+            length = encoded[position + 1]
+            position = position + 2
+            if length > 0:
+                stack.append((list, 0, 0, [], length))
+                continue
+            value = []
+        elif tag == name_tag:
+            value = strings[encoded[position + 1]]
+            position = position + 2
+        elif tag == none_tag:
+            value = None
+            position = position + 1
+        else:
+            value = encoded[position + 1]
+            position = position + 2
+
+        # hand the value to the node or list it belongs to, and to the ones
+        # that are complete along with it
+        while stack:
+            values = stack[-1][3]
+            values.append(value)
+            if len(values) < stack[-1][4]:
+                break
+            node_class, first, last, values, count = stack.pop()
+            if node_class is list:
+                value = values
+            else:
+                if node_class is Boolean:
+                    values = [bool(values[0])]
+                value = node_class(first, last, *values)
+        else:
+            return value
@@ -0,0 +1,472 @@
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import time
+
+import coolcache
+import coolparser
+
+# the parser used by the current worker process; it is created once per worker,
+# when the worker starts, and reused for every file the worker is given
+worker_parser = None
+# the parse cache used by the current worker process, if caching is enabled
+worker_cache = None
+# the limits that can be set on every file, by name, as in
+# coolparser.limit_messages, with the command line option of each
+limit_options = [('size', '--max-size'), ('tokens', '--max-tokens'),
+                 ('depth', '--max-depth'), ('errors', '--max-errors'),
+                 ('seconds', '--timeout')]
+# the number of slowest files listed in the summary
+slowest_files = 5
+
+
+'''
+This function expands the paths given on the command line into a list of COOL
+files. Directories are searched recursively for .cl files, and anything that is
+neither a file nor a directory is treated as a glob pattern. Every file is only
+listed once, in the order in which it was first found. A path that matches no
+file at all is an error, rather than an empty batch, so a mistyped path does not
+go unnoticed.
+
+:param paths: the files, directories and glob patterns to expand
+:returns: the list of file names
+:raises ValueError: if one of the paths matches no file
+'''
+def expand_paths(paths):
+    filenames = []
+    seen = set()
+
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for directory, subdirectories, files in os.walk(path):
+                subdirectories.sort()
+                for name in sorted(files):
+                    if name.endswith('.cl'):
+                        found.append(os.path.join(directory, name))
+        elif os.path.isfile(path):
+            found = [path]
+        else:
+            found = sorted(glob.glob(path, recursive=True))
+        if not found:
+            raise ValueError('no COOL files match \'' + path + '\'')
+        for filename in found:
+            if filename not in seen:
+                seen.add(filename)
+                filenames.append(filename)
+
+    return filenames
+
+
+'''
+This function prepares a worker process, by creating the parser (and the cache,
+if one is used) it will use for all of its files.
+
+:param engine: the scanning engine to use
+:param cache_directory: the directory of the parse cache, or None to disable
+                        caching
+:param cache_bytes: the maximum size of the parse cache
+:param fail_fast: whether to stop every file at its first error
+:param limits: the limits on every file, as a dictionary from the names in
+               limit_options to their values, or None; they are part of the
+               version of the cache, so cached results were limited alike
+'''
+def start_worker(engine, cache_directory=None,
+                 cache_bytes=coolcache.default_max_bytes, fail_fast=False,
+                 limits=None):
+    global worker_parser
+    global worker_cache
+    if limits is None:
+        limits = {}
+    lexer = coolparser.Lexer(engine, max_size=limits.get('size'),
+                             max_tokens=limits.get('tokens'),
+                             max_seconds=limits.get('seconds'))
+    # a parse that fails fast stops at its first error anyway
+    max_errors = None
+    if not fail_fast:
+        max_errors = limits.get('errors')
+    worker_parser = coolparser.Parser(lexer=lexer, fail_fast=fail_fast,
+                                      max_errors=max_errors,
+                                      max_depth=limits.get('depth'))
+    worker_cache = None
+    if cache_directory is not None:
+        worker_cache = coolcache.ParseCache(cache_directory, cache_bytes,
+                                            parser=worker_parser)
+
+
+'''
+This function parses a single file in a worker process, and turns the outcome
+into a dictionary that can be written out as JSON. Files that cannot be parsed
+at all (e.g. unreadable files) are reported with the exception raised, and
+files that go over a limit of the parser with the limit, instead of stopping
+the whole batch.
+
+:param filename: the name of the file to parse
+:param text: the text of the program, if it is parsed from memory instead of
+             from the file; the file name is then only used in the outcome
+:returns: a dictionary describing the outcome
+'''
+def parse_one(filename, text=None):
+    start = time.perf_counter()
+    cached = None
+    try:
+        if text is not None:
+            result = worker_parser.parse(io.StringIO(text))
+        elif worker_cache is None:
+            result = worker_parser.parse_file(filename)
+        else:
+            result, cached = worker_cache.parse_file(worker_parser, filename)
+    except coolparser.LimitExceeded as exception:
+        return get_limit_outcome(filename, exception, start)
+    except Exception as exception:
+        return get_failure(filename, exception, start)
+    return get_outcome(filename, result, start, cached,
+                       worker_parser.max_errors)
+
+
+'''
+This function turns the result of a file into its outcome dictionary.
+
+:param filename: the name of the file
+:param result: the ParseResult of the file
+:param start: the time at which the file started to be parsed, as given by
+              time.perf_counter()
+:param cached: whether the result came from the parse cache, or None if no
+               cache is used
+:param max_errors: the limit on the number of errors of the parser, if any;
+                   the outcome of a parse that stopped there names the limit
+:returns: the outcome dictionary
+'''
+def get_outcome(filename, result, start, cached=None, max_errors=None):
+    outcome = {'file': filename, 'ok': result.ok(), 'errors': result.errors}
+    if cached is not None:
+        outcome['cached'] = cached
+    if (max_errors is not None and result.errors and
+            result.errors[-1].startswith('Too many errors')):
+        outcome['limit'] = 'errors'
+        outcome['maximum'] = max_errors
+    if result.ok():
+        outcome['classes'] = [{'name': name, 'methods': methods}
+                              for name, methods in zip(result.classes,
+                                                       result.methods)]
+    outcome['seconds'] = round(time.perf_counter() - start, 6)
+    return outcome
+
+
+'''
+This function gives the outcome of a file that could not be parsed at all.
+
+:param filename: the name of the file
+:param exception: the exception raised
+:param start: the time at which the file started to be parsed, as given by
+              time.perf_counter()
+:returns: the outcome dictionary
+'''
+def get_failure(filename, exception, start):
+    return {'file': filename, 'ok': False, 'errors': [],
+            'exception': type(exception).__name__ + ': ' + str(exception),
+            'seconds': round(time.perf_counter() - start, 6)}
+
+
+'''
+This function gives the outcome of a file that went over one of the limits on
+every file, which holds the name and the value of the limit, and the message
+of the exception.
+
+:param filename: the name of the file
+:param exception: the LimitExceeded exception raised
+:param start: the time at which the file started to be parsed, as given by
+              time.perf_counter()
+:returns: the outcome dictionary
+'''
+def get_limit_outcome(filename, exception, start):
+    return {'file': filename, 'ok': False, 'errors': [],
+            'limit': exception.limit, 'maximum': exception.maximum,
+            'message': str(exception),
+            'seconds': round(time.perf_counter() - start, 6)}
+
+
+'''
+This function parses the given files across a pool of worker processes, and
+yields their outcomes as soon as each file is finished, so the outcomes are not
+necessarily in the order of the files. The workers are supervised by a watchdog
+(see coolwatchdog), even with a single job, so a worker that dies, or that goes
+over the time limit, only costs the outcome of its own file.
+
+:param filenames: the names of the files to parse
+:param jobs: the number of worker processes; defaults to the number of cores
+:param engine: the scanning engine to use
+:param cache_directory: the directory of the parse cache, or None to disable
+                        caching
+:param cache_bytes: the maximum size of the parse cache
+:param fail_fast: whether to stop every file at its first error, which is then
+                  the only one reported; the results are not cached
+:param pipeline: whether to parse the files in this process, in a pipeline of
+                 threads that reads the next files while parsing the current
+                 one (see coolpipeline), instead of in worker processes; the
+                 results are not cached, and the outcomes are in the order of
+                 the files
+:param metrics: a dictionary that is filled with the metrics of the pipeline,
+                or of the watchdog, once the last outcome has been produced
+:param limits: the limits on every file, as a dictionary from the names in
+               limit_options to their values, or None; the pipeline does not
+               take any
+:returns: a generator of outcome dictionaries, as returned by parse_one()
+'''
+def run_batch(filenames, jobs=None, engine=None, cache_directory=None,
+              cache_bytes=coolcache.default_max_bytes, fail_fast=False,
+              pipeline=False, metrics=None, limits=None):
+    if pipeline:
+        import coolpipeline
+        stages = coolpipeline.Pipeline(filenames, engine, fail_fast)
+        yield from stages.run()
+        if metrics is not None:
+            metrics.update(stages.get_metrics())
+        return
+    if fail_fast:
+        cache_directory = None
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(filenames)))
+    arguments = (engine, cache_directory, cache_bytes, fail_fast, limits)
+
+    import coolwatchdog
+    timeout = None
+    if limits is not None:
+        timeout = limits.get('seconds')
+    watchdog = coolwatchdog.Watchdog(jobs, arguments, timeout)
+    yield from watchdog.run(filenames)
+    if metrics is not None:
+        metrics.update(watchdog.get_metrics())
+
+
+'''
+This function writes the outcome of a file to the output, either as a single
+line of JSON, or in the format of the single file parser, preceded by the name
+of the file.
+
+:param outcome: the outcome dictionary of the file
+:param output_format: 'jsonl' or 'text'
+:param output: the stream to write to
+'''
+def write_outcome(outcome, output_format, output):
+    if output_format == 'jsonl':
+        output.write(json.dumps(outcome) + '\n')
+        return
+
+    output.write('==> ' + outcome['file'] + ' <==\n')
+    output.write('\n'.join(format_outcome(outcome)) + '\n')
+
+
+'''
+This function formats the outcome of a file as the single file parser would
+print it.
+
+:param outcome: the outcome dictionary of the file
+:returns: the list of output lines
+'''
+def format_outcome(outcome):
+    if 'exception' in outcome:
+        return ['Could not parse file: ' + outcome['exception']]
+    if 'message' in outcome:
+        return ['Could not parse file: ' + outcome['message']]
+    result = coolparser.ParseResult([], [], [], [], [], outcome['errors'])
+    if outcome['ok']:
+        result.classes = [entry['name'] for entry in outcome['classes']]
+        result.methods = [entry['methods'] for entry in outcome['classes']]
+        return coolparser.format_file_structure(result)
+    return coolparser.format_errors(result)
+
+
+'''
+This function gathers the summary of a batch run: the number of files, how many
+of them had errors, how many errors of each kind were found, how many files
+went over each limit, the throughput, the cache hits and misses, if a cache was
+used, and the latency of the files, down to the slowest ones.
+
+:param outcomes: the outcome dictionaries of the files
+:param seconds: the wall time of the run
+:returns: the summary dictionary
+'''
+def summarise(outcomes, seconds):
+    summary = {'files': len(outcomes), 'ok': 0, 'failed': 0, 'exceptions': 0,
+               'lexical_errors': 0, 'syntax_errors': 0,
+               'seconds': round(seconds, 3)}
+    for outcome in outcomes:
+        if outcome['ok']:
+            summary['ok'] = summary['ok'] + 1
+        else:
+            summary['failed'] = summary['failed'] + 1
+        if 'exception' in outcome:
+            summary['exceptions'] = summary['exceptions'] + 1
+        if 'limit' in outcome:
+            limits = summary.setdefault('limits', {})
+            limits[outcome['limit']] = limits.get(outcome['limit'], 0) + 1
+        if 'cached' in outcome:
+            if outcome['cached']:
+                summary['cache_hits'] = summary.get('cache_hits', 0) + 1
+            else:
+                summary['cache_misses'] = summary.get('cache_misses', 0) + 1
+        for error in outcome['errors']:
+            if error.startswith('Lexical error'):
+                summary['lexical_errors'] = summary['lexical_errors'] + 1
+            else:
+                summary['syntax_errors'] = summary['syntax_errors'] + 1
+    if seconds > 0:
+        summary['files_per_second'] = round(len(outcomes) / seconds, 1)
+    else:
+        summary['files_per_second'] = None
+    latency = get_latency([outcome['seconds'] for outcome in outcomes])
+    if latency is not None:
+        summary['latency'] = latency
+        slowest = sorted(outcomes, key=lambda outcome: outcome['seconds'],
+                         reverse=True)[:slowest_files]
+        summary['slowest'] = [{'file': outcome['file'],
+                               'seconds': outcome['seconds']}
+                              for outcome in slowest]
+    return summary
+
+
+'''
+This function summarises latencies by their mean, their median, their tail
+percentiles and their maximum.
+
+:param latencies: the latencies, in seconds
+:returns: the summary dictionary, or None if there are no latencies
+'''
+def get_latency(latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return None
+    count = len(latencies)
+    return {'mean': round(sum(latencies) / count, 6),
+            'p50': round(latencies[count // 2], 6),
+            'p90': round(latencies[count * 90 // 100], 6),
+            'p99': round(latencies[count * 99 // 100], 6),
+            'max': round(latencies[-1], 6)}
+
+
+'''
+This function adds the options of the limits on every file to a command line
+parser. The depth of a file is how many expressions are nested in one another
+in it, such as the arguments of a call, the parts of a block or an expression
+in parentheses; a method body or an attribute initializer has depth 1, and
+chains of operators or dispatches do not add to it. It is counted the same way
+by every engine.
+
+:param argument_parser: the argparse.ArgumentParser
+'''
+def add_limit_arguments(argument_parser):
+    argument_parser.add_argument('--max-size', type=int, default=None,
+                                 help='the number of characters that a file '
+                                      'may have')
+    argument_parser.add_argument('--max-tokens', type=int, default=None,
+                                 help='the number of tokens that a file may '
+                                      'have')
+    argument_parser.add_argument('--max-depth', type=int, default=None,
+                                 help='the number of expressions that may be '
+                                      'nested in one another in a file')
+    argument_parser.add_argument('--max-errors', type=int, default=None,
+                                 help='stop parsing a file after this many '
+                                      'errors')
+    argument_parser.add_argument('--timeout', type=float, default=None,
+                                 help='the time that a file may take, in '
+                                      'seconds')
+
+
+'''
+This function gathers the limits on every file from the parsed command line.
+
+:param arguments: the parsed command line, with the options added by
+                  add_limit_arguments()
+:returns: the dictionary from the names in limit_options to the limits set, or
+          None if none is
+'''
+def get_limits(arguments):
+    limits = {}
+    for name, option in limit_options:
+        value = getattr(arguments, option[2:].replace('-', '_'))
+        if value is not None:
+            limits[name] = value
+    return limits or None
+
+
+'''
+This function runs the batch command line: it parses every file found in the
+given paths, streams the outcomes to standard output as they finish, and writes
+the summary to standard error.
+
+:param arguments: the command line arguments; defaults to sys.argv
+:returns: the exit status, 1 if any file had errors, 0 otherwise
+'''
+def main(arguments=None):
+    argument_parser = argparse.ArgumentParser(
+        description='Scan and parse many COOL programs in parallel.')
+    argument_parser.add_argument('paths', nargs='+',
+                                 help='COOL files, directories or globs')
+    argument_parser.add_argument('-j', '--jobs', type=int, default=None,
+                                 help='the number of worker processes '
+                                      '(defaults to the number of cores)')
+    argument_parser.add_argument('--format', choices=['jsonl', 'text'],
+                                 default='jsonl', dest='output_format',
+                                 help='the format of the per-file outcomes')
+    argument_parser.add_argument('--scanner',
+                                 choices=coolparser.scanner_engines,
+                                 default=coolparser.scanner_engine,
+                                 help='the scanning engine to use')
+    argument_parser.add_argument('--cache', metavar='DIRECTORY',
+                                 help='cache parse results in this directory')
+    argument_parser.add_argument('--cache-size', type=int,
+                                 default=coolcache.default_max_bytes // 2 ** 20,
+                                 help='the maximum size of the cache, in MB')
+    argument_parser.add_argument('--fail-fast', action='store_true',
+                                 help='stop every file at its first error, '
+                                      'and only report that one')
+    argument_parser.add_argument('--pipeline', action='store_true',
+                                 help='read, scan and parse the files in '
+                                      'overlapping stages in this process, '
+                                      'and report the metrics of the stages')
+    add_limit_arguments(argument_parser)
+    arguments = argument_parser.parse_args(arguments)
+    limits = get_limits(arguments)
+    if arguments.fail_fast and arguments.cache is not None:
+        argument_parser.error('--fail-fast cannot be combined with --cache')
+    if arguments.pipeline and arguments.cache is not None:
+        argument_parser.error('--pipeline cannot be combined with --cache')
+    if arguments.pipeline and arguments.jobs is not None:
+        argument_parser.error('--pipeline cannot be combined with --jobs')
+    if arguments.pipeline and limits is not None:
+        argument_parser.error('--pipeline cannot be combined with limits')
+    if arguments.max_errors is not None and arguments.fail_fast:
+        argument_parser.error('--max-errors cannot be combined with '
+                              '--fail-fast')
+
+    try:
+        filenames = expand_paths(arguments.paths)
+    except ValueError as exception:
+        argument_parser.error(str(exception))
+    outcomes = []
+    metrics = {}
+    start = time.perf_counter()
+    for outcome in run_batch(filenames, arguments.jobs, arguments.scanner,
+                             arguments.cache, arguments.cache_size * 2 ** 20,
+                             arguments.fail_fast, arguments.pipeline,
+                             metrics, limits):
+        write_outcome(outcome, arguments.output_format, sys.stdout)
+        sys.stdout.flush()
+        outcomes.append(outcome)
+    summary = summarise(outcomes, time.perf_counter() - start)
+    if arguments.pipeline:
+        summary['pipeline'] = metrics
+    elif metrics:
+        summary['watchdog'] = metrics
+    sys.stderr.write(json.dumps({'summary': summary}) + '\n')
+
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import hashlib
+import importlib.util
+import io
+import marshal
+import os
+import tempfile
+import zlib
+
+import coolparser
+import cooltables
+
+# the default maximum size of a cache directory, in bytes
+default_max_bytes = 256 * 1024 * 1024
+# the cache directory is allowed to shrink to this fraction of its maximum size
+# when entries are evicted, such that eviction does not happen on every store
+eviction_ratio = 0.9
+# the layout of the entries, which is part of the version, such that entries
+# stored with another layout are never read
+entry_format = 2
+# the modules whose source decides the result of a parse: the parser (whose
+# coolparser script only runs it), the generated scanner tables, the vector
+# scanner and the table engine
+source_modules = ['coolcore', 'cooltables', 'coolvector', 'coolgrammar']
+
+
+'''
+This function computes the version of the scanner rules and grammar, which is
+part of the key of every cache entry. It covers the scanning engine, the lists
+the scanner rules are built from, the master scanner pattern, the source of
+every module that takes part in a parse and the layout of the entries, along
+with the options of the parser, if it is given, so any change to the way files
+are scanned or parsed invalidates the whole cache. The modules are only located,
+not imported, so the vector scanner does not need NumPy to be hashed.
+
+:param engine: the scanning engine used to parse the files
+:param parser: the parser the files are parsed with, or None to leave its
+               options out
+:returns: the version, as a hexadecimal string
+'''
+def get_version(engine, parser=None):
+    digest = hashlib.sha256()
+    digest.update(repr((engine, coolparser.keyword_matches,
+                        coolparser.exact_matches,
+                        coolparser.escaped_matches,
+                        entry_format)).encode('utf-8'))
+    digest.update(cooltables.scanner_pattern.encode('utf-8'))
+    for name in source_modules:
+        with open(importlib.util.find_spec(name).origin, 'rb') as source_file:
+            digest.update(source_file.read())
+    if parser is not None:
+        digest.update(repr(get_options(parser)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+'''
+This function gathers the options of a parser that change the result it gives
+for a file: the expression engine, the grammar of the table engine, the error
+recovery, whether it fails fast, and the limits on every file. The grammar is
+given by a hash of its contents, so editing the grammar file changes it too.
+
+:param parser: the parser
+:returns: the tuple of the options
+'''
+def get_options(parser):
+    grammar = None
+    if parser.grammar is not None:
+        with open(parser.grammar, 'rb') as grammar_file:
+            grammar = hashlib.sha256(grammar_file.read()).hexdigest()
+    lexer = parser.lexer
+    return (parser.expressions, grammar, parser.recovery, parser.fail_fast,
+            parser.max_errors, parser.max_depth, lexer.max_size,
+            lexer.max_tokens, lexer.max_seconds)
+
+
+'''
+This function turns a parse result into the fields of a cache entry, which are
+only made of the types that marshal can store: the arrays of the tokens are
+stored as bytes.
+
+:param result: the ParseResult
+:returns: the tuple of the fields
+'''
+def pack_result(result):
+    tokens = result.tokens
+    if tokens is not None:
+        tokens = (tokens.kinds.tobytes(), tokens.rows.tobytes(),
+                  tokens.columns.tobytes(), tokens.values.tobytes(),
+                  tokens.offsets.tobytes(), tokens.strings)
+    return (tokens, result.line_starts, result.classes, result.methods,
+            result.errors)
+
+
+'''
+This function turns the fields of a cache entry back into a parse result.
+
+:param fields: the tuple of the fields, as given by pack_result()
+:returns: the ParseResult
+'''
+def unpack_result(fields):
+    packed, line_starts, classes, methods, errors = fields
+    tokens = None
+    token_offsets = None
+    if packed is not None:
+        tokens = coolparser.TokenStore()
+        for column, data in zip([tokens.kinds, tokens.rows, tokens.columns,
+                                 tokens.values, tokens.offsets], packed):
+            column.frombytes(data)
+        tokens.strings = packed[5]
+        tokens.string_indices = {value: index for index, value
+                                 in enumerate(tokens.strings)}
+        token_offsets = tokens.offsets
+    return coolparser.ParseResult(tokens, token_offsets, line_starts, classes,
+                                  methods, errors)
+
+
+'''
+This class is an on-disk cache of parse results, keyed by a hash of the contents
+of each file and the version of the scanner rules and grammar. Each entry is a
+compressed binary file holding the tokens, offsets, classes, methods and errors
+of a file. Entries are touched whenever they are read, and the least recently
+used ones are evicted once the cache grows beyond its maximum size. Entries are
+stored with marshal rather than pickle, so reading one never runs any code;
+still, anyone who can write to the directory can forge the results of files,
+so it must only be writable by trusted users.
+'''
+class ParseCache:
+    '''
+    :param directory: the directory holding the cache entries; it is created
+                      if it does not exist
+    :param max_bytes: the maximum total size of the entries
+    :param engine: the scanning engine used to parse the files; defaults to
+                   the engine of the parser, if it is given, and otherwise to
+                   the module-level scanner_engine setting of the parser
+    :param parser: the parser given to parse_file(), whose options are part of
+                   the version, or None to leave them out
+    '''
+    def __init__(self, directory, max_bytes=default_max_bytes, engine=None,
+                 parser=None):
+        if engine is None and parser is not None:
+            engine = parser.lexer.engine
+        if engine is None:
+            engine = coolparser.scanner_engine
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.engine = engine
+        self.version = get_version(engine, parser)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for path, size, used in self.entries())
+
+    '''
+    This method lists the entries of the cache.
+
+    :returns: a list of (path, size, last_used) tuples
+    '''
+    def entries(self):
+        found = []
+        for directory, subdirectories, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.bin'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    status = os.stat(path)
+                except OSError:
+                    continue
+                found.append((path, status.st_size, status.st_mtime))
+        return found
+
+    '''
+    This method computes the path of the entry of a file.
+
+    :param content: the contents of the file, as bytes
+    :returns: the path of the entry
+    '''
+    def get_path(self, content):
+        digest = hashlib.sha256(self.version.encode('ascii'))
+        digest.update(content)
+        key = digest.hexdigest()
+        return os.path.join(self.directory, key[:2], key + '.bin')
+
+    '''
+    This method loads the entry at the given path, and marks it as used.
+
+    :param path: the path of the entry
+    :returns: the cached ParseResult, or None if there is no usable entry
+    '''
+    def load(self, path):
+        try:
+            with open(path, 'rb') as entry_file:
+                data = entry_file.read()
+            result = unpack_result(marshal.loads(zlib.decompress(data)))
+            os.utime(path)
+        except (OSError, EOFError, zlib.error, ValueError, TypeError):
+            return None
+        return result
+
+    '''
+    This method stores a parse result at the given path. The entry is written
+    to a temporary file first and then moved into place, so readers never see
+    a partial entry, even when several processes share the cache.
+
+    :param path: the path of the entry
+    :param result: the ParseResult to store
+    '''
+    def store(self, path, result):
+        data = zlib.compress(marshal.dumps(pack_result(result)), 1)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(handle, 'wb') as entry_file:
+            entry_file.write(data)
+        os.replace(temporary_path, path)
+        self.total_bytes = self.total_bytes + len(data)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    '''
+    This method deletes the least recently used entries, until the cache is
+    back under its maximum size.
+    '''
+    def evict(self):
+        entries = self.entries()
+        entries.sort(key=lambda entry: entry[2])
+        self.total_bytes = sum(size for path, size, used in entries)
+        target = self.max_bytes * eviction_ratio
+        for path, size, used in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.total_bytes = self.total_bytes - size
+
+    '''
+    This method parses the file with the given name, unless a result for the
+    same contents is already cached, in which case scanning and parsing are
+    skipped entirely.
+
+    :param parser: the parser to use on a cache miss
+    :param filename: the name of the file to be parsed
+    :returns: a (result, cached) pair, where cached is True on a cache hit
+    '''
+    def parse_file(self, parser, filename):
+        with open(filename, 'rb') as input_file:
+            content = input_file.read()
+        path = self.get_path(content)
+
+        result = self.load(path)
+        if result is not None:
+            self.hits = self.hits + 1
+            return result, True
+
+        self.misses = self.misses + 1
+        # decode the contents the same way as a file opened in text mode
+        result = parser.parse(io.TextIOWrapper(io.BytesIO(content)))
+        self.store(path, result)
+        return result, False
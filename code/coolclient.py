@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import socket
+import sys
+
+# the client is started once per file by build tools, so it only imports what
+# it needs to talk to a running parse server (see coolserver), and leaves the
+# scanner and parser to the server
+
+
+'''
+This function builds the default path of the socket of the parse server, which
+is private to the current user. It is placed in the temporary directory given by
+the environment, without importing tempfile, which is slow to import.
+
+:returns: the path of the socket
+'''
+def default_socket_path():
+    return os.path.join(os.environ.get('TMPDIR') or '/tmp',
+                        'coolparser-' + str(os.getuid()) + '.sock')
+
+
+'''
+This class is a connection to a parse server. Requests are sent one line of
+JSON at a time, and each response is read back as a line of JSON.
+'''
+class Client:
+    '''
+    :param path: the path of the socket of the server; defaults to
+                 default_socket_path()
+    '''
+    def __init__(self, path=None):
+        if path is None:
+            path = default_socket_path()
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.stream = self.socket.makefile('rwb')
+        self.next_id = 0
+
+    '''
+    This method sends a request to the server and waits for its response.
+
+    :param request: the request dictionary, without its id
+    :returns: the response dictionary
+    '''
+    def request(self, request):
+        self.next_id = self.next_id + 1
+        request = dict(request, id=self.next_id)
+        self.stream.write(json.dumps(request).encode('utf-8') + b'\n')
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError('The parse server closed the connection.')
+        return json.loads(line)
+
+    def close(self):
+        self.stream.close()
+        self.socket.close()
+
+
+'''
+This function runs the client command line: it asks a running parse server to
+parse the given files, and prints the outcome of each of them the way the
+single file parser does, preceded by the name of the file if there are several.
+
+:param arguments: the command line arguments; defaults to sys.argv
+:returns: the exit status: 0 if every file was parsed without errors, 1 if any
+          file had errors, 2 if the server could not be reached
+'''
+def main(arguments=None):
+    argument_parser = argparse.ArgumentParser(
+        description='Parse COOL programs with a running parse server.')
+    argument_parser.add_argument('filenames', nargs='*',
+                                 help='the COOL files to parse')
+    argument_parser.add_argument('--socket', default=None,
+                                 help='the socket of the parse server')
+    argument_parser.add_argument('--stats', action='store_true',
+                                 help='print the statistics of the server')
+    argument_parser.add_argument('--shutdown', action='store_true',
+                                 help='stop the server')
+    arguments = argument_parser.parse_args(arguments)
+
+    try:
+        client = Client(arguments.socket)
+    except OSError as exception:
+        sys.stderr.write('Could not connect to the parse server: ' +
+                         str(exception) + '\n')
+        return 2
+
+    status = 0
+    for filename in arguments.filenames:
+        response = client.request({'op': 'parse_file',
+                                   'file': os.path.abspath(filename),
+                                   'format': 'text'})
+        if 'error' in response:
+            sys.stderr.write(response['error'] + '\n')
+            return 2
+        if len(arguments.filenames) > 1:
+            print('==> ' + filename + ' <==')
+        print('\n'.join(response['output']))
+        if not response['ok']:
+            status = 1
+    if arguments.stats:
+        print(json.dumps(client.request({'op': 'stats'})['stats']))
+    if arguments.shutdown:
+        client.request({'op': 'shutdown'})
+    client.close()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2720 @@
+import array
+import bisect
+import enum
+import io
+import os
+import re
+import sys
+import time
+
+import cooltables
+
+# list of case insensitive keywords
+keyword_matches = ['class', 'else', 'fi', 'if', 'in', 'inherits', 'isvoid',
+                   'let', 'loop', 'pool', 'then', 'while', 'case', 'esac',
+                   'new', 'of', 'not']
+# list of keywords and symbols that must match exactly like this
+exact_matches = ['true', 'false', '{', '}', ':', ';', ',', '<-', '=>', '@', '-',
+                 '/', '~', '<', '<=', '=']
+# list of symbols that need to be escaped in regular expressions
+escaped_matches = ['(', ')', '.', '+', '*', '"']
+
+# the scanning engine used to split the input into lexemes: 'master' makes a
+# single pass over the input with one combined regular expression, 'legacy'
+# splits the input into words and backtracks over each of them, and 'vector'
+# classifies whole blocks of the input at once with NumPy (see coolvector), or
+# falls back to 'master' when NumPy is not installed
+scanner_engine = 'master'
+# the names of the scanning engines
+scanner_engines = ['master', 'legacy', 'vector']
+# the engine used to parse expressions: 'recursive' calls one method per rule
+# of the expression grammar, while 'iterative' expands the rules on an explicit
+# stack, such that expressions of any length or depth can be parsed
+expression_engine = 'recursive'
+# the number of tokens that skip_to() checks one by one, before it searches for
+# the next occurrence of every expected token
+skip_window = 8
+# how the parser recovers from syntax errors: 'first' skips to the next token
+# that can start the rule in error, and parses the rule again, while 'follow'
+# also stops at the tokens that can follow the rule (its FOLLOW set in the
+# grammar), and abandons the rule there
+error_recovery = 'first'
+# the size of the chunks in which memory-mapped input files are decoded, in
+# bytes; it is rounded up to a multiple of the mapping granularity
+mapped_chunk_size = 256 * 1024
+# the number of line starts that a scan which does not keep them holds on to,
+# before dropping the ones it has walked past
+line_window = 1024
+# the number of tokens that a streamed parse pulls from the lexer at a time, and
+# lets the parser move past before they are dropped (see TokenStream)
+stream_window = 256
+# the number of tokens before the current one that a streamed parse keeps; the
+# rules look back at most two tokens, for the names of classes and methods
+stream_keep = 2
+# the compiled scanner of every engine, shared by all the lexers of that engine;
+# it is only compiled when the first such lexer is created (see load_scanner())
+compiled_scanners = {}
+# the frames that the helpers of the rule methods (and, in a streamed parse, the
+# lexer) may add on top of the deepest rule, which the depth limit of a parse
+# leaves room for (see Parser.parse_program())
+depth_margin = 50
+# the most frames that the rule methods take between an expression and one
+# nested in it (from expr_a() down to exprs_1(), through an argument)
+depth_frames = 15
+# the number of tokens between two checks of the time limit of a file, while
+# it is scanned
+deadline_tokens = 4096
+# what going over every limit on a file means, by the name of the limit
+limit_messages = {'size': 'the file has more than %s characters',
+                  'tokens': 'the file has more than %s tokens',
+                  'depth': 'the expressions are nested more than %s deep',
+                  'errors': 'the file has more than %s errors',
+                  'seconds': 'the file takes more than %s seconds'}
+
+# the binary operators, which are all parsed the same way by the iterative
+# expression engine
+binary_operators = ['*', '/', '+', '-', '<', '<=', '=']
+# the rules of the expression grammar, as expanded by the iterative expression
+# engine
+rule_expr_a = 0
+rule_operand = 1
+rule_binary = 2
+rule_expr_k0 = 3
+rule_expr_i1 = 4
+rule_expr_h1 = 5
+rule_arguments = 6
+rule_exprs_1 = 7
+rule_expr_k3 = 8
+rule_expr_k4 = 9
+rule_expr_k5 = 10
+rule_expr_k6 = 11
+# the end of an expression, when its depth is counted
+rule_expr_end = 12
+
+
+'''
+This function scans and parses the input file, and, based on the result,
+outputs either the file structure (classes and their corresponding methods),
+or a list of lexical and syntax errors identified. It is a thin wrapper over
+the Parser class, which holds all the state of a parse.
+
+:param filename: the name of the file to be parsed
+:param engine: the scanning engine to use ('master', 'legacy' or 'vector');
+               defaults to the module-level scanner_engine setting
+:param expressions: the expression engine to use ('recursive' or 'iterative');
+                    defaults to the module-level expression_engine setting
+:param mapped: whether to read the file through a memory map (see read_mapped())
+:param grammar: the grammar file to parse with, by the table-driven engine (see
+                Parser.program_table()), or None to use the Parser methods
+:param recovery: how to recover from syntax errors ('first' or 'follow');
+                 defaults to the module-level error_recovery setting
+:param max_errors: the number of errors after which parsing stops, or None
+:param jobs: the number of processes to parse the top-level classes of the file
+             in (see coolsplit), or None to parse the file in this process
+:param stream: whether to pull the tokens from the lexer as they are parsed
+:param fail_fast: whether to stop at the first error, and only report that one
+:returns: the ParseResult of the file
+'''
+def parse(filename, engine=None, expressions=None, mapped=False,
+          grammar=None, recovery=None, max_errors=None, jobs=None,
+          stream=False, fail_fast=False):
+    parser = Parser(lexer=Lexer(engine, mapped), expressions=expressions,
+                    grammar=grammar, recovery=recovery, max_errors=max_errors,
+                    stream=stream, fail_fast=fail_fast)
+    if jobs is None:
+        result = parser.parse_file(filename)
+    else:
+        import coolsplit
+        result = coolsplit.parse_file(parser, filename, jobs)
+    # output
+    if not result.errors:
+        print_file_structure(result)
+    else:
+        print_errors(result)
+    return result
+
+
+'''
+This function scans the input file with a new Lexer and returns its tokens. The
+lexical errors found are only kept by the lexer; use a Lexer directly to get
+them.
+
+:param input_file: the input file
+:param engine: the scanning engine to use ('master', 'legacy' or 'vector');
+               defaults to the module-level scanner_engine setting
+:returns: a list of tokens found in the file, along with their position in the
+          file as a (row, column) pair, and their value/name, if they are
+          integers, strings, or identifiers
+'''
+def scan(input_file, engine=None):
+    return Lexer(engine).scan(input_file)
+
+
+'''
+This exception is raised when a file goes over one of the limits of the lexer
+or of the parser, and stops the scan or the parse of the file at once. The
+limit on the number of errors does not raise it, since a parse that reaches it
+still has a result (see Parser.stop_parsing()).
+'''
+class LimitExceeded(Exception):
+    '''
+    :param limit: the name of the limit ('size', 'tokens', 'depth' or
+                  'seconds'), as in limit_messages
+    :param maximum: the value of the limit
+    '''
+    def __init__(self, limit, maximum):
+        Exception.__init__(self, 'Limit exceeded: ' +
+                           limit_messages[limit] % maximum + '.')
+        self.limit = limit
+        self.maximum = maximum
+
+
+'''
+This class holds the outcome of parsing a single file: the tokens found in it,
+the classes and their methods, the lexical and syntax errors, in order of
+appearance in the file, and the abstract syntax tree, if one was built.
+'''
+class ParseResult:
+    '''
+    :param tokens: the list of tokens found in the file
+    :param token_offsets: the offset of the first character of each token
+    :param line_starts: the offset at which each line of the file starts
+    :param classes: the names of the classes found in the file
+    :param methods: the names of the methods of each class
+    :param errors: the lexical and syntax error messages
+    :param ast: the root of the abstract syntax tree (see coolast), or None
+    :param units: a (token index, class count, syntax error count) triple for
+                  every top-level unit, as recorded by the parser
+    :param error_offsets: the offset of the lexeme of every lexical error
+    :param error_tokens: the index of the current token of every syntax error
+    :param features: the index of the name token of every feature, in order
+    '''
+    def __init__(self, tokens, token_offsets, line_starts, classes, methods,
+                 errors, ast=None, units=None, error_offsets=None,
+                 error_tokens=None, features=None):
+        self.tokens = tokens
+        self.token_offsets = token_offsets
+        self.line_starts = line_starts
+        self.classes = classes
+        self.methods = methods
+        self.errors = errors
+        self.ast = ast
+        self.units = units
+        self.error_offsets = error_offsets
+        self.error_tokens = error_tokens
+        self.features = features
+        # the text the file was parsed from, when it is kept for incremental
+        # reparsing (see coolincremental)
+        self.source = None
+
+    '''
+    :returns: True if no lexical or syntax errors were found, False otherwise
+    '''
+    def ok(self):
+        return not self.errors
+
+    '''
+    This method maps an offset in the parsed file back to its (row, column)
+    coordinates.
+
+    :param offset: the offset of a character in the file
+    :returns: the (row, column) pair of the character at the given offset
+    '''
+    def get_coordinates(self, offset):
+        return get_coordinates(offset, self.line_starts)
+
+
+'''
+This class scans COOL programs. The scanning rules are generated and compiled
+once, when the lexer is created, so a single lexer can scan any number of files;
+the state of the last scan (its errors, line start offsets and token offsets) is
+reset at the start of every scan.
+'''
+class Lexer:
+    '''
+    :param engine: the scanning engine to use ('master', 'legacy' or 'vector');
+                   defaults to the module-level scanner_engine setting
+    :param mapped: whether to read input files through a memory map, in chunks,
+                   instead of line by line through the file object; the vector
+                   engine always reads them in blocks of lines
+    :param chunk_size: the size of the mapped chunks, in bytes; defaults to the
+                       module-level mapped_chunk_size setting
+    :param max_size: the number of characters that a file may have, or None
+    :param max_tokens: the number of tokens that a file may have, or None
+    :param max_seconds: the time that the scan and the parse of a file may
+                        take, from the moment the lexer starts reading it, in
+                        seconds, or None
+    '''
+    def __init__(self, engine=None, mapped=False, chunk_size=None,
+                 max_size=None, max_tokens=None, max_seconds=None):
+        if engine is None:
+            engine = scanner_engine
+        if engine not in scanner_engines:
+            raise ValueError('Unknown scanner engine \'' + str(engine) +
+                             '\'.')
+        # the vector engine needs NumPy, which is optional
+        if engine == 'vector':
+            try:
+                import coolvector
+            except ImportError:
+                engine = 'master'
+        self.engine = engine
+        self.mapped = mapped
+        if chunk_size is None:
+            chunk_size = mapped_chunk_size
+        self.chunk_size = chunk_size
+        # the scanning rules are compiled from the scanner tables, once for
+        # every engine, and shared by all the lexers of that engine; only the
+        # rules of the chosen engine are compiled, and the others are None
+        self.scanner_rules = None
+        self.token_rules = None
+        self.pattern = None
+        self.fixed_tokens = None
+        if engine == 'legacy':
+            self.scanner_rules, self.token_rules = load_scanner(engine)
+        else:
+            # the vector engine uses the fixed tokens of the master engine
+            self.pattern, self.fixed_tokens = load_scanner('master')
+        # will hold the lexical errors found in the last scanned file, and the
+        # offset of the lexeme of each of them
+        self.errors = []
+        self.error_offsets = []
+        # will hold the offset at which each line of the last scanned file
+        # starts, such that any offset can be mapped back to a (row, column)
+        # pair by a binary search
+        self.line_starts = []
+        # will hold the offset of the first character of each token
+        self.token_offsets = array.array('q')
+        # the limits on every file, which raise LimitExceeded when a file goes
+        # over them; the lines (or blocks) read, and the tokens found, are
+        # only checked when they are set (see limit_lines())
+        self.max_size = max_size
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        # will hold the time by which the last file must be done with, as given
+        # by time.perf_counter(), if it has a time limit; the parser checks it
+        # too
+        self.deadline = None
+        # will hold the offset of the comment that the last scanned file ends
+        # in, whether it is a block comment left open or a line comment with
+        # no newline after it, or None
+        self.open_comment = None
+
+    '''
+    This method identifies the lexemes contained in the file, along with their
+    offsets in the file, and then tokenises the lexemes into a TokenStore,
+    which holds the kind of each token, its coordinates (row and column in the
+    file, computed from the offsets, for more informative error messages), and
+    its value/name, if it is an integer, string, or identifier. The file is
+    only read once, line by line, through the generator chain started by
+    scan_records().
+
+    :param input_file: the input file
+    :returns: the TokenStore of the tokens found in the file; indexing it gives
+              the same tuples as scan_tokens()
+    '''
+    def scan(self, input_file):
+        tokens = TokenStore()
+        append = tokens.append
+        for kind, row, column, value, offset in self.scan_records(input_file):
+            append(kind, row, column, value, offset)
+        self.token_offsets = tokens.offsets
+
+        return tokens
+
+    '''
+    This method scans the input file like scan(), but produces the tokens one
+    by one, as tuples of their type and coordinates, followed by their
+    value/name, if they are integers, strings, or identifiers.
+
+    :param input_file: the input file
+    :param keep_lines: whether to keep the start of every line in line_starts
+                       (see scan_records())
+    :returns: a generator of (token, offset) pairs, ending with the EOF token
+    '''
+    def scan_tokens(self, input_file, keep_lines=True):
+        for kind, row, column, value, offset in self.scan_records(input_file,
+                                                                  keep_lines):
+            if value is None:
+                yield (kind_names[kind], (row, column)), offset
+            else:
+                yield (kind_names[kind], (row, column), value), offset
+
+    '''
+    This method chains the scanning stages together: the lines of the input
+    file are split into lexemes by the chosen engine, and the lexemes are
+    matched to tokens. Every stage is a generator, so only the line being
+    scanned is held in memory, and the tokens are produced as soon as their
+    line has been read. If the line starts are not kept either, the memory used
+    by the scan does not grow with the size of the file. The vector engine
+    reads, splits and matches a block of lines at a time instead (see
+    coolvector.match_blocks()). The limits of the lexer, if any, are checked
+    along the way (see limit_lines() and limit_tokens()).
+
+    :param input_file: the input file
+    :param keep_lines: whether to keep the start of every line in line_starts;
+                       if False, only the starts of the last few lines are kept
+    :returns: a generator of (kind, row, column, value, offset) records, as
+              produced by match_lexemes()
+    '''
+    def scan_records(self, input_file, keep_lines=True):
+        if self.engine == 'vector':
+            import coolvector
+            records = coolvector.match_blocks(self, self.read(input_file),
+                                              keep_lines)
+        else:
+            lexemes = self.split(self.read(input_file))
+            records = self.match_lexemes(lexemes, keep_lines)
+        if self.max_tokens is not None or self.deadline is not None:
+            return self.limit_tokens(records)
+        return records
+
+    '''
+    This method resets the state of the lexer, ready to scan a new file, and
+    starts reading the file, with the reader chosen when the lexer was created.
+
+    :param input_file: the input file
+    :returns: a generator of (offset, line) pairs, as produced by read_lines()
+    '''
+    def read(self, input_file):
+        self.errors = []
+        self.error_offsets = []
+        self.open_comment = None
+        self.deadline = None
+        if self.max_seconds is not None:
+            self.deadline = time.perf_counter() + self.max_seconds
+        # the start of every line is indexed as the lines are read, to compute
+        # coordinates from offsets
+        self.line_starts = []
+        if self.engine == 'vector':
+            import coolvector
+            lines = coolvector.read_blocks(input_file, self.line_starts)
+        elif self.mapped:
+            lines = read_mapped(input_file, self.line_starts, self.chunk_size)
+        else:
+            lines = read_lines(input_file, self.line_starts)
+        if self.max_size is not None or self.deadline is not None:
+            return self.limit_lines(lines)
+        return lines
+
+    '''
+    This method checks the lines of the file against the size and the time
+    limits of the lexer, as they are read: every line (or block of lines) is
+    checked before it is split, so a single line that is too long is never
+    split at all.
+
+    :param lines: the (offset, line) pairs of the input file
+    :returns: a generator of the same pairs
+    '''
+    def limit_lines(self, lines):
+        max_size = self.max_size
+        deadline = self.deadline
+        for offset, line in lines:
+            if max_size is not None and offset + len(line) > max_size:
+                raise LimitExceeded('size', max_size)
+            if deadline is not None and time.perf_counter() > deadline:
+                raise LimitExceeded('seconds', self.max_seconds)
+            yield offset, line
+
+    '''
+    This method checks the token records of the file against the token limit of
+    the lexer, as they are found, and against its time limit, every
+    deadline_tokens tokens, such that a single long line is not scanned to its
+    end once the file is out of time.
+
+    :param records: the (kind, row, column, value, offset) records of the file
+    :returns: a generator of the same records
+    '''
+    def limit_tokens(self, records):
+        max_tokens = self.max_tokens
+        if max_tokens is None:
+            max_tokens = sys.maxsize
+        deadline = self.deadline
+        eof = kind_codes['eof']
+        for count, record in enumerate(records):
+            # the EOF record is the only one that may come after the last
+            # token allowed
+            if count >= max_tokens and record[0] != eof:
+                raise LimitExceeded('tokens', max_tokens)
+            if (deadline is not None and not count % deadline_tokens and
+                    time.perf_counter() > deadline):
+                raise LimitExceeded('seconds', self.max_seconds)
+            yield record
+
+    '''
+    This method splits lines into lexemes with the chosen scanning engine.
+
+    :param lines: the (offset, line) pairs of the input file
+    :returns: a generator of (lexeme, token, offset, end) tuples
+    '''
+    def split(self, lines):
+        if self.engine == 'master':
+            return self.split_master(lines)
+        if self.engine == 'vector':
+            import coolvector
+            return coolvector.split_blocks(lines, self.fixed_tokens)
+        return self.split_legacy(lines)
+
+    '''
+    This method splits lines into lexemes with the master scanner engine. Each
+    line is split by a single regular expression, in one pass, and each lexeme
+    is classified by the name of the rule that matched it, instead of trying
+    every scanner rule in turn. Strings are matched as a whole, so they do not
+    need to be bound afterwards, but their whitespaces are dropped, just as
+    bind_strings() does. Comments are skipped as soon as they are matched,
+    without ever being copied out of the line: a line comment is the last
+    match on its line, and the search resumes after the end of a block
+    comment, which may be several lines below (see skip_comment()). A block
+    comment that is still open at the end of the file becomes a lexeme of its
+    own, matched to the comment token, which match_lexemes() reports.
+
+    :param lines: the (offset, line) pairs of the input file
+    :returns: a generator of (lexeme, token, offset, end) tuples, where offset
+              and end delimit the lexeme in the input file
+    '''
+    def split_master(self, lines):
+        pattern = self.pattern
+        fixed_tokens = self.fixed_tokens
+        # the number of block comments open at the start of the line, and the
+        # offset of the outermost one
+        depth = 0
+        comment_offset = None
+        line_offset = 0
+        line = ''
+
+        for line_offset, line in lines:
+            position = 0
+            if depth:
+                depth, position = skip_comment(line, 0, depth)
+            # the search starts over after every block comment that ends on
+            # the line, and the line is done once the search is
+            while not depth:
+                for result in pattern.finditer(line, position):
+                    rule = result.lastgroup
+                    if rule == 'line_comment':
+                        # only the last line of a file can end in a line
+                        # comment
+                        if result.end() == len(line):
+                            self.open_comment = line_offset + result.start()
+                        continue
+                    if rule == 'comment':
+                        comment_offset = line_offset + result.start()
+                        depth, position = skip_comment(line, result.end(), 1)
+                        break
+                    lexeme = result.group()
+                    # the offsets are known as soon as the lexeme is matched
+                    offset = line_offset + result.start()
+                    end = line_offset + result.end()
+                    if rule == 'string':
+                        yield ''.join(lexeme.split()), 'string', offset, end
+                    elif lexeme in fixed_tokens:
+                        yield lexeme, fixed_tokens[lexeme], offset, end
+                    elif rule == 'identifier':
+                        if lexeme[0].isupper():
+                            yield lexeme, 'type_id', offset, end
+                        else:
+                            yield lexeme, 'obj_id', offset, end
+                    elif rule == 'char':
+                        yield lexeme, 'error', offset, end
+                    else:
+                        yield lexeme, rule, offset, end
+                else:
+                    break
+
+        if depth:
+            self.open_comment = comment_offset
+            yield '(*', 'comment', comment_offset, line_offset + len(line)
+
+    '''
+    This method splits lines into lexemes with the legacy scanner engine. Each
+    line is split into words, each word is split into lexemes, the lexemes that
+    make up strings are bound together, and only then are the lexemes of the
+    line matched to tokens. The comments of a line are blanked out first (see
+    blank_comments()), and a block comment that is still open at the end of
+    the file is reported as split_master() does.
+
+    :param lines: the (offset, line) pairs of the input file
+    :returns: a generator of (lexeme, token, offset, end) tuples, where offset
+              and end delimit the lexeme in the input file
+    '''
+    def split_legacy(self, lines):
+        pattern = load_scanner('master')[0]
+        # the number of block comments open at the start of the line, and the
+        # offset of the outermost one
+        depth = 0
+        comment_offset = None
+        line_offset = 0
+        line = ''
+
+        for line_offset, line in lines:
+            if depth or '--' in line or '(*' in line:
+                line, depth, opened = blank_comments(line, pattern, depth)
+                if opened is not None:
+                    comment_offset = line_offset + opened
+                    # the only comment open at the end of a line that is not
+                    # a block comment is a line comment on the last line
+                    if not depth:
+                        self.open_comment = comment_offset
+            line_lexemes = []
+            # split each line into words, and each word into lexemes
+            for word in line.split():
+                line_lexemes.extend(get_lexemes(word, self.scanner_rules))
+            # bind lexemes that form strings into single lexemes
+            line_lexemes = bind_strings(line_lexemes)
+            # obtain the offsets of each lexeme, and match it to a token
+            offsets = get_offsets(line, line_lexemes)
+            for lexeme, (start, end) in zip(line_lexemes, offsets):
+                yield (lexeme, match_lexeme(lexeme, self.token_rules),
+                       line_offset + start, line_offset + end)
+
+        if depth:
+            self.open_comment = comment_offset
+            yield '(*', 'comment', comment_offset, line_offset + len(line)
+
+    '''
+    This method turns a sequence of lexemes, their tokens and their offsets into
+    token records, which can be then parsed. Each record holds the kind of the
+    token, as a TokenKind code, and its coordinates, which will be helpful when
+    printing error messages. If a token is an identifier, integer or string, its
+    name/value is kept as well, again to aid in outputting error messages or
+    the file structure. A lexical error is added for every lexeme that matched
+    to an error, and for a block comment left open at the end of the file, and
+    an EOF token is produced at the end.
+
+    :param lexemes: the (lexeme, token, offset, end) tuples identified in the
+                    file; ignores erroneous lexemes
+    :param keep_lines: whether to keep the line starts that have been walked
+                       past; if False, they are dropped every line_window lines
+    :returns: a generator of (kind, row, column, value, offset) records, where
+              value is None for tokens other than identifiers, integers and
+              strings
+    '''
+    def match_lexemes(self, lexemes, keep_lines=True):
+        starts = self.line_starts
+        # the number of line starts dropped from the front of the list
+        dropped = 0
+        row = 0
+        end = 0
+        found_tokens = False
+
+        for lexeme, token, offset, end in lexemes:
+            # the lexemes are ordered as they appear in the file, so the rows
+            # only need to be walked forward once
+            while (row - dropped < len(starts) and
+                   starts[row - dropped] <= offset):
+                row = row + 1
+            # the start of the current row is still needed
+            if not keep_lines and row - dropped > line_window:
+                del starts[:row - dropped - 1]
+                dropped = row - 1
+            coordinate = (row, offset - starts[row - dropped - 1] + 1)
+            # if the lexeme matched to an error, prepare a message to be printed
+            # out
+            if token == 'error':
+                self.errors.append('Lexical error: Unknown token \'' + lexeme +
+                                   '\' at position ' + str(coordinate) + '.')
+                self.error_offsets.append(offset)
+                continue
+            # a block comment left open at the end of the file is reported at
+            # its start
+            if token == 'comment':
+                self.errors.append('Lexical error: Unterminated comment at '
+                                   'position ' + str(coordinate) + '.')
+                self.error_offsets.append(offset)
+                continue
+            found_tokens = True
+            # if the token is an identifier, also keep its name
+            if token in ['type_id', 'obj_id', 'integer', 'string']:
+                yield kind_codes[token], coordinate[0], coordinate[1], \
+                    lexeme, offset
+            # otherwise, only keep the token type and coordinates
+            else:
+                yield kind_codes[token], coordinate[0], coordinate[1], None, \
+                    offset
+
+        # get the coordinates of the end of file and add an EOF token
+        if not found_tokens:
+            eof_coordinate = (0, 0)
+        else:
+            row, column = get_coordinates(end, starts)
+            eof_coordinate = (dropped + row, column)
+        yield kind_codes['eof'], eof_coordinate[0], eof_coordinate[1], None, end
+
+
+'''
+This function compiles the scanner of an engine from the scanner tables, unless
+it has been compiled already. The scanner is shared by every lexer of the
+engine, and is never modified:
+- the master engine uses the combined pattern, and the table of the lexemes
+  that match a fixed rule
+- the legacy engine uses the scanner rules, in order, to split lexemes, and the
+  same rules to match lexemes to tokens, with the rule that accepts single
+  characters (used to prevent errors when encountering non-COOL symbols in
+  strings) replaced by a rule that identifies strings
+
+:param engine: the scanning engine ('master' or 'legacy')
+:returns: a (pattern, fixed tokens) pair for the master engine, or a
+          (scanner rules, token rules) pair of tuples for the legacy engine
+'''
+def load_scanner(engine):
+    scanner = compiled_scanners.get(engine)
+    if scanner is not None:
+        return scanner
+    if engine == 'master':
+        scanner = (re.compile(cooltables.scanner_pattern),
+                   cooltables.fixed_tokens)
+    else:
+        scanner_rules = tuple((token, re.compile(pattern))
+                              for token, pattern in cooltables.scanner_rules)
+        token_rules = (scanner_rules[:-2] +
+                       (('string', re.compile(cooltables.string_rule)),) +
+                       scanner_rules[-1:])
+        scanner = (scanner_rules, token_rules)
+    compiled_scanners[engine] = scanner
+    return scanner
+
+
+'''
+This function creates a list of (token, regex) pairs that define the scanning
+rules for COOL programs. Lists of keywords and symbols are defined in the
+module, but regular expressions are mostly built automatically, to ease the
+generation of these rules. The final entry in the list is the error token that
+matches anything. Matching will usually be done by trying each rule, starting
+with the first one, so reaching the last rule means that the token is an error.
+
+:returns: a list of (token, regex) rules representing the scanner rules
+'''
+def generate_scanner_rules():
+    scanner_rules = []
+
+    # add rules for all the symbols above
+    for match in keyword_matches:
+        scanner_rules.append((match, re.compile('^' + match + '$'),
+                              re.IGNORECASE))
+    for match in exact_matches:
+        scanner_rules.append((match, re.compile('^' + match + '$')))
+    for match in escaped_matches:
+        scanner_rules.append((match, re.compile('^\\' + match + '$')))
+    # add a rule for escaped characters, i.e. characters followed by a '\'
+    scanner_rules.append(('escaped_char', re.compile('^\\\\.$')))
+    # add rules for tokens which can have many forms, such as identifiers
+    scanner_rules.append(('integer', re.compile('^[0-9]+$')))
+    scanner_rules.append(('type_id', re.compile('^[A-Z]\w*$')))
+    scanner_rules.append(('obj_id', re.compile('^[a-z]\w*$')))
+    scanner_rules.append(('char', re.compile('^.$')))
+    # everything else is an error
+    scanner_rules.append(('error', re.compile('.*')))
+
+    return scanner_rules
+
+
+'''
+This function builds the combined regular expression used by the master scanner
+engine, which splits a line in a single left-to-right pass. It is the
+alternation of the rules in generate_scanner_rules(), ordered such that the
+first alternative that matches is also the longest lexeme that the legacy
+engine would have found by backtracking:
+- a string is a quotation mark followed by anything but quotation marks and
+  newlines, up to the next quotation mark on the same line (escaped characters,
+  including escaped quotation marks, are skipped as pairs)
+- identifiers and integers are matched greedily, and cover all the keywords
+- escaped characters are a backslash followed by a non-whitespace character
+- a line comment runs from '--' to the end of the line, and a block comment is
+  only matched by its opening '(*', since it may span lines and nest (see
+  skip_comment()); since lexemes are matched left to right, a comment mark
+  inside a string, or after the '<' of '<-', does not start a comment
+- the multi-character symbols are tried before any single character
+- any other non-whitespace character is a lexeme on its own
+Whitespace is never matched, so it is skipped by the search.
+
+:returns: the compiled regular expression, with one named group per rule
+'''
+def generate_scanner_pattern():
+    # multi-character symbols, longest first, such that e.g. '<=' is preferred
+    # to '<'
+    symbols = [match for match in exact_matches + escaped_matches
+               if len(match) > 1 and not match.isalpha()]
+    symbols.sort(key=len, reverse=True)
+
+    return re.compile(
+        r'(?P<string>"(?:\\\S|\\(?!\S)|[^"\\\n])*")|'
+        r'(?P<identifier>[A-Za-z]\w*)|'
+        r'(?P<integer>[0-9]+)|'
+        r'(?P<escaped_char>\\\S)|'
+        r'(?P<line_comment>--[^\n]*)|'
+        r'(?P<comment>\(\*)|'
+        r'(?P<symbol>' + '|'.join(re.escape(symbol) for symbol in symbols) +
+        r')|'
+        r'(?P<char>\S)')
+
+
+'''
+This function builds a lookup table from lexemes that match a fixed scanner rule
+(keywords, exact matches and escaped matches) to their tokens.
+
+:returns: a dictionary mapping fixed lexemes to tokens
+'''
+def generate_fixed_tokens():
+    fixed_tokens = {}
+    for match in keyword_matches + exact_matches + escaped_matches:
+        fixed_tokens[match] = match
+    return fixed_tokens
+
+
+'''
+This function lists the token kinds that can reach the parser: the scanner
+rules from generate_scanner_rules(), except for the catch-all char and error
+rules, followed by the string and eof tokens, which are produced by the lexer
+rather than by a rule of their own. Every kind gets a small integer code (its
+index in the list), and its name is the token name used in the grammar
+functions.
+
+:returns: the list of the names of the token kinds
+'''
+def generate_token_names():
+    names = [rule[0] for rule in generate_scanner_rules()
+             if rule[0] not in ['char', 'error']]
+    return names + ['string', 'eof']
+
+
+'''
+This function gathers the scanner tables: everything the lexer needs that is
+generated from the scanner rules, as constants, such that they can be written
+out ahead of time to the cooltables module (see write_scanner_tables()), and
+do not have to be generated again every time the parser starts.
+
+:returns: a list of (name, value, comment) triples, one per table
+'''
+def generate_scanner_tables():
+    return [('token_names', tuple(generate_token_names()),
+             'the names of the token kinds, in the order of their codes'),
+            ('scanner_rules', tuple((rule[0], rule[1].pattern)
+                                    for rule in generate_scanner_rules()),
+             'the (token, pattern) pairs of the scanner rules, in order'),
+            ('string_rule', '^\".*\"$',
+             'the pattern that takes the place of the char rule when lexemes '
+             'are matched to tokens, which identifies strings'),
+            ('scanner_pattern', generate_scanner_pattern().pattern,
+             'the combined pattern of the master scanner engine'),
+            ('fixed_tokens', generate_fixed_tokens(),
+             'the lexemes that match a fixed rule, mapped to their tokens')]
+
+
+'''
+This function writes the scanner tables to the cooltables module, which has to
+be done every time the scanner rules change.
+
+:param filename: the name of the file to write; defaults to the cooltables
+                 module next to this one
+'''
+def write_scanner_tables(filename=None):
+    if filename is None:
+        filename = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'cooltables.py')
+    lines = ['# This module is generated by coolcore.write_scanner_tables(), '
+             'from the', '# scanner rules of coolcore; run python '
+             'coolparser.py --write-tables after', '# changing them, rather '
+             'than editing it.']
+    for name, value, comment in generate_scanner_tables():
+        lines.append('')
+        lines.extend(format_comment(comment))
+        lines.extend(format_table(name, value))
+    with open(filename, 'w') as tables_file:
+        tables_file.write('\n'.join(lines) + '\n')
+
+
+'''
+This function checks that the cooltables module is up to date with the scanner
+rules.
+
+:returns: the list of the names of the tables that differ from the ones
+          generated from the scanner rules, which is empty if the module is up
+          to date
+'''
+def check_scanner_tables():
+    return [name for name, value, comment in generate_scanner_tables()
+            if getattr(cooltables, name, None) != value]
+
+
+'''
+:param comment: the text of a comment
+:returns: the lines of the comment, wrapped to 80 columns
+'''
+def format_comment(comment):
+    lines = ['#']
+    for word in comment.split():
+        if len(lines[-1]) + len(word) + 1 > 80:
+            lines.append('#')
+        lines[-1] = lines[-1] + ' ' + word
+    return lines
+
+
+'''
+This function formats a table as Python source, one entry per line. Long
+strings are split into adjacent literals.
+
+:param name: the name of the table
+:param value: the table: a string, a tuple, or a dictionary
+:returns: the lines of the source
+'''
+def format_table(name, value):
+    if isinstance(value, str):
+        pieces = [value[start:start + 60]
+                  for start in range(0, len(value), 60)] or ['']
+        if len(pieces) == 1:
+            return [name + ' = ' + repr(value)]
+        return ([name + ' = ('] + ['    ' + repr(piece) for piece in pieces] +
+                [')'])
+    if isinstance(value, dict):
+        return ([name + ' = {'] +
+                ['    ' + repr(key) + ': ' + repr(entry) + ','
+                 for key, entry in value.items()] + ['}'])
+    return ([name + ' = ('] + ['    ' + repr(entry) + ',' for entry in value] +
+            [')'])
+
+
+# the token kinds, numbered as in the scanner tables, along with lookup tables
+# between names and codes, which are cheaper to use than the enum members
+TokenKind = enum.IntEnum('TokenKind',
+                         [(name, code) for code, name in
+                          enumerate(cooltables.token_names)])
+kind_names = [kind.name for kind in TokenKind]
+kind_codes = {kind.name: int(kind) for kind in TokenKind}
+
+
+'''
+This class stores the tokens of a file column by column, instead of as a list
+of tuples: the kind code, row, column and offset of every token are kept in
+parallel array buffers, and the names/values of identifiers, integers and
+strings are interned in a string table, such that a value repeated through the
+file is only stored once. Indexing the store builds the token tuple that the
+lexer used to produce, so code that reads tokens as tuples keeps working,
+while the parser compares the kind codes directly.
+'''
+class TokenStore:
+
+    '''
+    This method creates an empty store.
+    '''
+    def __init__(self):
+        self.kinds = array.array('B')
+        self.rows = array.array('I')
+        self.columns = array.array('I')
+        # index of the value in the string table, or -1 if there is none
+        self.values = array.array('i')
+        self.offsets = array.array('q')
+        self.strings = []
+        self.string_indices = {}
+
+    '''
+    This method adds a token at the end of the store.
+
+    :param kind: the TokenKind code of the token
+    :param row: the row of the token in the file
+    :param column: the column of the token in the file
+    :param value: the name/value of the token, or None if it has none
+    :param offset: the offset of the first character of the token in the file
+    '''
+    def append(self, kind, row, column, value, offset):
+        self.kinds.append(kind)
+        self.rows.append(row)
+        self.columns.append(column)
+        self.offsets.append(offset)
+        if value is None:
+            self.values.append(-1)
+            return
+        index = self.string_indices.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(value)
+            self.string_indices[value] = index
+        self.values.append(index)
+
+    '''
+    This method returns the name/value of a token.
+
+    :param index: the index of the token
+    :returns: the name/value of the token, or None if it has none
+    '''
+    def value(self, index):
+        value = self.values[index]
+        if value < 0:
+            return None
+        return self.strings[value]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    '''
+    This method builds the tuple of a token: its type and its coordinates,
+    followed by its name/value, if it is an integer, string, or identifier.
+
+    :param index: the index of the token; negative indices count from the end
+    :returns: the token tuple
+    '''
+    def __getitem__(self, index):
+        kind = kind_names[self.kinds[index]]
+        coordinate = (self.rows[index], self.columns[index])
+        value = self.values[index]
+        if value < 0:
+            return (kind, coordinate)
+        return (kind, coordinate, self.strings[value])
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield self[index]
+
+    '''
+    The interning table is not pickled, since it can be rebuilt from the
+    string table.
+    '''
+    def __getstate__(self):
+        return (self.kinds, self.rows, self.columns, self.values, self.offsets,
+                self.strings)
+
+    def __setstate__(self, state):
+        (self.kinds, self.rows, self.columns, self.values, self.offsets,
+         self.strings) = state
+        self.string_indices = {string: index
+                               for index, string in enumerate(self.strings)}
+
+
+'''
+This class holds a window of the tokens of a file, which are pulled from the
+lexer as the parser needs them, instead of being scanned all at once, so that
+parsing starts as soon as the first line has been read, and a parse that stops
+early does not scan the rest of the file. It has the columns of a TokenStore,
+except that the values are kept as they are. The tokens that the parser has
+moved well past are dropped every so often, so the memory used does not grow
+with the size of the file, and an index into the window is relative to its
+first token, which is token number base of the file.
+'''
+class TokenStream:
+    '''
+    :param lexer: the lexer that scans the file; it must not scan another file
+                  while the stream is in use
+    :param input_file: the input file
+    :param window: the number of tokens pulled at a time; defaults to the
+                   module-level stream_window setting
+    :param fail_fast: whether to stop scanning at the first lexical error, in
+                      which case the tokens end with an EOF token at the
+                      offset of the error
+    '''
+    def __init__(self, lexer, input_file, window=None, fail_fast=False):
+        if window is None:
+            window = stream_window
+        self.window = window
+        self.fail_fast = fail_fast
+        self.records = lexer.scan_records(input_file, keep_lines=False)
+        # the lexer starts new error lists for every file it scans
+        self.lexer_errors = lexer.errors
+        self.lexer_error_offsets = lexer.error_offsets
+        self.kinds = array.array('B')
+        self.rows = array.array('I')
+        self.columns = array.array('I')
+        self.values = []
+        self.offsets = array.array('q')
+        self.base = 0
+        # whether the EOF token has been pulled
+        self.ended = False
+
+    '''
+    This method pulls tokens from the lexer until a whole window of them
+    follows the given index, or the end of file is reached. If the index has
+    moved a whole window past the first token, the tokens before it are
+    dropped first, except for the last few (see stream_keep).
+
+    :param index: the index of the current token of the parser
+    :returns: the number of tokens dropped, by which every index into the
+              window has to be decreased
+    '''
+    def fill(self, index):
+        shift = 0
+        if index - stream_keep >= self.window:
+            shift = index - stream_keep
+            for column in [self.kinds, self.rows, self.columns, self.values,
+                           self.offsets]:
+                del column[:shift]
+            self.base = self.base + shift
+        target = index - shift + self.window
+        kinds = self.kinds
+        eof = kind_codes['eof']
+        while not self.ended and len(kinds) < target:
+            kind, row, column, value, offset = next(self.records)
+            # the lexer reports an error when it reaches the token after it,
+            # or, with the vector engine, before the tokens of its block
+            if self.fail_fast and self.lexer_errors and \
+                    offset > self.lexer_error_offsets[0]:
+                kind = eof
+                value = None
+                offset = self.lexer_error_offsets[0]
+            kinds.append(kind)
+            self.rows.append(row)
+            self.columns.append(column)
+            self.values.append(value)
+            self.offsets.append(offset)
+            if kind == eof:
+                self.ended = True
+        return shift
+
+    '''
+    This method scans the rest of the file, unless the stream stops at the
+    first lexical error, such that the lexer finds all of its lexical errors.
+    '''
+    def finish(self):
+        if not self.fail_fast:
+            for record in self.records:
+                pass
+        self.ended = True
+
+    '''
+    :param index: the index of a token in the window
+    :returns: the name/value of the token, or None if it has none
+    '''
+    def value(self, index):
+        return self.values[index]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    '''
+    :param index: the index of a token in the window
+    :returns: the token tuple, as TokenStore.__getitem__() builds it
+    '''
+    def __getitem__(self, index):
+        kind = kind_names[self.kinds[index]]
+        coordinate = (self.rows[index], self.columns[index])
+        value = self.values[index]
+        if value is None:
+            return (kind, coordinate)
+        return (kind, coordinate, value)
+
+
+'''
+This function reads the input file line by line, recording the offset at which
+each line starts.
+
+:param input_file: the input file
+:param starts: the list to which the line start offsets are appended
+:returns: a generator of (offset, line) pairs, where each line keeps its
+          newline character
+'''
+def read_lines(input_file, starts):
+    offset = 0
+    for line in input_file:
+        starts.append(offset)
+        yield offset, line
+        offset = offset + len(line)
+    # an empty file, or one that ends with a newline, has an empty last line
+    if not starts or line.endswith('\n'):
+        starts.append(offset)
+
+
+'''
+This function reads the input file through a memory map, one chunk at a time,
+and produces the same lines as read_lines(). Only one chunk is mapped at a time,
+so the pages of the file that have been scanned are released, and the memory
+used does not grow with the size of the file. The bytes of each chunk are
+decoded and their newlines translated as a text file would, and a line that
+runs past the end of a chunk is carried over to the next one; since no lexeme
+spans two lines, strings and multi-character symbols are never split. Input
+that is not backed by a file on disk is read line by line instead.
+
+:param input_file: the input file
+:param starts: the list to which the line start offsets are appended
+:param chunk_size: the size of the chunks to map, in bytes
+:returns: a generator of (offset, line) pairs, where each line keeps its
+          newline character
+'''
+def read_mapped(input_file, starts, chunk_size):
+    try:
+        descriptor = input_file.fileno()
+        size = os.fstat(descriptor).st_size
+    except (AttributeError, io.UnsupportedOperation):
+        yield from read_lines(input_file, starts)
+        return
+    # only needed for mapped input, so they are not imported by every run
+    import codecs
+    import locale
+    import mmap
+    encoding = getattr(input_file, 'encoding', None)
+    if encoding is None:
+        encoding = locale.getpreferredencoding(False)
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder(encoding)(), translate=True)
+    # mapped chunks have to start at a multiple of the allocation granularity
+    granularity = mmap.ALLOCATIONGRANULARITY
+    chunk_size = max(granularity, -(-chunk_size // granularity) * granularity)
+
+    offset = 0
+    position = 0
+    pending = ''
+    final = False
+    while not final:
+        if position < size:
+            length = min(chunk_size, size - position)
+            with mmap.mmap(descriptor, length, access=mmap.ACCESS_READ,
+                           offset=position) as chunk:
+                text = decoder.decode(chunk[:])
+            position = position + length
+        # the decoder holds back a final carriage return, which only becomes a
+        # newline once the decoder is told there is no more input
+        else:
+            text = decoder.decode(b'', final=True)
+            final = True
+        lines = (pending + text).split('\n')
+        # the last line may continue in the next chunk
+        pending = lines.pop()
+        for line in lines:
+            line = line + '\n'
+            starts.append(offset)
+            yield offset, line
+            offset = offset + len(line)
+    # the last line has no newline, and is empty in an empty file or in one
+    # that ends with a newline
+    starts.append(offset)
+    if pending:
+        yield offset, pending
+
+
+'''
+This function splits a word (a sequence of characters with no whitespaces) into
+lexemes using the maximal munch principle.
+
+:param word: the input word
+:param rules: the scanner rules
+:returns: a list of lexemes made from the given word
+'''
+def get_lexemes(word, rules):
+    lexemes = []
+    start = 0
+
+    while start < len(word):
+        # attempt to match the rest of the word; if unsuccessful, try matching
+        # the same string without its last character, until a lexeme is found
+        end = len(word)
+        while (end > start + 1 and
+               match_lexeme(word[start:end], rules) == 'error'):
+            end = end - 1
+        # append the found lexeme to the list and do the same thing for the
+        # remaining characters
+        lexemes.append(word[start:end])
+        start = end
+    return lexemes
+
+
+'''
+This function attemps to match a string to any of the regular expressions that
+make up the COOL token rules.
+
+:param lexeme: the input string
+:param rules: the rules to try, in order
+:returns: the matched token type
+'''
+def match_lexeme(lexeme, rules):
+    for rule in rules:
+        result = rule[1].match(lexeme)
+        # if a match is made, return that token; a match is guaranteed to be
+        # made eventually, as the error regular expression matches everything
+        if result:
+            return rule[0]
+
+
+'''
+This function takes the lexemes found on a single line in the input file, and
+attempts to bind together the lexemes that should make up a string.
+
+:param line_lexemes: a list of lexemes found on a single line
+:returns: a new list, with strings as single lexemes
+'''
+def bind_strings(line_lexemes):
+    in_string = False
+    # count the number of quotation marks found on the line
+    quotation_marks = line_lexemes.count('"')
+    bound_lexemes = []
+    string = []
+
+    for i in range(0, len(line_lexemes)):
+        lexeme = line_lexemes[i]
+        # if a quotation mark is encountered, it means that a string has just
+        # begun, or just ended
+        if lexeme == '"':
+            quotation_marks = quotation_marks - 1
+            in_string = not in_string
+
+            # if a string has just been opened, and there are no more quotation
+            # marks on the line, then there is an error, so don't merge any more
+            # lexemes
+            if in_string and quotation_marks == 0:
+                bound_lexemes.extend(line_lexemes[i:])
+                break
+            # the closing quotation mark ends the string being built
+            if not in_string:
+                string.append(lexeme)
+                bound_lexemes.append(''.join(string))
+                string = []
+                continue
+        # the lexemes of a string, including its opening quotation mark, are
+        # collected until the string is closed
+        if in_string:
+            string.append(lexeme)
+        else:
+            bound_lexemes.append(lexeme)
+
+    return bound_lexemes
+
+
+'''
+This function skips the text of a block comment, in a single pass that only
+stops at the marks opening and closing comments, keeping count of the comments
+nested in it. The marks are found by plain substring searches, from the left,
+such that the '*' of '(*)' does not close the comment it opens. Strings and
+line comments are not recognised inside block comments, as in the reference
+COOL lexer.
+
+:param text: the text holding the comment, usually a line
+:param position: the offset in the text at which to start skipping
+:param depth: the number of comments open at that offset
+:returns: a (depth, position) pair, holding the number of comments still open,
+          and the offset just after the end of the outermost comment, or the
+          length of the text if it does not end in it
+'''
+def skip_comment(text, position, depth):
+    find = text.find
+    while True:
+        close = find('*)', position)
+        if close < 0:
+            return depth + text.count('(*', position), len(text)
+        # a comment opened before the closing mark, or on its '*'
+        opened = find('(*', position, close + 1)
+        if opened < 0:
+            depth = depth - 1
+            position = close + 2
+            if depth == 0:
+                return depth, position
+        else:
+            depth = depth + 1
+            position = opened + 2
+
+
+'''
+This function replaces the comments of a line with spaces, for the legacy
+scanner engine, which cannot tell comments from other words. The comments are
+found by the master pattern, which matches strings just like bind_strings()
+binds them, such that comment marks inside strings are left alone. The offsets
+of the rest of the line do not change.
+
+:param line: the line
+:param pattern: the pattern of the master scanner engine
+:param depth: the number of block comments open at the start of the line
+:returns: a (line, depth, opened) triple, holding the line without its
+          comments, the number of block comments open at its end, and the
+          offset of the outermost comment opened on the line that it does not
+          end in, or None
+'''
+def blank_comments(line, pattern, depth):
+    pieces = []
+    # the offset of the rest of the line, which has not been copied yet
+    copied = 0
+    opened = None
+    if depth:
+        depth, copied = skip_comment(line, 0, depth)
+        pieces.append(' ' * copied)
+    while not depth:
+        for result in pattern.finditer(line, copied):
+            rule = result.lastgroup
+            if rule == 'line_comment' or rule == 'comment':
+                break
+        else:
+            break
+        start = result.start()
+        if rule == 'comment':
+            depth, end = skip_comment(line, result.end(), 1)
+        else:
+            end = result.end()
+        pieces.append(line[copied:start])
+        pieces.append(' ' * (end - start))
+        copied = end
+        # only the last line of a file can end in a line comment
+        if depth or (rule == 'line_comment' and end == len(line)):
+            opened = start
+    pieces.append(line[copied:])
+    return ''.join(pieces), depth, opened
+
+
+'''
+This function maps an offset in the input file back to its (row, column)
+coordinates, with a binary search over the line start offsets. Both coordinates
+start at 1, as in the error messages.
+
+:param offset: the offset of a character in the input file
+:param starts: the line start offsets of the input file
+:returns: the (row, column) pair of the character at the given offset
+'''
+def get_coordinates(offset, starts):
+    row = bisect.bisect_right(starts, offset)
+    return (row, offset - starts[row - 1] + 1)
+
+
+'''
+This function finds the offset of each lexeme produced by the legacy scanner
+engine in a line. The lexemes contain every non-whitespace character of the
+line, in order, so they can be found by skipping whitespaces; strings are the
+only lexemes that may have had whitespaces removed from them.
+
+:param line: the line the lexemes were found on
+:param lexemes: the list of lexemes
+:returns: a list of (start, end) pairs, where the ith pair holds the offset of
+          the first character of the ith lexeme, and the offset just after it
+'''
+def get_offsets(line, lexemes):
+    offsets = []
+    position = 0
+
+    for lexeme in lexemes:
+        start = None
+        for character in lexeme:
+            while line[position].isspace():
+                position = position + 1
+            if start is None:
+                start = position
+            position = position + 1
+        offsets.append((start, position))
+
+    return offsets
+
+
+'''
+This class parses COOL programs. The state of a parse (the tokens, the index of
+the next token to be parsed, the classes, methods and errors found) is held by
+the parser and reset at the start of every parse, so a single parser can parse
+any number of files, one after another.
+'''
+class Parser:
+    '''
+    :param lexer: the lexer used to scan the input files; a new one is created
+                  if it is not given
+    :param engine: the scanning engine of the new lexer, if one is created
+    :param build_ast: whether to build the abstract syntax tree of every
+                      error-free program; when False, the parser only
+                      validates programs and collects their classes and methods
+    :param expressions: the expression engine to use ('recursive' or
+                        'iterative'); defaults to the module-level
+                        expression_engine setting
+    :param grammar: the grammar file to compile (see coolgrammar) and parse
+                    whole programs with, by program_table() instead of the
+                    methods of the rules; the expression engine is then
+                    unused
+    :param recovery: how to recover from syntax errors ('first' or 'follow');
+                     defaults to the module-level error_recovery setting
+    :param max_errors: the number of errors (lexical and syntax) after which
+                       parsing stops, or None to parse the whole program
+    :param stream: whether to pull the tokens from the lexer as they are needed
+                   (see parse_stream()), instead of scanning the whole file
+                   before parsing it
+    :param fail_fast: whether to stop scanning and parsing at the first error,
+                      lexical or syntax, and only report that one; the parse
+                      is then streamed
+    :param max_depth: the number of expressions that may be nested in one
+                      another, or None; a parse that goes over it raises
+                      LimitExceeded (see parse_program())
+    '''
+    def __init__(self, lexer=None, engine=None, build_ast=False,
+                 expressions=None, grammar=None, recovery=None,
+                 max_errors=None, stream=False, fail_fast=False,
+                 max_depth=None):
+        if lexer is None:
+            lexer = Lexer(engine)
+        if expressions is None:
+            expressions = expression_engine
+        if expressions not in ['recursive', 'iterative']:
+            raise ValueError('Unknown expression engine \'' +
+                             str(expressions) + '\'.')
+        if recovery is None:
+            recovery = error_recovery
+        if recovery not in ['first', 'follow']:
+            raise ValueError('Unknown error recovery \'' + str(recovery) +
+                             '\'.')
+        self.lexer = lexer
+        self.build_ast = build_ast
+        self.expressions = expressions
+        # the rules outside expressions only ever enter them through expr_a(),
+        # so replacing it switches the whole expression engine
+        if expressions == 'iterative':
+            self.expr_a = self.expr_iterative
+        # likewise, programs are only ever entered through program_0()
+        self.grammar = grammar
+        self.table = None
+        if grammar is not None:
+            import coolgrammar
+            self.table = coolgrammar.load_table(grammar)
+            self.program_0 = self.program_table
+        self.recovery = recovery
+        self.max_errors = max_errors
+        self.max_depth = max_depth
+        self.fail_fast = fail_fast
+        self.stream = stream or fail_fast
+        if self.stream and build_ast:
+            raise ValueError('A streamed parse keeps no tokens to build the '
+                             'abstract syntax tree from.')
+        if self.stream and max_errors is not None:
+            raise ValueError('A streamed parse does not know the lexical '
+                             'errors ahead of it; use fail_fast instead of '
+                             'max_errors.')
+        # a streamed parse pulls more tokens whenever a token is matched
+        if self.stream:
+            self.match = self.match_streamed
+        # the tokens at which recovery also stops, for every rule of the
+        # grammar, by the name of the rule in the grammar file
+        self.follow_sets = None
+        if recovery == 'follow':
+            import coolgrammar
+            self.follow_sets = coolgrammar.load_follow_sets(grammar)
+        self.reset(TokenStore())
+
+    '''
+    This method resets the state of the parser, ready to parse a new list of
+    tokens.
+
+    :param tokens: the TokenStore of the tokens to be parsed
+    '''
+    def reset(self, tokens):
+        # will hold the errors found in the program (both lexical and syntax
+        # errors), and the index of the current token of each syntax error
+        self.errors = []
+        self.error_tokens = []
+        # will hold the tokens found in the input file
+        self.tokens = tokens
+        # the kind codes of the tokens, which is all that most rules look at
+        self.kinds = tokens.kinds
+        # will hold the classes found in the input file
+        self.classes = []
+        # will hold the methods found in the input file, corresponding to each
+        # class
+        self.methods = []
+        # will hold the index of the name token of every feature (attribute or
+        # method) found in the input file, in order
+        self.features = []
+        # points to the next token to be parsed from the list of input tokens
+        # identified
+        self.token_index = 0
+        # will hold the state at the start of every top-level unit entered by
+        # program_0(), as (token index, class count, syntax error count)
+        # triples
+        self.units = []
+        # maps token indices to the units that start there and need not be
+        # parsed again; program_0() stops when it reaches one of them, and
+        # records the unit in stopped_at
+        self.stop_points = {}
+        self.stopped_at = None
+        # the kind codes of the tokens as bytes, and the next occurrence of
+        # every kind found by skip_to(), as a (searched from, found at) pair;
+        # they are only built once an error has to be recovered from
+        self.kind_bytes = None
+        self.next_kinds = None
+        # the number of expressions that the rule methods are nested in, and
+        # the number they may be nested in
+        self.depth = 0
+        self.depth_limit = (sys.maxsize if self.max_depth is None else
+                            self.max_depth)
+
+    '''
+    This method scans and parses the file with the given name.
+
+    :param filename: the name of the file to be parsed
+    :returns: the ParseResult of the file
+    '''
+    def parse_file(self, filename):
+        with open(filename, 'r') as input_file:
+            return self.parse(input_file)
+
+    '''
+    This method scans and parses an input file, and gathers the outcome.
+
+    :param input_file: the input file
+    :returns: the ParseResult of the file
+    '''
+    def parse(self, input_file):
+        if self.stream:
+            return self.parse_stream(input_file)
+        return self.parse_tokens(self.lexer.scan(input_file))
+
+    '''
+    This method parses the tokens of a file that has just been scanned by the
+    lexer of the parser, and gathers the outcome.
+
+    :param tokens: the TokenStore of the tokens of the file
+    :returns: the ParseResult of the file
+    '''
+    def parse_tokens(self, tokens):
+        self.reset(tokens)
+        self.errors.extend(self.lexer.errors)
+        # parse the program
+        self.parse_program()
+        # the tree is only built for programs that have been accepted, so it
+        # never has to deal with errors
+        ast = None
+        if self.build_ast and not self.errors:
+            import coolast
+            ast = coolast.build_tree(self.tokens)
+
+        return ParseResult(self.tokens, self.lexer.token_offsets,
+                           self.lexer.line_starts, self.classes, self.methods,
+                           self.errors, ast, self.units,
+                           self.lexer.error_offsets, self.error_tokens,
+                           self.features)
+
+    '''
+    This method scans and parses an input file at the same time: the parser
+    pulls the tokens from the lexer through a TokenStream, a window at a time,
+    so the memory used does not grow with the size of the file. The errors are
+    the same as those of parse(), unless the parse fails fast, in which case
+    it stops at the first error, whether lexical or syntax, so the time it
+    takes to find it does not depend on what follows it. The tokens are not
+    kept, so the result only holds the classes, methods and errors.
+
+    :param input_file: the input file
+    :returns: the ParseResult of the file, without tokens, line starts, units
+              or features
+    '''
+    def parse_stream(self, input_file):
+        tokens = TokenStream(self.lexer, input_file, fail_fast=self.fail_fast)
+        self.reset(tokens)
+        self.fill_tokens()
+        self.parse_program()
+        tokens.finish()
+
+        lexical_errors = self.lexer.errors
+        syntax_errors = self.errors
+        if self.fail_fast and lexical_errors and syntax_errors:
+            # the syntax error is at a token before the lexical error, or at
+            # the end of file that stands for it
+            if (self.lexer.error_offsets[0] <=
+                    tokens.offsets[self.error_tokens[0]]):
+                syntax_errors = []
+            else:
+                lexical_errors = []
+        errors = (lexical_errors + syntax_errors)[:1 if self.fail_fast else
+                                                   None]
+        return ParseResult(None, None, None, self.classes, self.methods,
+                           errors, error_offsets=self.lexer.error_offsets)
+
+    '''
+    This method parses the program from the current token, within the depth
+    limit of the parser, if it has one. The depth of a program is how many
+    expressions are nested in one another, such as the arguments of a call or
+    the parts of a block, whichever engine parses it (chains of operators do not
+    nest). Every engine counts it as it enters expressions, and raises
+    LimitExceeded past the limit. The rule methods recurse on the Python stack
+    once for every nested expression, so the recursion limit is raised to leave
+    room for as many expressions as the limit allows; a deeply nested program
+    that would go past the default recursion limit can then be parsed, as long
+    as it stays within the depth limit.
+
+    :returns: what program_0() returns
+    '''
+    def parse_program(self):
+        if self.max_depth is None:
+            return self.program_0()
+        limit = sys.getrecursionlimit()
+        depth = 0
+        frame = sys._getframe()
+        while frame is not None:
+            depth = depth + 1
+            frame = frame.f_back
+        sys.setrecursionlimit(max(limit, depth + (self.max_depth + 1) *
+                                  depth_frames + depth_margin))
+        try:
+            return self.program_0()
+        finally:
+            sys.setrecursionlimit(limit)
+
+    '''
+    This method pulls more tokens into the window of a streamed parse, and
+    moves the current token index along with the tokens that are dropped.
+    '''
+    def fill_tokens(self):
+        self.token_index = self.token_index - self.tokens.fill(
+            self.token_index)
+
+    '''
+    This method attempts to match the current token to the given token. If they
+    are of the same type, it will return True and increment the token index.
+    Otherwise, it will add a syntax error to the error list and skip to the
+    first encounter of the requested token, or the end of file if it is not
+    found.
+
+    :param token: the requested token
+    :returns: True if the token is found until the end of file, False otherwise
+    '''
+    def match(self, token):
+        # if the requested token is found, increment the index and return True
+        if self.check(token):
+            self.token_index = self.token_index + 1
+            return True
+
+        # otherwise, add an error, and return True if the token is found
+        # eventually, or False, otherwise
+        self.add_syntax_error([token])
+        if self.skip_to([token]):
+            self.token_index = self.token_index + 1
+            return True
+        return False
+
+    '''
+    This method takes the place of match() in a streamed parse: it matches the
+    token, and then makes sure that the token after the current one has been
+    pulled, which is as far as the rules look ahead.
+
+    :param token: the requested token
+    :returns: True if the token is found until the end of file, False otherwise
+    '''
+    def match_streamed(self, token):
+        found = Parser.match(self, token)
+        # a failed match only returns once the parse is over
+        if found and self.token_index + 2 > len(self.kinds):
+            self.fill_tokens()
+        return found
+
+    '''
+    This method adds a syntax error to the error list, specifying the unexpected
+    token, its coordinates in the file, as well as a list of tokens that were
+    expected instead.
+
+    :param expected: the list of expected tokens
+    '''
+    def add_syntax_error(self, expected):
+        # recovering from errors is what takes the longest
+        self.check_deadline()
+        current = self.tokens[self.token_index]
+        # if the token is an identifier, output its name instead of its type
+        if current[0] in ['obj_id', 'type_id', 'integer', 'string']:
+            token = current[2]
+        else:
+            token = current[0]
+
+        error = ('Syntax Error: Unexpected token \'' + token + '\' at ' +
+                 str(current[1]) + '.')
+        # add the expected values
+        for i in range(0, len(expected)):
+            if i == 0:
+                error = error + ' Expected \'' + expected[i] + '\''
+            elif i < len(expected) - 1:
+                error = error + ', \'' + expected[i] + '\''
+            else:
+                error = error + ' or \'' + expected[i] + '\''
+        error = error + '.'
+        self.errors.append(error)
+        self.error_tokens.append(self.token_index)
+
+    '''
+    This method reports a syntax error in a rule, and recovers from it by
+    skipping to one of the expected tokens (see skip_to()). The caller then
+    parses the rule again if the current token is one of the expected ones, or
+    else abandons the rule, as recovery stopped at a token that can follow it,
+    and parsing goes on from there.
+
+    :param expected: the list of expected tokens
+    :param rule: the name of the rule in the grammar file
+    :returns: True if parsing can go on, False if the end of file (or the
+              maximum number of errors) was reached
+    '''
+    def recover(self, expected, rule):
+        self.add_syntax_error(expected)
+        return self.skip_to(expected, rule)
+
+    '''
+    This method increments the token index until one of the expcted tokens is
+    encountered. This is done to allow the program to recover from errors by
+    ignoring erroneous tokens until the needed token is found, and then resuming
+    the syntax analysis from there. When recovering with FOLLOW sets, it also
+    stops at the tokens that can follow the given rule, including the current
+    one.
+
+    Most recoveries stop within a few tokens, so the first few tokens are
+    checked one by one. Past them, the next occurrence of every expected token
+    kind is found with a search of the kind codes (at the speed of a byte
+    search), and remembered, such that the tokens after the current one are
+    searched at most once for every kind, however many times the parser
+    recovers. A streamed parse does not know the tokens ahead, so it checks
+    them one by one instead, and a parse that fails fast does not recover.
+
+    :param expected: the list of expected tokens
+    :param rule: the name of the rule in the grammar file that is recovered
+                 from, if any
+    :returns: True if any of the expected tokens is encountered, False otherwise
+    '''
+    def skip_to(self, expected, rule=None):
+        last = len(self.kinds) - 1
+        if self.max_errors is not None and len(self.errors) >= self.max_errors:
+            self.stop_parsing()
+            return False
+        if self.fail_fast:
+            return False
+        if self.follow_sets is not None and rule is not None:
+            follow = self.follow_sets.get(rule, [])
+            if kind_names[self.kinds[self.token_index]] in follow:
+                return True
+            expected = expected + follow
+        if self.stream:
+            return self.skip_streamed([kind_codes[token]
+                                       for token in expected])
+        if self.token_index >= last:
+            return False
+        kinds = self.kinds
+        codes = [kind_codes[token] for token in expected]
+        start = self.token_index + 1
+        end = min(start + skip_window, last + 1)
+        for index in range(start, end):
+            if kinds[index] in codes:
+                self.token_index = index
+                return True
+        if end > last:
+            self.token_index = last
+            return False
+
+        if self.kind_bytes is None:
+            self.kind_bytes = kinds.tobytes()
+            self.next_kinds = {}
+        start = end
+        found = last + 1
+        for code in codes:
+            searched, position = self.next_kinds.get(code, (last + 1, -1))
+            if not searched <= start <= position:
+                position = self.kind_bytes.find(bytes((code,)), start)
+                if position < 0:
+                    position = last + 1
+                self.next_kinds[code] = (start, position)
+            if position < found:
+                found = position
+        if found > last:
+            self.token_index = last
+            return False
+        self.token_index = found
+        return True
+
+    '''
+    This method increments the token index of a streamed parse until one of the
+    given token kinds is encountered, pulling tokens as it goes.
+
+    :param codes: the kind codes of the expected tokens
+    :returns: True if any of the expected tokens is encountered, False otherwise
+    '''
+    def skip_streamed(self, codes):
+        kinds = self.kinds
+        eof = kind_codes['eof']
+        while kinds[self.token_index] != eof:
+            self.token_index = self.token_index + 1
+            if self.token_index + 2 > len(kinds):
+                self.fill_tokens()
+            if kinds[self.token_index] in codes:
+                return True
+        return False
+
+    '''
+    This method records that parsing stopped because the maximum number of
+    errors was reached.
+    '''
+    def stop_parsing(self):
+        if self.errors and self.errors[-1].startswith('Too many errors'):
+            return
+        self.errors.append('Too many errors: parsing stopped at ' +
+                           str(self.tokens[self.token_index][1]) + '.')
+        self.error_tokens.append(self.token_index)
+
+    '''
+    This method checks if the current token is of the same type as the given
+    token.
+
+    :param token: the expected token
+    :returns: True if the expected token is found, False otherwise
+    '''
+    def check(self, token):
+        if kind_names[self.kinds[self.token_index]] == token:
+            return True
+        return False
+
+    '''
+    :param expected: a list of tokens
+    :returns: True if the current token is one of the given tokens, False
+              otherwise
+    '''
+    def check_any(self, expected):
+        return kind_names[self.kinds[self.token_index]] in expected
+
+    '''
+    This method records the start of a top-level unit (a class), at the
+    current token, unless an incremental reparse can reuse the unit from there
+    on.
+
+    :returns: True if the parse stops at the unit, False otherwise
+    '''
+    def enter_unit(self):
+        self.check_deadline()
+        # an incremental reparse stops at the first unit it can reuse
+        if self.token_index in self.stop_points:
+            self.stopped_at = self.stop_points[self.token_index]
+            return True
+        self.units.append((self.token_index, len(self.classes),
+                           len(self.error_tokens)))
+        return False
+
+    '''
+    This method checks that the file is still within the time limit of the
+    lexer, if it has one. The parser checks it at the start of every unit and
+    of every feature, and at every syntax error, while the lexer checks it at
+    every line, and every deadline_tokens tokens.
+    '''
+    def check_deadline(self):
+        deadline = self.lexer.deadline
+        if deadline is not None and time.perf_counter() > deadline:
+            raise LimitExceeded('seconds', self.lexer.max_seconds)
+
+    '''
+    This method records a class, whose name is the previous token.
+    '''
+    def record_class(self):
+        self.classes.append(self.tokens[self.token_index - 1][2])
+        self.methods.append([])
+
+    '''
+    This method records a method of the last class, whose name is the token
+    before the previous one.
+    '''
+    def record_method(self):
+        self.methods[-1].append(self.tokens[self.token_index - 2][2])
+
+    '''
+    This method records the start of a feature of the last class, if the current
+    token is the name of one. It runs every time the feature list of the class
+    is entered, including when it is entered again after an error, so a feature
+    is only recorded once.
+    '''
+    def record_feature(self):
+        self.check_deadline()
+        index = self.token_index
+        if self.check('obj_id') and (not self.features or
+                                     self.features[-1] != index):
+            self.features.append(index)
+
+    '''
+    The remaining methods model the COOL grammar. The grammar has been modified
+    such that every non-terminal has no more than one production rule for each
+    token. As such, each of the following methods will try to pick the correct
+    rule based on the current token. If none is found, an error is recorded and
+    a recovery is attempted by going through the next tokens until one that
+    matches one of its rules is found, such that the process can resume.
+
+    The methods return True or False, and the production rules are modelled
+    using boolean 'and'. This makes use of the fact that Python boolean
+    expression evaluation is lazy. For example, the production rule A ::= BCD
+    would be expressed as a method A which returns B() and C() and D(). If B
+    throws an error and it cannot recover, it will return False, such that C()
+    and D() don't get called anymore.
+
+    The method names are taken from the COOl grammar provided in the manual,
+    and modified as follows:
+    - an indexed rule (_0, _1, _2, etc.) represents a part of the original rule,
+      which has been broken down into several rules to eliminate backtracking
+    - a rule with a _p after its name represents a variation of the rule without
+      _p (_p stands for prime, i.e. ')
+    - expression rules have letter indices (_a, _b, etc.), because the
+      expression rule has been broken down into multiple rules for precedence
+    '''
+    def program_0(self):
+        # Program1 goes back to Program0 for every class, which is looped over
+        # rather than recursed into, such that the stack does not grow with the
+        # number of classes
+        while True:
+            if self.enter_unit():
+                return True
+            if not (self.match('class') and self.match('type_id') and
+                    self.class_0() and self.class_1() and self.match(';')):
+                return False
+            if self.program_1():
+                return True
+
+    def program_1(self):
+        return self.check('eof')
+
+    def class_0(self):
+        # a rule is parsed again after recovering from an error in it, which is
+        # looped over rather than recursed into, like the rules below, such
+        # that the stack does not grow with the number of errors either
+        while True:
+            self.record_class()
+
+            if self.check('{'):
+                return self.match('{')
+            if self.check('inherits'):
+                return (self.match('inherits') and self.match('type_id') and
+                        self.match('{'))
+            if not self.recover(['{', 'inherits'], 'Class0'):
+                return False
+            if not self.check_any(['{', 'inherits']):
+                return True
+
+    def class_1(self):
+        # likewise, the features of a class are looped over
+        while True:
+            self.record_feature()
+
+            if self.check('}'):
+                return self.match('}')
+            if self.check('obj_id'):
+                if not (self.match('obj_id') and self.feature_0()):
+                    return False
+            else:
+                if not self.recover(['}', 'obj_id'], 'Class1'):
+                    return False
+                if not self.check_any(['}', 'obj_id']):
+                    return True
+
+    def feature_0(self):
+        while True:
+            if self.check('('):
+                return (self.match('(') and self.feature_1() and
+                        self.match(':') and self.match('type_id') and
+                        self.match('{') and self.expr_a() and
+                        self.match('}') and self.match(';'))
+            if self.check(':'):
+                return (self.match(':') and self.match('type_id') and
+                        self.feature_2())
+            if not self.recover(['(', ':'], 'Feature0'):
+                return False
+            if not self.check_any(['(', ':']):
+                return True
+
+    def feature_1(self):
+        while True:
+            self.record_method()
+            if self.check('obj_id'):
+                return (self.match('obj_id') and self.match(':') and
+                        self.match('type_id') and self.formals())
+            if self.check(')'):
+                return self.match(')')
+            if not self.recover(['obj_id', ')'], 'Feature1'):
+                return False
+            if not self.check_any(['obj_id', ')']):
+                return True
+
+    def feature_2(self):
+        while True:
+            if self.check(';'):
+                return self.match(';')
+            if self.check('<-'):
+                return self.match('<-') and self.expr_a() and self.match(';')
+            if not self.recover([';', '<-'], 'Feature2'):
+                return False
+            if not self.check_any([';', '<-']):
+                return True
+
+    def formals(self):
+        while True:
+            if self.check(','):
+                if not (self.match(',') and self.match('obj_id') and
+                        self.match(':') and self.match('type_id')):
+                    return False
+            elif self.check(')'):
+                return self.match(')')
+            else:
+                if not self.recover([',', ')'], 'Formals'):
+                    return False
+                if not self.check_any([',', ')']):
+                    return True
+
+    def expr_a(self):
+        # every expression starts here, so this is where their nesting is
+        # counted, and limited
+        depth = self.depth + 1
+        if depth > self.depth_limit:
+            raise LimitExceeded('depth', self.max_depth)
+        self.depth = depth
+        # this is the only case of looking up two characters, to distinguish
+        # between assignment and just an object ID
+        if (self.check('obj_id') and
+                self.kinds[self.token_index + 1] == kind_codes['<-']):
+            found = (self.match('obj_id') and self.match('<-') and
+                     self.expr_a())
+        else:
+            found = self.expr_b()
+        self.depth = depth - 1
+        return found
+
+    def expr_b(self):
+        # chains of unary operators, of binary operators, of dispatches, and
+        # of the arguments, bindings, branches and expressions of calls, lets,
+        # cases and blocks are looped over too, such that the stack only grows
+        # with the nesting of expressions
+        while self.check('not'):
+            self.match('not')
+        return self.expr_c0()
+
+    def expr_c0(self):
+        return self.expr_d0() and self.expr_c1()
+
+    def expr_c1(self):
+        while self.check_any(['<', '<=', '=']):
+            operator = kind_names[self.kinds[self.token_index]]
+            if not (self.match(operator) and self.expr_d0()):
+                return False
+        return True
+
+    def expr_d0(self):
+        return self.expr_e0() and self.expr_d1()
+
+    def expr_d1(self):
+        while self.check_any(['+', '-']):
+            operator = kind_names[self.kinds[self.token_index]]
+            if not (self.match(operator) and self.expr_e0()):
+                return False
+        return True
+
+    def expr_e0(self):
+        return self.expr_f() and self.expr_e1()
+
+    def expr_e1(self):
+        while self.check_any(['*', '/']):
+            operator = kind_names[self.kinds[self.token_index]]
+            if not (self.match(operator) and self.expr_f()):
+                return False
+        return True
+
+    def expr_f(self):
+        while self.check('isvoid'):
+            self.match('isvoid')
+        return self.expr_g()
+
+    def expr_g(self):
+        while self.check('~'):
+            self.match('~')
+        return self.expr_h0()
+
+    def expr_h0(self):
+        return self.expr_i0() and self.expr_h1()
+
+    def expr_h1(self):
+        while self.check('@'):
+            if not (self.match('@') and self.match('type_id') and
+                    self.match('.') and self.match('obj_id') and
+                    self.match('(') and self.expr_h2()):
+                return False
+        return True
+
+    def expr_h2(self):
+        if self.check(')'):
+            return self.match(')')
+        return self.exprs_0()
+
+    def expr_i0(self):
+        return self.expr_j() and self.expr_i1()
+
+    def expr_i1(self):
+        while self.check('.'):
+            if not (self.match('.') and self.match('obj_id') and
+                    self.match('(') and self.expr_i2()):
+                return False
+        return True
+
+    def expr_i2(self):
+        if self.check(')'):
+            return self.match(')')
+        return self.exprs_0()
+
+    def expr_j(self):
+        if self.check('('):
+            return self.match('(') and self.expr_a() and self.match(')')
+        return self.expr_k0()
+
+    def expr_k0(self):
+        while True:
+            if self.check('obj_id'):
+                return self.match('obj_id') and self.expr_k1()
+            if self.check('if'):
+                return (self.match('if') and self.expr_a() and
+                        self.match('then') and self.expr_a() and
+                        self.match('else') and self.expr_a() and
+                        self.match('fi'))
+            if self.check('while'):
+                return (self.match('while') and self.expr_a() and
+                        self.match('loop') and self.expr_a() and
+                        self.match('pool'))
+            if self.check('{'):
+                return (self.match('{') and self.expr_a() and
+                        self.match(';') and self.expr_k3())
+            if self.check('let'):
+                return (self.match('let') and self.match('obj_id') and
+                        self.match(':') and self.match('type_id') and
+                        self.expr_k4() and self.expr_k5())
+            if self.check('case'):
+                return (self.match('case') and self.expr_a() and
+                        self.match('of') and self.match('obj_id') and
+                        self.match(':') and self.match('type_id') and
+                        self.match('=>') and self.expr_a() and
+                        self.match(';') and self.expr_k6())
+            if self.check('new'):
+                return self.match('new') and self.match('type_id')
+            if self.check('integer'):
+                return self.match('integer')
+            if self.check('string'):
+                return self.match('string')
+            if self.check('true'):
+                return self.match('true')
+            if self.check('false'):
+                return self.match('false')
+            expected = ['obj_id', 'if', 'while', '{', 'let', 'case', 'new',
+                        'integer', 'string', 'true', 'false']
+            if not self.recover(expected, 'ExprK0'):
+                return False
+            if not self.check_any(expected):
+                return True
+
+    def expr_k1(self):
+        if self.check('('):
+            return self.match('(') and self.expr_k2()
+        return True
+
+    def expr_k2(self):
+        if self.check(')'):
+            return self.match(')')
+        return self.exprs_0()
+
+    def expr_k3(self):
+        if self.check('}'):
+            return self.match('}')
+        return self.exprs_p0()
+
+    # ExprK4 goes on with ExprK5, which is left to its callers, such that
+    # ExprK5 can loop over the bindings
+    def expr_k4(self):
+        if self.check('<-'):
+            return self.match('<-') and self.expr_a()
+        return True
+
+    def expr_k5(self):
+        while True:
+            if self.check(','):
+                if not (self.match(',') and self.match('obj_id') and
+                        self.match(':') and self.match('type_id') and
+                        self.expr_k4()):
+                    return False
+            elif self.check('in'):
+                return self.match('in') and self.expr_a()
+            else:
+                if not self.recover([',', 'in'], 'ExprK5'):
+                    return False
+                if not self.check_any([',', 'in']):
+                    return True
+
+    def expr_k6(self):
+        while True:
+            if self.check('obj_id'):
+                if not (self.match('obj_id') and self.match(':') and
+                        self.match('type_id') and self.match('=>') and
+                        self.expr_a() and self.match(';')):
+                    return False
+            elif self.check('esac'):
+                return self.match('esac')
+            else:
+                if not self.recover(['obj_id', 'esac'], 'ExprK6'):
+                    return False
+                if not self.check_any(['obj_id', 'esac']):
+                    return True
+
+    def exprs_0(self):
+        return self.expr_a() and self.exprs_1()
+
+    def exprs_1(self):
+        while True:
+            if self.check(','):
+                if not (self.match(',') and self.expr_a()):
+                    return False
+            elif self.check(')'):
+                return self.match(')')
+            else:
+                if not self.recover([',', ')'], 'Exprs1'):
+                    return False
+                if not self.check_any([',', ')']):
+                    return True
+
+    def exprs_p0(self):
+        while self.expr_a() and self.match(';'):
+            if self.exprs_p1():
+                return True
+        return False
+
+    # Exprs'1 goes back to Exprs'0 unless the block ends, which is left to
+    # Exprs'0 to loop over
+    def exprs_p1(self):
+        return self.check('}') and self.match('}')
+
+    '''
+    The following method is an alternative to the expression methods above,
+    which parses a whole expression without recursion. The expression rules are
+    expanded on an explicit stack instead of the Python call stack, so neither
+    long chains of operators nor deeply nested expressions can exceed the
+    recursion limit. The stack holds the names of tokens still to be matched
+    and the rules still to be parsed, with the top of the stack last.
+
+    The rules are the ones of grammarE.txt, and every check(), match(),
+    add_syntax_error() and skip_to() call is made in the same order as in the
+    recursive methods, such that errors and recovery are identical. The only
+    liberty taken is with binary operators: ExprC0, ExprD0 and ExprE0 (and
+    their _1 tails) only differ in precedence, which does not change which
+    programs are accepted, so they are climbed as a single loop of operands
+    separated by any binary operator, which never grows the stack.
+
+    :returns: True if the expression is parsed until the end of file, False
+              otherwise
+    '''
+    def expr_iterative(self):
+        stack = [rule_expr_a]
+        max_depth = self.max_depth
+        depth = self.depth
+
+        while stack:
+            item = stack.pop()
+            # the name of a token to be matched
+            if item.__class__ is str:
+                if not self.match(item):
+                    return False
+            # an operand of a binary operator: ExprF, ExprG, ExprH0 and
+            # ExprI0, down to ExprJ
+            elif item == rule_operand:
+                while self.check('isvoid'):
+                    self.match('isvoid')
+                while self.check('~'):
+                    self.match('~')
+                stack.append(rule_binary)
+                stack.append(rule_expr_h1)
+                stack.append(rule_expr_i1)
+                if self.check('('):
+                    self.match('(')
+                    stack.append(')')
+                    stack.append(rule_expr_a)
+                else:
+                    stack.append(rule_expr_k0)
+            # the tails of ExprC1, ExprD1 and ExprE1
+            elif item == rule_binary:
+                operator = kind_names[self.kinds[self.token_index]]
+                if operator in binary_operators:
+                    self.match(operator)
+                    stack.append(rule_binary)
+                    stack.append(rule_operand)
+            elif item == rule_expr_a:
+                # every nested expression starts here, and ends when the item
+                # under it is popped, which is only pushed if the depth is
+                # limited
+                if max_depth is not None:
+                    depth = depth + 1
+                    if depth > max_depth:
+                        raise LimitExceeded('depth', max_depth)
+                    stack.append(rule_expr_end)
+                if (self.check('obj_id') and
+                        self.kinds[self.token_index + 1] == kind_codes['<-']):
+                    self.match('obj_id')
+                    self.match('<-')
+                    stack.append(rule_expr_a)
+                else:
+                    # ExprB
+                    while self.check('not'):
+                        self.match('not')
+                    stack.append(rule_operand)
+            elif item == rule_expr_k0:
+                if self.check('obj_id'):
+                    self.match('obj_id')
+                    # ExprK1
+                    if self.check('('):
+                        self.match('(')
+                        stack.append(rule_arguments)
+                elif self.check('if'):
+                    self.match('if')
+                    stack.extend(['fi', rule_expr_a, 'else', rule_expr_a,
+                                  'then', rule_expr_a])
+                elif self.check('while'):
+                    self.match('while')
+                    stack.extend(['pool', rule_expr_a, 'loop', rule_expr_a])
+                elif self.check('{'):
+                    self.match('{')
+                    stack.extend([rule_expr_k3, ';', rule_expr_a])
+                elif self.check('let'):
+                    self.match('let')
+                    stack.extend([rule_expr_k4, 'type_id', ':', 'obj_id'])
+                elif self.check('case'):
+                    self.match('case')
+                    stack.extend([rule_expr_k6, ';', rule_expr_a, '=>',
+                                  'type_id', ':', 'obj_id', 'of', rule_expr_a])
+                elif self.check('new'):
+                    self.match('new')
+                    stack.append('type_id')
+                elif self.check('integer'):
+                    self.match('integer')
+                elif self.check('string'):
+                    self.match('string')
+                elif self.check('true'):
+                    self.match('true')
+                elif self.check('false'):
+                    self.match('false')
+                else:
+                    expected = ['obj_id', 'if', 'while', '{', 'let', 'case',
+                                'new', 'integer', 'string', 'true', 'false']
+                    if not self.recover(expected, 'ExprK0'):
+                        return False
+                    if self.check_any(expected):
+                        stack.append(rule_expr_k0)
+            elif item == rule_expr_i1:
+                if self.check('.'):
+                    self.match('.')
+                    stack.extend([rule_expr_i1, rule_arguments, '(',
+                                  'obj_id'])
+            elif item == rule_expr_h1:
+                if self.check('@'):
+                    self.match('@')
+                    stack.extend([rule_expr_h1, rule_arguments, '(',
+                                  'obj_id', '.', 'type_id'])
+            # ExprH2, ExprI2 and ExprK2, the arguments after an opening
+            # parenthesis, and Exprs0
+            elif item == rule_arguments:
+                if self.check(')'):
+                    self.match(')')
+                else:
+                    stack.append(rule_exprs_1)
+                    stack.append(rule_expr_a)
+            elif item == rule_exprs_1:
+                if self.check(','):
+                    self.match(',')
+                    stack.append(rule_exprs_1)
+                    stack.append(rule_expr_a)
+                elif self.check(')'):
+                    self.match(')')
+                else:
+                    if not self.recover([',', ')'], 'Exprs1'):
+                        return False
+                    if self.check_any([',', ')']):
+                        stack.append(rule_exprs_1)
+            # ExprK3 and Exprs'1, the rest of a block
+            elif item == rule_expr_k3:
+                if self.check('}'):
+                    self.match('}')
+                else:
+                    stack.extend([rule_expr_k3, ';', rule_expr_a])
+            elif item == rule_expr_k4:
+                if self.check('<-'):
+                    self.match('<-')
+                    stack.append(rule_expr_k5)
+                    stack.append(rule_expr_a)
+                else:
+                    stack.append(rule_expr_k5)
+            elif item == rule_expr_k5:
+                if self.check(','):
+                    self.match(',')
+                    stack.extend([rule_expr_k4, 'type_id', ':', 'obj_id'])
+                elif self.check('in'):
+                    self.match('in')
+                    stack.append(rule_expr_a)
+                else:
+                    if not self.recover([',', 'in'], 'ExprK5'):
+                        return False
+                    if self.check_any([',', 'in']):
+                        stack.append(rule_expr_k5)
+            elif item == rule_expr_k6:
+                if self.check('obj_id'):
+                    self.match('obj_id')
+                    stack.extend([rule_expr_k6, ';', rule_expr_a, '=>',
+                                  'type_id', ':'])
+                elif self.check('esac'):
+                    self.match('esac')
+                else:
+                    if not self.recover(['obj_id', 'esac'], 'ExprK6'):
+                        return False
+                    if self.check_any(['obj_id', 'esac']):
+                        stack.append(rule_expr_k6)
+            elif item == rule_expr_end:
+                depth = depth - 1
+
+        return True
+
+    '''
+    The following method is an alternative to all the rule methods above, which
+    parses a whole program with a predictive parse table compiled from a
+    grammar file (see coolgrammar), instead of one method per rule. The symbols
+    still to be matched or expanded are kept on an explicit stack, as integer
+    codes: the token kinds, followed by the non-terminals. A non-terminal is
+    replaced by the alternative that its row of the table predicts for the
+    current token (or, for the few conflicts resolved by a second token of
+    lookahead, for the next token too), and a token is matched against the
+    current token.
+
+    Errors are handled like in the rule methods: a token that does not match is
+    recovered from by match(), and a non-terminal whose row has no alternative
+    for the current token reports the tokens that start its alternatives, skips
+    to one of them, and is expanded again. The semantic actions of the grammar
+    (recording units, classes and methods) run whenever their non-terminal is
+    expanded. Since the rule methods were translated from grammarE.txt, the
+    table compiled from it reports the same errors, in the same order.
+
+    :returns: True if the program is parsed until the end of file, False
+              otherwise
+    '''
+    def program_table(self):
+        table = self.table
+        rows = table.rows
+        count = table.terminal_count
+        first_action = table.first_action
+        actions = [None if name is None else getattr(self, name)
+                   for name in table.actions]
+        kinds = self.kinds
+        stream = self.stream
+        # a streamed parse pulls more tokens once the index reaches the limit,
+        # which a parse of all the tokens never does
+        limit = len(kinds) - 1 if stream else len(kinds) + 1
+        index = self.token_index
+        stack = [table.start]
+        pop = stack.pop
+        extend = stack.extend
+        # every expression is followed on the stack by a code past those of
+        # the non-terminals, which ends it, if the depth is limited
+        max_depth = self.max_depth
+        depth = self.depth
+        expression = -1 if max_depth is None else table.expression
+        depth_end = len(rows)
+
+        while stack:
+            symbol = pop()
+            if symbol < count:
+                if kinds[index] == symbol:
+                    index = index + 1
+                    if index >= limit:
+                        self.token_index = index
+                        self.fill_tokens()
+                        index = self.token_index
+                        limit = len(kinds) - 1
+                    continue
+                self.token_index = index
+                if not self.match(kind_names[symbol]):
+                    return False
+                index = self.token_index
+                if stream:
+                    limit = len(kinds) - 1
+                continue
+
+            if symbol >= first_action:
+                if symbol == depth_end:
+                    depth = depth - 1
+                    continue
+                self.token_index = index
+                if actions[symbol]():
+                    return True
+            production = rows[symbol][kinds[index]]
+            if production.__class__ is not tuple:
+                if production is None:
+                    expected = table.expected[symbol]
+                    self.token_index = index
+                    if not self.recover(expected, table.names[symbol]):
+                        return False
+                    index = self.token_index
+                    if stream:
+                        limit = len(kinds) - 1
+                    if self.check_any(expected):
+                        stack.append(symbol)
+                    continue
+                # a conflict resolved by the next token
+                if index + 1 < len(kinds):
+                    production = production.get(kinds[index + 1],
+                                                production[None])
+                else:
+                    production = production[None]
+            if symbol == expression:
+                depth = depth + 1
+                if depth > max_depth:
+                    raise LimitExceeded('depth', max_depth)
+                stack.append(depth_end)
+            extend(production)
+
+        self.token_index = index
+        return True
+
+
+'''
+This function formats the file structure, i.e. the classes and their methods,
+one per line, with the methods indented under their class.
+
+:param result: the ParseResult of the program
+:returns: the list of lines to be printed
+'''
+def format_file_structure(result):
+    lines = ['No errors found']
+    for i in range(0, len(result.classes)):
+        lines.append(result.classes[i])
+        for method in result.methods[i]:
+            lines.append('    ' + method)
+    return lines
+
+
+'''
+This function formats the errors found in the program, one per line, starting
+with lexical errors, then syntax errors, both in order of appearance in the
+file.
+
+:param result: the ParseResult of the program
+:returns: the list of lines to be printed
+'''
+def format_errors(result):
+    return ['Errors found'] + result.errors
+
+
+'''
+This function prints the file structure, i.e. the classes and their methods. It
+will only be called if the program is error-free.
+
+:param result: the ParseResult of the program
+'''
+def print_file_structure(result):
+    for line in format_file_structure(result):
+        print(line)
+
+
+'''
+This function prints the errors found in the program, starting with lexical
+errors, then syntax errors, both in order of appearance in the file. It will
+only be called if errors are found.
+
+:param result: the ParseResult of the program
+'''
+def print_errors(result):
+    for line in format_errors(result):
+        print(line)
+
+
+'''
+This function runs the command line of the parser: it parses the given file and
+prints its file structure or its errors, or does what the options ask for
+instead.
+
+:param arguments: the command line arguments; defaults to sys.argv
+:returns: the exit status, 1 if --check-tables finds stale tables or --fail-fast
+          finds an error, 0 otherwise
+'''
+def main(arguments=None):
+    if arguments is None:
+        arguments = sys.argv[1:]
+    # a lone file name is parsed without argparse, which takes longer to import
+    # than a small program takes to parse
+    if len(arguments) == 1 and not arguments[0].startswith('-'):
+        parse(arguments[0])
+        return 0
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(
+        description='Scan and parse a COOL program.')
+    argument_parser.add_argument('filename', nargs='?',
+                                 help='the COOL file to parse')
+    argument_parser.add_argument('--scanner', choices=scanner_engines,
+                                 default=scanner_engine,
+                                 help='the scanning engine to use')
+    argument_parser.add_argument('--expressions',
+                                 choices=['recursive', 'iterative'],
+                                 default=expression_engine,
+                                 help='the expression engine to use')
+    argument_parser.add_argument('--grammar', metavar='FILE', default=None,
+                                 help='parse with a table compiled from this '
+                                      'grammar file, instead of the rule '
+                                      'methods')
+    argument_parser.add_argument('--recovery', choices=['first', 'follow'],
+                                 default=error_recovery,
+                                 help='how to recover from syntax errors')
+    argument_parser.add_argument('--max-errors', type=int, default=None,
+                                 help='stop parsing after this many errors')
+    argument_parser.add_argument('--stream', action='store_true',
+                                 help='parse the tokens as they are scanned, '
+                                      'instead of scanning the whole file '
+                                      'first')
+    argument_parser.add_argument('--fail-fast', action='store_true',
+                                 help='stop at the first error, report only '
+                                      'that one, and exit with status 1 if '
+                                      'there is one')
+    argument_parser.add_argument('-j', '--jobs', type=int, default=None,
+                                 help='split the file at its top-level '
+                                      'classes, and parse them in this many '
+                                      'processes')
+    argument_parser.add_argument('--mapped', action='store_true',
+                                 help='read the file through a memory map, in '
+                                      'chunks')
+    argument_parser.add_argument('--ast', action='store_true',
+                                 help='print the abstract syntax tree of an '
+                                      'error-free program as JSON')
+    argument_parser.add_argument('--profile', action='store_true',
+                                 help='profile every phase of the parse, and '
+                                      'write the profile to standard error')
+    argument_parser.add_argument('--profile-format', choices=['table', 'json'],
+                                 default='table',
+                                 help='the format of the profile')
+    argument_parser.add_argument('--write-tables', action='store_true',
+                                 help='generate the cooltables module from '
+                                      'the scanner rules, and exit')
+    argument_parser.add_argument('--check-tables', action='store_true',
+                                 help='check that the cooltables module is up '
+                                      'to date, and exit')
+    arguments = argument_parser.parse_args(arguments)
+    if arguments.write_tables:
+        write_scanner_tables()
+        return 0
+    if arguments.check_tables:
+        stale_tables = check_scanner_tables()
+        for name in stale_tables:
+            print('Out of date: ' + name)
+        return 1 if stale_tables else 0
+    if arguments.filename is None:
+        argument_parser.error('the filename is required')
+    if (arguments.stream or arguments.fail_fast) and (
+            arguments.profile or arguments.ast or
+            arguments.max_errors is not None):
+        argument_parser.error('--stream and --fail-fast cannot be combined '
+                              'with --profile, --ast or --max-errors')
+    # a grammar that cannot be compiled is reported like any other bad option
+    if arguments.grammar is not None:
+        import coolgrammar
+        try:
+            coolgrammar.load_table(arguments.grammar)
+        except (OSError, ValueError) as exception:
+            argument_parser.error('argument --grammar: ' + str(exception))
+    if arguments.profile:
+        import coolprofile
+        parser = Parser(lexer=Lexer(arguments.scanner, arguments.mapped),
+                        expressions=arguments.expressions,
+                        grammar=arguments.grammar,
+                        recovery=arguments.recovery,
+                        max_errors=arguments.max_errors)
+        result, profile = coolprofile.profile_file(parser, arguments.filename,
+                                                   sys.stdout)
+        coolprofile.write_profile(profile, arguments.profile_format,
+                                  sys.stderr)
+    elif arguments.ast:
+        import coolast
+        parser = Parser(lexer=Lexer(arguments.scanner, arguments.mapped),
+                        build_ast=True, expressions=arguments.expressions,
+                        grammar=arguments.grammar, recovery=arguments.recovery,
+                        max_errors=arguments.max_errors)
+        if arguments.jobs is None:
+            result = parser.parse_file(arguments.filename)
+        else:
+            import coolsplit
+            result = coolsplit.parse_file(parser, arguments.filename,
+                                          arguments.jobs)
+        if result.ast is None:
+            print_errors(result)
+        else:
+            print(coolast.to_json(result.ast, result.tokens))
+    else:
+        result = parse(arguments.filename, arguments.scanner,
+                       arguments.expressions, arguments.mapped,
+                       arguments.grammar, arguments.recovery,
+                       arguments.max_errors, arguments.jobs, arguments.stream,
+                       arguments.fail_fast)
+        if arguments.fail_fast and result.errors:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,534 @@
+import argparse
+import collections
+import os
+import sys
+
+# the symbol that stands for the empty string in the grammar files
+epsilon = 'e'
+# the methods of the parser run by the table-driven engine whenever it expands
+# the given non-terminals, including when it expands them again after
+# recovering from a syntax error, just like the rules of the Parser do
+semantic_actions = {'Program0': 'enter_unit', 'Class0': 'record_class',
+                    'Class1': 'record_feature', 'Feature1': 'record_method'}
+# the non-terminal of a whole expression, every one of which the table-driven
+# engine counts towards the depth limit of a parse, like the Parser does
+expression_rule = 'ExprA'
+# the grammar that the Parser methods were translated from
+default_grammar = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'grammarE.txt')
+# the grammars read so far, and the parse tables compiled from them, by
+# grammar file name
+loaded_grammars = {}
+compiled_tables = {}
+
+
+'''
+This class holds a grammar, as read from one of the grammar files, along with
+everything needed to build a predictive parser for it: which non-terminals can
+derive the empty string, the FIRST and FOLLOW sets of the non-terminals, the
+LL(1) parse table, and the conflicts found while building the table.
+
+A grammar file has one rule per line, "Name ::= symbols", and every further
+alternative of the rule on a line of its own, "| symbols". The first rule is
+the start symbol, the symbols that have no rule are terminals, and 'e' is the
+empty string.
+'''
+class Grammar:
+    '''
+    :param rules: an ordered dictionary mapping every non-terminal to the list
+                  of its alternatives, each a list of symbols
+    '''
+    def __init__(self, rules):
+        self.rules = rules
+        self.start = next(iter(rules))
+        self.terminals = []
+        for alternatives in rules.values():
+            for alternative in alternatives:
+                for symbol in alternative:
+                    if symbol not in rules and symbol not in self.terminals:
+                        self.terminals.append(symbol)
+        self.nullable = compute_nullable(rules)
+        self.first = compute_first(rules, self.nullable)
+        self.follow = compute_follow(self)
+        self.table, self.conflicts = build_table(self)
+        self.resolved = {}
+        for name, token, alternatives in self.conflicts:
+            choices = resolve_conflict(self, name, token, alternatives)
+            if choices is not None:
+                self.resolved[(name, token)] = choices
+
+    '''
+    This method finds the FIRST set of a sequence of symbols.
+
+    :param symbols: the list of symbols
+    :returns: the set of terminals that can start the sequence, and whether the
+              sequence can derive the empty string
+    '''
+    def first_of(self, symbols):
+        first = set()
+        for symbol in symbols:
+            if symbol not in self.rules:
+                first.add(symbol)
+                return first, False
+            first.update(self.first[symbol])
+            if not self.nullable[symbol]:
+                return first, False
+        return first, True
+
+    '''
+    This method finds the alternative of a non-terminal that the parser
+    commits to when the current token does not start any of the alternatives:
+    the only alternative, the one that can derive the empty string, or else the
+    only one that starts with a non-terminal. Errors are then reported further
+    down, where a token is actually expected, as the Parser methods do.
+
+    :param name: the non-terminal
+    :returns: the index of the alternative, or None if there is none
+    '''
+    def default_alternative(self, name):
+        alternatives = self.rules[name]
+        if len(alternatives) == 1:
+            return 0
+        for index, alternative in enumerate(alternatives):
+            if self.first_of(alternative)[1]:
+                return index
+        led = [index for index, alternative in enumerate(alternatives)
+               if alternative[0] in self.rules]
+        if len(led) == 1:
+            return led[0]
+        return None
+
+
+'''
+This function reads a grammar file.
+
+:param filename: the name of the grammar file
+:returns: the Grammar
+'''
+def read_grammar(filename):
+    rules = collections.OrderedDict()
+    name = None
+    with open(filename, 'r') as grammar_file:
+        for line in grammar_file:
+            symbols = line.split()
+            if not symbols:
+                continue
+            if len(symbols) > 1 and symbols[1] == '::=':
+                name = symbols[0]
+                symbols = symbols[2:]
+                rules.setdefault(name, [])
+            elif symbols[0] == '|' and name is not None:
+                symbols = symbols[1:]
+            else:
+                raise ValueError('Malformed grammar line: ' + line.strip())
+            rules[name].append([symbol for symbol in symbols
+                                if symbol != epsilon])
+    if not rules:
+        raise ValueError('The grammar file ' + filename + ' has no rules.')
+    return Grammar(rules)
+
+
+'''
+This function finds the non-terminals that can derive the empty string.
+
+:param rules: the rules of the grammar
+:returns: a dictionary mapping every non-terminal to True or False
+'''
+def compute_nullable(rules):
+    nullable = dict.fromkeys(rules, False)
+    changed = True
+    while changed:
+        changed = False
+        for name, alternatives in rules.items():
+            if nullable[name]:
+                continue
+            for alternative in alternatives:
+                if all(symbol in rules and nullable[symbol]
+                       for symbol in alternative):
+                    nullable[name] = True
+                    changed = True
+                    break
+    return nullable
+
+
+'''
+This function computes the FIRST set of every non-terminal, i.e. the terminals
+that can start a string derived from it.
+
+:param rules: the rules of the grammar
+:param nullable: the non-terminals that can derive the empty string
+:returns: a dictionary mapping every non-terminal to its FIRST set
+'''
+def compute_first(rules, nullable):
+    first = {name: set() for name in rules}
+    changed = True
+    while changed:
+        changed = False
+        for name, alternatives in rules.items():
+            for alternative in alternatives:
+                for symbol in alternative:
+                    if symbol in rules:
+                        added = first[symbol] - first[name]
+                    else:
+                        added = {symbol} - first[name]
+                    if added:
+                        first[name].update(added)
+                        changed = True
+                    if symbol not in rules or not nullable[symbol]:
+                        break
+    return first
+
+
+'''
+This function computes the FOLLOW set of every non-terminal, i.e. the
+terminals that can come right after it. Nothing follows the start symbol, since
+the grammars match the end of file explicitly.
+
+:param grammar: the Grammar, with its FIRST sets already computed
+:returns: a dictionary mapping every non-terminal to its FOLLOW set
+'''
+def compute_follow(grammar):
+    rules = grammar.rules
+    follow = {name: set() for name in rules}
+    changed = True
+    while changed:
+        changed = False
+        for name, alternatives in rules.items():
+            for alternative in alternatives:
+                for position, symbol in enumerate(alternative):
+                    if symbol not in rules:
+                        continue
+                    first, nullable = grammar.first_of(
+                        alternative[position + 1:])
+                    if nullable:
+                        first = first | follow[name]
+                    if first - follow[symbol]:
+                        follow[symbol].update(first)
+                        changed = True
+    return follow
+
+
+'''
+This function builds the LL(1) parse table of a grammar: the alternative of a
+non-terminal is predicted by the tokens in its FIRST set, and, if it can
+derive the empty string, by the tokens in the FOLLOW set of the non-terminal.
+
+:param grammar: the Grammar, with its FIRST and FOLLOW sets already computed
+:returns: the table, as a dictionary mapping (non-terminal, token) pairs to
+          the index of the predicted alternative, and the list of conflicts,
+          as (non-terminal, token, alternative indices) triples; the table
+          holds the first alternative of every conflict
+'''
+def build_table(grammar):
+    predictions = collections.OrderedDict()
+    for name, alternatives in grammar.rules.items():
+        for index, alternative in enumerate(alternatives):
+            first, nullable = grammar.first_of(alternative)
+            if nullable:
+                first = first | grammar.follow[name]
+            for token in sorted(first):
+                predictions.setdefault((name, token), []).append(index)
+    table = {}
+    conflicts = []
+    for (name, token), indices in predictions.items():
+        table[(name, token)] = indices[0]
+        if len(indices) > 1:
+            conflicts.append((name, token, indices))
+    return table, conflicts
+
+
+'''
+This function computes the set of strings of up to two terminals that can
+start a string derived from every non-terminal, which is used to resolve
+LL(1) conflicts with a second token of lookahead.
+
+:param grammar: the Grammar
+:returns: a dictionary mapping every non-terminal to a set of tuples of up to
+          two terminals
+'''
+def compute_first_pairs(grammar):
+    rules = grammar.rules
+    pairs = {name: set() for name in rules}
+    changed = True
+    while changed:
+        changed = False
+        for name, alternatives in rules.items():
+            for alternative in alternatives:
+                found = first_pairs_of(alternative, pairs, rules)
+                if found - pairs[name]:
+                    pairs[name].update(found)
+                    changed = True
+    return pairs
+
+
+'''
+:param symbols: a list of symbols
+:param pairs: the pairs of every non-terminal found so far
+:param rules: the rules of the grammar
+:returns: the set of strings of up to two terminals that can start the symbols
+'''
+def first_pairs_of(symbols, pairs, rules):
+    found = {()}
+    for symbol in symbols:
+        if symbol in rules:
+            following = pairs[symbol]
+        else:
+            following = {(symbol,)}
+        found = {(prefix + suffix)[:2] for prefix in found
+                 for suffix in following}
+        if all(len(prefix) == 2 for prefix in found):
+            break
+    return found
+
+
+'''
+This function resolves an LL(1) conflict by looking at the token after the
+current one: every alternative is predicted by the second tokens of the
+strings that it can start with the current token (followed by the FOLLOW set
+of the non-terminal). The conflict cannot be resolved this way if two
+alternatives claim the same second token, or if an alternative only reaches
+the current token through the FOLLOW set, such that any token may come after
+it. A second token that no alternative claims predicts the default alternative
+of the non-terminal, if it is one of the alternatives in conflict, or else the
+first of them.
+
+:param grammar: the Grammar
+:param name: the non-terminal
+:param token: the current token
+:param alternatives: the indices of the alternatives in conflict
+:returns: a dictionary mapping second tokens to alternative indices, with the
+          alternative of any other token under None, or None if the conflict
+          cannot be resolved with two tokens
+'''
+def resolve_conflict(grammar, name, token, alternatives):
+    pairs = compute_first_pairs(grammar)
+    follow = {(terminal,) for terminal in grammar.follow[name]} or {()}
+    choices = {}
+    for index in alternatives:
+        found = first_pairs_of(grammar.rules[name][index], pairs,
+                               grammar.rules)
+        for pair in {(prefix + suffix)[:2] for prefix in found
+                     for suffix in follow}:
+            if not pair or pair[0] != token:
+                continue
+            if len(pair) < 2:
+                return None
+            if choices.setdefault(pair[1], index) != index:
+                return None
+    default = grammar.default_alternative(name)
+    if default not in alternatives:
+        default = alternatives[0]
+    choices[None] = default
+    return choices
+
+
+'''
+This class is a parse table compiled for the table-driven engine of the
+Parser, with every symbol replaced by an integer code: the terminals by their
+token kind codes, and the non-terminals by the codes after them. Every row is
+a list indexed by the kind code of the current token, which holds the symbols
+of the predicted alternative in reverse order (ready to be pushed on the
+stack), a dictionary of such tuples indexed by the kind code of the next token
+for a conflict resolved by a second token of lookahead, or None if the token
+is a syntax error.
+'''
+class ParseTable:
+    '''
+    :param grammar: the Grammar to compile
+    '''
+    def __init__(self, grammar):
+        import coolparser
+
+        unknown = unknown_terminals(grammar)
+        if unknown:
+            raise ValueError('The grammar uses symbols that are neither rules '
+                             'nor tokens: ' + ', '.join(unknown) + '.')
+        self.terminal_count = len(coolparser.kind_names)
+        # the non-terminals with semantic actions come last, such that the
+        # engine only needs to compare a code to tell if it has an action
+        names = ([name for name in grammar.rules
+                  if name not in semantic_actions] +
+                 [name for name in grammar.rules if name in semantic_actions])
+        codes = dict(coolparser.kind_codes)
+        for index, name in enumerate(names):
+            codes[name] = self.terminal_count + index
+        self.start = codes[grammar.start]
+        self.expression = codes.get(expression_rule)
+        self.first_action = (self.terminal_count + len(names) -
+                             len([name for name in names
+                                  if name in semantic_actions]))
+        self.names = list(coolparser.kind_names) + names
+
+        # the rows and the other per-symbol lists have an entry for every
+        # symbol, such that the engine indexes them with the symbol directly
+        self.rows = [None] * self.terminal_count
+        # the tokens expected by every non-terminal, in the order of its
+        # alternatives, when the current token starts none of them
+        self.expected = [None] * self.terminal_count
+        # the name of the semantic action of every non-terminal, if any
+        self.actions = [None] * self.terminal_count
+        for name in names:
+            alternatives = grammar.rules[name]
+            productions = [tuple(codes[symbol] for symbol in
+                                 reversed(alternative))
+                           for alternative in alternatives]
+            default = grammar.default_alternative(name)
+            if default is None:
+                row = [None] * self.terminal_count
+            else:
+                row = [productions[default]] * self.terminal_count
+            expected = []
+            for index, alternative in enumerate(alternatives):
+                for token in sorted(grammar.first_of(alternative)[0],
+                                    key=codes.get):
+                    if token not in expected:
+                        expected.append(token)
+            for (rule, token), index in grammar.table.items():
+                if rule == name:
+                    row[codes[token]] = productions[index]
+            for (conflict, token), choices in grammar.resolved.items():
+                if conflict == name:
+                    row[codes[token]] = {
+                        codes.get(second): productions[index]
+                        for second, index in choices.items()}
+            self.rows.append(row)
+            self.expected.append(expected)
+            self.actions.append(semantic_actions.get(name))
+
+
+'''
+:param grammar: the Grammar
+:returns: the list of the terminals of the grammar that are not token kinds,
+          which are usually misspelt non-terminals
+'''
+def unknown_terminals(grammar):
+    import coolparser
+
+    return [terminal for terminal in grammar.terminals
+            if terminal not in coolparser.kind_codes]
+
+
+'''
+This function reads a grammar file, once.
+
+:param filename: the name of the grammar file; defaults to grammarE.txt
+:returns: the Grammar
+'''
+def load_grammar(filename=None):
+    if filename is None:
+        filename = default_grammar
+    key = os.path.abspath(filename)
+    if key not in loaded_grammars:
+        loaded_grammars[key] = read_grammar(filename)
+    return loaded_grammars[key]
+
+
+'''
+This function reads and compiles a grammar file into a parse table for the
+table-driven engine of the Parser. Every file is only compiled once.
+
+:param filename: the name of the grammar file; defaults to grammarE.txt
+:returns: the ParseTable
+'''
+def load_table(filename=None):
+    key = os.path.abspath(filename or default_grammar)
+    if key not in compiled_tables:
+        compiled_tables[key] = ParseTable(load_grammar(filename))
+    return compiled_tables[key]
+
+
+'''
+This function finds the synchronising tokens of every rule of a grammar, for
+the Parser to recover from syntax errors with: the tokens in the FOLLOW set of
+the rule, in the order of their kind codes.
+
+:param filename: the name of the grammar file; defaults to grammarE.txt
+:returns: a dictionary mapping the name of every rule to its list of tokens
+'''
+def load_follow_sets(filename=None):
+    import coolparser
+
+    grammar = load_grammar(filename)
+    return {name: sorted(follow, key=coolparser.kind_codes.get)
+            for name, follow in grammar.follow.items()}
+
+
+'''
+This function describes a grammar: the FIRST and FOLLOW sets of its
+non-terminals, its LL(1) conflicts (and how they are resolved), and,
+optionally, its parse table.
+
+:param grammar: the Grammar
+:param show_table: whether to include the parse table
+:returns: the list of lines of the description
+'''
+def format_report(grammar, show_table=False):
+    lines = []
+    for name in grammar.rules:
+        lines.append(name + (' (nullable)' if grammar.nullable[name] else ''))
+        lines.append('    FIRST:  ' + ' '.join(sorted(grammar.first[name])))
+        lines.append('    FOLLOW: ' + ' '.join(sorted(grammar.follow[name])))
+    lines.append('')
+    if not grammar.conflicts:
+        lines.append('The grammar is LL(1).')
+    for name, token, alternatives in grammar.conflicts:
+        line = ('Conflict: ' + name + ' on \'' + token + '\' between ' +
+                ' and '.join(format_alternative(grammar, name, index)
+                             for index in alternatives))
+        if (name, token) in grammar.resolved:
+            line = line + '; resolved by the next token'
+        else:
+            line = line + '; the first alternative is taken'
+        lines.append(line)
+    unknown = unknown_terminals(grammar)
+    if unknown:
+        lines.append('Symbols that are neither rules nor tokens: ' +
+                     ' '.join(unknown))
+    if show_table:
+        lines.append('')
+        for (name, token), index in grammar.table.items():
+            lines.append('%-10s %-10s %s' % (name, token, format_alternative(
+                grammar, name, index)))
+    return lines
+
+
+'''
+:param grammar: the Grammar
+:param name: a non-terminal
+:param index: the index of one of its alternatives
+:returns: the alternative, as it appears in the grammar file
+'''
+def format_alternative(grammar, name, index):
+    return ' '.join(grammar.rules[name][index]) or epsilon
+
+
+'''
+This function runs the grammar compiler command line: it reads the grammar
+files, and describes them.
+
+:returns: the exit status: 0 if every grammar can be compiled for the parser,
+          1 if any of them uses symbols that are neither rules nor tokens
+'''
+def main():
+    argument_parser = argparse.ArgumentParser(
+        description='Compute the FIRST and FOLLOW sets, LL(1) conflicts and '
+                    'parse table of COOL grammar files.')
+    argument_parser.add_argument('filenames', nargs='+',
+                                 help='the grammar files')
+    argument_parser.add_argument('--table', action='store_true',
+                                 help='also print the parse table')
+    arguments = argument_parser.parse_args()
+
+    status = 0
+    for filename in arguments.filenames:
+        grammar = read_grammar(filename)
+        if len(arguments.filenames) > 1:
+            print('==> ' + filename + ' <==')
+        print('\n'.join(format_report(grammar, arguments.table)))
+        if unknown_terminals(grammar):
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
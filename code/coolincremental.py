@@ -0,0 +1,269 @@
+import array
+import bisect
+import io
+
+import coolparser
+
+
+'''
+This function parses a program held in memory, and keeps its text in the result,
+such that the result can be updated incrementally by reparse() when the text is
+edited.
+
+:param parser: the Parser used to parse the text
+:param text: the text of the program
+:returns: the ParseResult of the text
+'''
+def parse_text(parser, text):
+    result = parser.parse(io.StringIO(text))
+    result.source = text
+    return result
+
+
+'''
+This function reparses a program after an edit of its text, reusing as much of
+the previous result as possible. A program is a sequence of top-level units
+(the classes entered by program_0()), and the parse of a unit only depends on
+the tokens from its start onward, so:
+- lexemes never span lines, and comments never span tokens, so only the text
+  from the token before the first unit touched by the edit, up to the start of
+  the first unit after the edited lines, is scanned again; the whole text is
+  parsed again instead if that text ends in a comment, which runs into the
+  units after it
+- the tokens, classes, methods and errors of the units before the edit are
+  reused as they are
+- parsing resumes at the start of the first unit touched by the edit, and stops
+  as soon as it reaches the start of a unit that has not been touched, whose
+  tokens, classes, methods and errors are then reused, shifted to their new
+  rows and offsets
+If an edit changes how the units after it are parsed (for example, by removing
+the end of a class, such that error recovery runs into the next one), parsing
+simply goes on past them. The outcome is always the same as that of parsing the
+new text from scratch.
+
+:param parser: the Parser used to parse the text
+:param previous: the ParseResult of the text before the edit, as returned by
+                 parse_text() or reparse()
+:param offset: the offset in the previous text at which the edit starts
+:param deleted: the number of characters removed from the previous text
+:param inserted: the text inserted in their place
+:returns: the ParseResult of the edited text
+'''
+def reparse(parser, previous, offset, deleted, inserted):
+    source = previous.source
+    if source is None or previous.units is None:
+        raise ValueError('The previous result was not parsed from text.')
+    if offset < 0 or deleted < 0 or offset + deleted > len(source):
+        raise ValueError('The edit does not fit in the previous text.')
+    text = source[:offset] + inserted + source[offset + deleted:]
+    # the errors of a unit cannot be reused when an edit before it can change
+    # where parsing stops
+    if parser.max_errors is not None:
+        return parse_text(parser, text)
+    delta = len(inserted) - deleted
+    old_tokens = previous.tokens
+    old_starts = previous.line_starts
+    units = previous.units
+
+    # the edited lines, in the previous text, start at first_line and end just
+    # before last_line
+    first_line = old_starts[bisect.bisect_right(old_starts, offset) - 1]
+    row = bisect.bisect_right(old_starts, offset + deleted)
+    if row < len(old_starts):
+        last_line = old_starts[row]
+    else:
+        last_line = len(source)
+    # the first unit touched is the one the edited lines start in, and the
+    # units from the first one that starts after the edited lines are reused;
+    # a unit spans from its first token up to the first token of the next one
+    unit_starts = [0] + [old_tokens.offsets[unit[0]] for unit in units[1:]]
+    first_unit = bisect.bisect_right(unit_starts, first_line) - 1
+    next_unit = max(first_unit + 1,
+                    bisect.bisect_left(unit_starts, last_line))
+    start = unit_starts[first_unit]
+    first_token = units[first_unit][0]
+    if next_unit < len(units):
+        end = unit_starts[next_unit]
+        next_token = units[next_unit][0]
+    else:
+        end = len(source)
+        next_token = len(old_tokens) - 1
+
+    # scan the new text from the token before the first unit touched, which,
+    # unlike the start of its line, cannot be in a comment; the text before the
+    # token on its line is blanked out, such that the columns stay the same
+    if first_token > 0:
+        origin = old_tokens.offsets[first_token - 1]
+    else:
+        origin = 0
+    row = bisect.bisect_right(old_starts, origin)
+    region_start = old_starts[row - 1]
+    line_starts = old_starts[:row]
+    find_lines(text, region_start, end + delta, line_starts)
+    row_delta = len(line_starts) - bisect.bisect_right(old_starts, end)
+    region = parser.lexer.scan(io.StringIO(' ' * (origin - region_start) +
+                                           text[origin:end + delta]))
+    region_lines = parser.lexer.line_starts
+    if next_unit < len(units) and parser.lexer.open_comment is not None:
+        return parse_text(parser, text)
+
+    tokens = coolparser.TokenStore()
+    tokens.strings = list(old_tokens.strings)
+    tokens.string_indices = dict(old_tokens.string_indices)
+    tokens.kinds = old_tokens.kinds[:first_token]
+    tokens.rows = old_tokens.rows[:first_token]
+    tokens.columns = old_tokens.columns[:first_token]
+    tokens.values = old_tokens.values[:first_token]
+    tokens.offsets = old_tokens.offsets[:first_token]
+    # the tokens on the same line before the first unit touched belong to the
+    # unit before it
+    for index in range(len(region) - 1):
+        token_offset = region_start + region.offsets[index]
+        if token_offset >= start:
+            tokens.append(region.kinds[index], region.rows[index] + row - 1,
+                          region.columns[index], region.value(index),
+                          token_offset)
+    token_delta = len(tokens) - next_token
+
+    # the lexical errors come first, in order of appearance in the file
+    lexical_count = len(previous.error_offsets)
+    old_offsets = previous.error_offsets
+    first_error = bisect.bisect_left(old_offsets, start)
+    next_error = bisect.bisect_left(old_offsets, end)
+    errors = previous.errors[:first_error]
+    error_offsets = old_offsets[:first_error]
+    for message, error_offset in zip(parser.lexer.errors,
+                                     parser.lexer.error_offsets):
+        if region_start + error_offset >= start:
+            error_row, column = coolparser.get_coordinates(error_offset,
+                                                           region_lines)
+            errors.append(shift_message(message, (error_row, column),
+                                        (error_row + row - 1, column)))
+            error_offsets.append(region_start + error_offset)
+    scanned = len(tokens) > first_token or len(error_offsets) > first_error
+
+    if next_unit < len(units):
+        for index in range(next_error, lexical_count):
+            error_row, column = coolparser.get_coordinates(old_offsets[index],
+                                                           old_starts)
+            errors.append(shift_message(previous.errors[index],
+                                        (error_row, column),
+                                        (error_row + row_delta, column)))
+            error_offsets.append(old_offsets[index] + delta)
+        # the rest of the file, including the EOF token, is only shifted
+        tokens.kinds.extend(old_tokens.kinds[next_token:])
+        if row_delta == 0:
+            tokens.rows.extend(old_tokens.rows[next_token:])
+        else:
+            tokens.rows.extend(array.array(
+                'I', [token_row + row_delta
+                      for token_row in old_tokens.rows[next_token:]]))
+        tokens.columns.extend(old_tokens.columns[next_token:])
+        tokens.values.extend(old_tokens.values[next_token:])
+        tokens.offsets.extend(array.array(
+            'q', [token_offset + delta
+                  for token_offset in old_tokens.offsets[next_token:]]))
+        line_starts.extend(line_start + delta for line_start in
+                           old_starts[bisect.bisect_right(old_starts, end):])
+    elif scanned or first_token == 0:
+        # the EOF token follows the last lexeme of the file, which was scanned
+        # again
+        eof = len(region) - 1
+        eof_offset = region_start + region.offsets[eof]
+        if len(tokens) == 0:
+            eof_coordinate = (0, 0)
+        else:
+            eof_coordinate = coolparser.get_coordinates(eof_offset,
+                                                        line_starts)
+        tokens.append(region.kinds[eof], eof_coordinate[0], eof_coordinate[1],
+                      None, eof_offset)
+    else:
+        # the last lexeme of the file comes before the region that was scanned
+        # again, so its end is not known
+        return parse_text(parser, text)
+
+    # parse again from the start of the first unit touched, in the same state
+    # as before
+    token_index, class_count, error_count = units[first_unit]
+    parser.reset(tokens)
+    parser.token_index = token_index
+    parser.errors = errors + previous.errors[lexical_count:
+                                             lexical_count + error_count]
+    parser.error_tokens = previous.error_tokens[:error_count]
+    parser.classes = previous.classes[:class_count]
+    parser.methods = previous.methods[:class_count]
+    features = previous.features
+    parser.features = features[:bisect.bisect_left(features, token_index)]
+    parser.units = units[:first_unit]
+    parser.stop_points = {}
+    for unit in range(next_unit, len(units)):
+        parser.stop_points[units[unit][0] + token_delta] = unit
+    parser.program_0()
+
+    # reuse the units that were reached
+    if parser.stopped_at is not None:
+        token_index, class_count, error_count = units[parser.stopped_at]
+        class_shift = len(parser.classes) - class_count
+        error_shift = len(parser.error_tokens) - error_count
+        for unit_index, unit_classes, unit_errors in \
+                units[parser.stopped_at:]:
+            parser.units.append((unit_index + token_delta,
+                                 unit_classes + class_shift,
+                                 unit_errors + error_shift))
+        parser.classes.extend(previous.classes[class_count:])
+        parser.methods.extend(previous.methods[class_count:])
+        parser.features.extend(
+            feature + token_delta for feature in
+            features[bisect.bisect_left(features, token_index):])
+        for index in range(error_count, len(previous.error_tokens)):
+            error_token = previous.error_tokens[index]
+            coordinate = (old_tokens.rows[error_token],
+                          old_tokens.columns[error_token])
+            parser.errors.append(shift_message(
+                previous.errors[lexical_count + index], coordinate,
+                (coordinate[0] + row_delta, coordinate[1])))
+            parser.error_tokens.append(error_token + token_delta)
+
+    ast = None
+    if parser.build_ast and not parser.errors:
+        import coolast
+        ast = coolast.build_tree(tokens)
+    result = coolparser.ParseResult(tokens, tokens.offsets, line_starts,
+                                    parser.classes, parser.methods,
+                                    parser.errors, ast, parser.units,
+                                    error_offsets, parser.error_tokens,
+                                    parser.features)
+    result.source = text
+    return result
+
+
+'''
+This function appends the start of every line that starts in the given range of
+a text to a list of line starts.
+
+:param text: the text
+:param start: the offset at which the range starts, exclusive
+:param end: the offset at which the range ends, inclusive
+:param starts: the list to which the line start offsets are appended
+'''
+def find_lines(text, start, end, starts):
+    position = text.find('\n', start, end)
+    while position >= 0:
+        starts.append(position + 1)
+        position = text.find('\n', position + 1, end)
+
+
+'''
+This function moves the coordinates quoted in an error message. The
+coordinates are the only part of a message that looks like a (row, column)
+pair, since lexemes never contain a comma followed by a space.
+
+:param message: the error message
+:param old: the coordinates quoted in the message
+:param new: the coordinates to quote instead
+:returns: the updated message
+'''
+def shift_message(message, old, new):
+    if old == new:
+        return message
+    return message.replace(str(old), str(new), 1)
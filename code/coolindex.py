@@ -0,0 +1,592 @@
+import argparse
+import bisect
+import json
+import os
+import sys
+import tempfile
+
+import coolbatch
+import coolcache
+import coolparser
+
+# the version of the layout of the index files; an index written with another
+# layout is discarded, and every file is indexed again
+index_format = 1
+# the classes every program starts with, and their methods, as (name, formals,
+# return type) triples, as the COOL manual defines them
+basic_classes = [
+    ('Object', None, [('abort', [], 'Object'), ('type_name', [], 'String'),
+                      ('copy', [], 'SELF_TYPE')]),
+    ('IO', 'Object', [('out_string', [('x', 'String')], 'SELF_TYPE'),
+                      ('out_int', [('x', 'Int')], 'SELF_TYPE'),
+                      ('in_string', [], 'String'), ('in_int', [], 'Int')]),
+    ('Int', 'Object', []),
+    ('String', 'Object', [('length', [], 'Int'),
+                          ('concat', [('s', 'String')], 'String'),
+                          ('substr', [('i', 'Int'), ('l', 'Int')], 'String')]),
+    ('Bool', 'Object', []),
+]
+
+
+'''
+This function gives the source span of a range of tokens, as the coordinates of
+its first and last tokens, like coolast.Node.span() does.
+
+:param tokens: the TokenStore of the file
+:param first: the index of the first token
+:param last: the index of the last token
+:returns: a [[row, column], [row, column]] list, which can be written out as
+          JSON as it is
+'''
+def get_span(tokens, first, last):
+    return [[tokens.rows[first], tokens.columns[first]],
+            [tokens.rows[last], tokens.columns[last]]]
+
+
+'''
+This function reads the signature of a method from the tokens that follow its
+name: the formals, up to the closing parenthesis, and the return type.
+
+:param tokens: the TokenStore of the file
+:param index: the index of the opening parenthesis
+:returns: a (formals, return type) pair, where formals is a list of [name,
+          type] pairs, or None if the signature is malformed
+'''
+def read_signature(tokens, index):
+    kinds = tokens.kinds
+    codes = coolparser.kind_codes
+    last = len(kinds) - 1
+    formals = []
+    index = index + 1
+    if kinds[index] != codes[')']:
+        while index + 3 < last:
+            if (kinds[index] != codes['obj_id'] or
+                    kinds[index + 1] != codes[':'] or
+                    kinds[index + 2] != codes['type_id']):
+                return None
+            formals.append([tokens.value(index), tokens.value(index + 2)])
+            index = index + 3
+            if kinds[index] == codes[')']:
+                break
+            if kinds[index] != codes[',']:
+                return None
+            index = index + 1
+        else:
+            return None
+    if (index + 2 > last or kinds[index + 1] != codes[':'] or
+            kinds[index + 2] != codes['type_id']):
+        return None
+    return formals, tokens.value(index + 2)
+
+
+'''
+This function builds the symbol index of a parsed file from the units and the
+features recorded by the parser, without building a tree: every class, with
+its parent (None if it does not inherit from another class), its attributes
+and their types, and its methods, with their formals and return types, along
+with the source span of each. A class spans its unit; a feature spans the
+tokens from its name up to the next feature, or up to the closing brace of its
+class. In a file with syntax errors, the classes and features that cannot be
+read are left out, so the index holds whatever the parser recovered.
+
+:param result: the ParseResult of the file, as returned by the parser
+:returns: the index of the file, as a dictionary which can be written out as
+          JSON
+'''
+def index_result(result):
+    tokens = result.tokens
+    kinds = tokens.kinds
+    codes = coolparser.kind_codes
+    features = result.features
+    unit_starts = [unit[0] for unit in result.units]
+    # the last token of the program is the end of file
+    unit_starts.append(len(kinds) - 1)
+
+    classes = []
+    for unit, start in enumerate(unit_starts[:-1]):
+        end = unit_starts[unit + 1]
+        if (start + 1 >= end or kinds[start] != codes['class'] or
+                kinds[start + 1] != codes['type_id']):
+            continue
+        parent = None
+        if (start + 3 < end and kinds[start + 2] == codes['inherits'] and
+                kinds[start + 3] == codes['type_id']):
+            parent = tokens.value(start + 3)
+        entry = {'name': tokens.value(start + 1), 'parent': parent,
+                 'span': get_span(tokens, start, end - 1),
+                 'attributes': [], 'methods': []}
+        classes.append(entry)
+
+        # the features of the class end where the next one starts, and the
+        # last one ends before the closing brace and semicolon of the class
+        first = bisect.bisect_left(features, start)
+        last = bisect.bisect_left(features, end)
+        close = end - 1
+        if (end - 2 > start and kinds[end - 1] == codes[';'] and
+                kinds[end - 2] == codes['}']):
+            close = end - 3
+        for feature in range(first, last):
+            name = features[feature]
+            following = close
+            if feature + 1 < last:
+                following = features[feature + 1] - 1
+            span = get_span(tokens, name, max(name, following))
+            if kinds[name + 1] == codes['(']:
+                signature = read_signature(tokens, name + 1)
+                if signature is not None:
+                    entry['methods'].append(
+                        {'name': tokens.value(name), 'formals': signature[0],
+                         'return_type': signature[1], 'span': span})
+            elif (kinds[name + 1] == codes[':'] and
+                    kinds[name + 2] == codes['type_id']):
+                entry['attributes'].append(
+                    {'name': tokens.value(name), 'type': tokens.value(name + 2),
+                     'span': span})
+
+    return {'classes': classes, 'errors': len(result.errors)}
+
+
+'''
+This function parses a file and builds its symbol index. Files that cannot be
+parsed at all (e.g. unreadable files) are indexed without classes, with the
+exception raised, so that one file does not stop the whole index from being
+built.
+
+:param parser: the Parser used to parse the file
+:param filename: the name of the file
+:returns: the index of the file, as returned by index_result()
+'''
+def index_file(parser, filename):
+    try:
+        return index_result(parser.parse_file(filename))
+    except Exception as exception:
+        return {'classes': [], 'errors': 0,
+                'exception': type(exception).__name__ + ': ' + str(exception)}
+
+
+'''
+This function gives the stamp of a file, which tells whether it has changed
+since it was indexed.
+
+:param filename: the name of the file
+:returns: a [modification time in nanoseconds, size] list, or None if the file
+          cannot be read
+'''
+def get_stamp(filename):
+    try:
+        status = os.stat(filename)
+    except OSError:
+        return None
+    return [status.st_mtime_ns, status.st_size]
+
+
+'''
+This class is the symbol index of a project: the index of every file, which is
+what is kept on disk, and the tables derived from them, which are rebuilt
+whenever a file is indexed again, such that every query is a dictionary lookup
+or a binary search, and never parses anything. The basic classes (Object, IO,
+Int, String and Bool) are always part of the index. When a class is defined in
+several files, the first definition, by file name, is the one that counts.
+'''
+class ProjectIndex:
+    '''
+    :param version: the version of the scanner rules and grammar the files are
+                    indexed with (see coolcache.get_version()); an index saved
+                    with another version is not reused
+    '''
+    def __init__(self, version=None):
+        self.version = version
+        # maps the name of every indexed file to its index, with its stamp
+        self.files = {}
+        self.rebuild()
+
+    '''
+    This method rebuilds the tables derived from the indexes of the files:
+    - definitions: maps every class to a (file name, class entry) pair, where
+      the file name is None for the basic classes
+    - duplicates: maps every class defined more than once to the files of the
+      definitions that do not count
+    - children: maps every class to the sorted list of its direct subclasses
+    - ancestors: maps every class to the tuple of its ancestors, nearest first,
+      and ancestor_sets to the set of the class and its ancestors
+    - descendants: maps every class to the sorted list of all its subclasses
+    - methods: maps every class to a dictionary from the name of every method
+      it defines or inherits to a (defining class, method entry) pair
+    - missing_parents: maps every class whose parent is not defined to the
+      name of the parent
+    - cycles: the sorted list of the classes whose inheritance is cyclic
+    - names: the sorted list of all the classes, for prefix searches
+    - file_spans: maps every file to the sorted first coordinates of its
+      classes, the classes, and the sorted first coordinates and the features
+      of every class, for position lookups
+    '''
+    def rebuild(self):
+        definitions = {}
+        duplicates = {}
+        for name, parent, methods in basic_classes:
+            definitions[name] = (None, {
+                'name': name, 'parent': parent, 'span': None,
+                'attributes': [],
+                'methods': [{'name': method, 'formals': [list(formal)
+                                                         for formal in formals],
+                             'return_type': return_type, 'span': None}
+                            for method, formals, return_type in methods]})
+        self.file_spans = {}
+        for filename in sorted(self.files):
+            classes = self.files[filename]['classes']
+            for entry in classes:
+                name = entry['name']
+                if name in definitions:
+                    duplicates.setdefault(name, []).append(filename)
+                else:
+                    definitions[name] = (filename, entry)
+            class_features = []
+            for entry in classes:
+                features = sorted(entry['attributes'] + entry['methods'],
+                                  key=lambda feature: feature['span'][0])
+                class_features.append(([feature['span'][0]
+                                        for feature in features], features))
+            self.file_spans[filename] = (
+                [entry['span'][0] for entry in classes], classes,
+                class_features)
+
+        # every class without a parent inherits from Object
+        parents = {}
+        self.missing_parents = {}
+        for name, (filename, entry) in definitions.items():
+            parent = entry['parent']
+            if parent is None and name != 'Object':
+                parent = 'Object'
+            if parent is not None and parent not in definitions:
+                self.missing_parents[name] = parent
+                parent = None
+            parents[name] = parent
+
+        self.ancestors = {}
+        self.ancestor_sets = {}
+        cycles = set()
+        for name in definitions:
+            chain = []
+            seen = {name}
+            parent = parents[name]
+            while parent is not None:
+                if parent in seen:
+                    cycles.add(name)
+                    break
+                chain.append(parent)
+                seen.add(parent)
+                parent = parents[parent]
+            self.ancestors[name] = tuple(chain)
+            self.ancestor_sets[name] = seen
+
+        children = {name: [] for name in definitions}
+        descendants = {name: [] for name in definitions}
+        for name, parent in parents.items():
+            if parent is not None and name not in cycles:
+                children[parent].append(name)
+            for ancestor in self.ancestors[name]:
+                descendants[ancestor].append(name)
+        for subclasses in list(children.values()) + list(descendants.values()):
+            subclasses.sort()
+
+        # the methods of a class are those of its parent, overridden by its own,
+        # so the classes are resolved from the root down
+        self.methods = {}
+        for name in sorted(definitions, key=lambda name: len(
+                self.ancestors[name])):
+            parent = parents[name]
+            if parent is not None and name not in cycles:
+                resolved = dict(self.methods[parent])
+            else:
+                resolved = {}
+            for method in definitions[name][1]['methods']:
+                resolved[method['name']] = (name, method)
+            self.methods[name] = resolved
+
+        self.definitions = definitions
+        self.duplicates = duplicates
+        self.children = children
+        self.descendants = descendants
+        self.cycles = sorted(cycles)
+        self.names = sorted(definitions)
+
+    '''
+    This method indexes a file again if it has changed since it was last
+    indexed, or if it was never indexed. The derived tables are not rebuilt,
+    so that several files can be updated first (see update()).
+
+    :param parser: the Parser used to parse the file
+    :param filename: the name of the file
+    :returns: True if the file was indexed again, False if it was up to date
+    '''
+    def update_file(self, parser, filename):
+        stamp = get_stamp(filename)
+        indexed = self.files.get(filename)
+        if indexed is not None and stamp is not None and \
+                indexed['stamp'] == stamp:
+            return False
+        entry = index_file(parser, filename)
+        entry['stamp'] = stamp
+        self.files[filename] = entry
+        return True
+
+    '''
+    This method brings the index up to date with the given files: the files that
+    changed are indexed again, and the files that no longer exist are dropped,
+    along with the indexed files that are not listed, if asked to.
+
+    :param parser: the Parser used to parse the files
+    :param filenames: the names of the files of the project
+    :param prune: whether to drop the indexed files that are not listed
+    :returns: the list of the names of the files that were indexed again
+    '''
+    def update(self, parser, filenames, prune=False):
+        updated = []
+        for filename in filenames:
+            if self.update_file(parser, filename):
+                updated.append(filename)
+        listed = set(filenames)
+        for filename in list(self.files):
+            if (prune and filename not in listed) or \
+                    not os.path.exists(filename):
+                del self.files[filename]
+                updated.append(filename)
+        if updated:
+            self.rebuild()
+        return updated
+
+    '''
+    :param name: the name of a class
+    :returns: the (file name, class entry) pair of the class, or None if it is
+              not defined
+    '''
+    def find_class(self, name):
+        return self.definitions.get(name)
+
+    '''
+    :param name: the name of a class
+    :param direct: whether to only give the direct subclasses
+    :returns: the sorted list of the subclasses of the class
+    '''
+    def get_subclasses(self, name, direct=False):
+        if direct:
+            return self.children.get(name, [])
+        return self.descendants.get(name, [])
+
+    '''
+    :param name: the name of a class
+    :returns: the tuple of the ancestors of the class, nearest first
+    '''
+    def get_ancestors(self, name):
+        return self.ancestors.get(name, ())
+
+    '''
+    :param name: the name of a class
+    :param ancestor: the name of another class
+    :returns: True if the class conforms to the other class, i.e. it is the
+              same class or one of its subclasses, False otherwise
+    '''
+    def conforms(self, name, ancestor):
+        if name == ancestor:
+            return name in self.definitions
+        return ancestor in self.ancestor_sets.get(name, ())
+
+    '''
+    This method resolves a method call on an object of the given class, as
+    dynamic dispatch would.
+
+    :param name: the name of the class
+    :param method: the name of the method
+    :returns: a (defining class, method entry) pair, or None if the class has
+              no such method
+    '''
+    def resolve_method(self, name, method):
+        return self.methods.get(name, {}).get(method)
+
+    '''
+    :param prefix: the start of the names to look for
+    :returns: the sorted list of the classes whose names start with the prefix
+    '''
+    def search(self, prefix):
+        start = bisect.bisect_left(self.names, prefix)
+        end = start
+        while end < len(self.names) and self.names[end].startswith(prefix):
+            end = end + 1
+        return self.names[start:end]
+
+    '''
+    This method finds the class, and the feature of the class, whose span holds
+    the given position in a file.
+
+    :param filename: the name of the file
+    :param row: the row of the position
+    :param column: the column of the position
+    :returns: a (class entry, feature entry) pair, where the feature entry is
+              None if the position is not within a feature, or None if the
+              position is not within a class
+    '''
+    def find_position(self, filename, row, column):
+        starts, classes, class_features = self.file_spans.get(filename,
+                                                              ([], [], []))
+        position = [row, column]
+        index = bisect.bisect_right(starts, position) - 1
+        if index < 0 or classes[index]['span'][1] < position:
+            return None
+        entry = classes[index]
+        feature_starts, features = class_features[index]
+        found = bisect.bisect_right(feature_starts, position) - 1
+        if found < 0 or features[found]['span'][1] < position:
+            return entry, None
+        return entry, features[found]
+
+    '''
+    This method writes the index to a file, as JSON. Only the indexes of the
+    files are written, since the derived tables are quickly rebuilt from them.
+    The file is written to a temporary file first and then moved into place,
+    so readers never see a partial index.
+
+    :param filename: the name of the index file
+    '''
+    def save(self, filename):
+        directory = os.path.dirname(os.path.abspath(filename))
+        handle, temporary_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(handle, 'w') as index_file:
+            json.dump({'format': index_format, 'version': self.version,
+                       'files': self.files}, index_file)
+        os.replace(temporary_path, filename)
+
+
+'''
+This function reads an index written by ProjectIndex.save(). An index that
+cannot be read, or that was written with another layout or version, is
+replaced by an empty one, such that every file is indexed again.
+
+:param filename: the name of the index file
+:param version: the version of the scanner rules and grammar in use
+:returns: the ProjectIndex
+'''
+def load_index(filename, version=None):
+    index = ProjectIndex(version)
+    try:
+        with open(filename, 'r') as index_file:
+            saved = json.load(index_file)
+    except (OSError, ValueError):
+        return index
+    if (not isinstance(saved, dict) or saved.get('format') != index_format or
+            saved.get('version') != version):
+        return index
+    index.files = saved['files']
+    index.rebuild()
+    return index
+
+
+'''
+This function runs the index command line: it brings the index file up to date
+with the given paths, then answers the given query, as JSON, on standard
+output.
+
+:param arguments: the command line arguments; defaults to sys.argv
+:returns: the exit status, 1 if a queried class or method is not found, 0
+          otherwise
+'''
+def main(arguments=None):
+    argument_parser = argparse.ArgumentParser(
+        description='Build and query the symbol index of COOL programs.')
+    argument_parser.add_argument('paths', nargs='*',
+                                 help='COOL files, directories or globs to '
+                                      'index')
+    argument_parser.add_argument('--index', default='cool-index.json',
+                                 help='the index file, which is updated')
+    argument_parser.add_argument('--prune', action='store_true',
+                                 help='drop the indexed files that are not '
+                                      'among the paths')
+    argument_parser.add_argument('--scanner',
+                                 choices=coolparser.scanner_engines,
+                                 default=coolparser.scanner_engine,
+                                 help='the scanning engine to use')
+    argument_parser.add_argument('--grammar', default=None,
+                                 help='parse with the table-driven engine, '
+                                      'compiled from this grammar file')
+    queries = argument_parser.add_mutually_exclusive_group()
+    queries.add_argument('--class', dest='class_name', metavar='CLASS',
+                         help='give the definition of a class')
+    queries.add_argument('--subclasses', metavar='CLASS',
+                         help='list all the subclasses of a class')
+    queries.add_argument('--children', metavar='CLASS',
+                         help='list the direct subclasses of a class')
+    queries.add_argument('--ancestors', metavar='CLASS',
+                         help='list the ancestors of a class')
+    queries.add_argument('--resolve', nargs=2, metavar=('CLASS', 'METHOD'),
+                         help='find the method a call dispatches to')
+    queries.add_argument('--search', metavar='PREFIX',
+                         help='list the classes whose names start with this')
+    queries.add_argument('--at', nargs=3, metavar=('FILE', 'ROW', 'COLUMN'),
+                         help='find the class and feature at a position')
+    queries.add_argument('--problems', action='store_true',
+                         help='list duplicate classes, missing parents and '
+                              'inheritance cycles')
+    arguments = argument_parser.parse_args(arguments)
+    # a grammar that cannot be compiled is reported like any other bad option
+    if arguments.grammar is not None:
+        import coolgrammar
+        try:
+            coolgrammar.load_table(arguments.grammar)
+        except (OSError, ValueError) as exception:
+            argument_parser.error('argument --grammar: ' + str(exception))
+
+    try:
+        filenames = coolbatch.expand_paths(arguments.paths)
+    except ValueError as exception:
+        argument_parser.error(str(exception))
+
+    parser = coolparser.Parser(engine=arguments.scanner,
+                               grammar=arguments.grammar)
+    index = load_index(arguments.index, coolcache.get_version(
+        parser.lexer.engine, parser))
+    if filenames or arguments.prune:
+        updated = index.update(parser, filenames, arguments.prune)
+        index.save(arguments.index)
+        sys.stderr.write(json.dumps({'files': len(index.files),
+                                     'updated': len(updated)}) + '\n')
+
+    answer = None
+    found = True
+    if arguments.class_name is not None:
+        answer = index.find_class(arguments.class_name)
+        if answer is not None:
+            answer = {'file': answer[0], 'class': answer[1]}
+        found = answer is not None
+    elif arguments.subclasses is not None:
+        answer = index.get_subclasses(arguments.subclasses)
+        found = arguments.subclasses in index.definitions
+    elif arguments.children is not None:
+        answer = index.get_subclasses(arguments.children, True)
+        found = arguments.children in index.definitions
+    elif arguments.ancestors is not None:
+        answer = list(index.get_ancestors(arguments.ancestors))
+        found = arguments.ancestors in index.definitions
+    elif arguments.resolve is not None:
+        answer = index.resolve_method(*arguments.resolve)
+        if answer is not None:
+            answer = {'class': answer[0], 'method': answer[1]}
+        found = answer is not None
+    elif arguments.search is not None:
+        answer = index.search(arguments.search)
+    elif arguments.at is not None:
+        answer = index.find_position(arguments.at[0], int(arguments.at[1]),
+                                     int(arguments.at[2]))
+        if answer is not None:
+            answer = {'class': answer[0], 'feature': answer[1]}
+        found = answer is not None
+    elif arguments.problems:
+        answer = {'duplicates': index.duplicates,
+                  'missing_parents': index.missing_parents,
+                  'cycles': index.cycles}
+    else:
+        return 0
+    sys.stdout.write(json.dumps(answer) + '\n')
+    return 0 if found else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,426 @@
+import io
+import queue
+import sys
+import threading
+import time
+
+import coolbatch
+import coolparser
+
+# the number of token records the lexer stage sends to the parser stage at a
+# time
+batch_size = 1024
+# the number of items a queue between two stages holds before the stage that
+# fills it has to wait for the next one to catch up
+queue_depth = 8
+
+
+'''
+This function reads the whole text of a file, as the reader stage does unless
+it is given another way to read files.
+
+:param filename: the name of the file
+:returns: the text of the file
+'''
+def read_text(filename):
+    with open(filename, 'r') as input_file:
+        return input_file.read()
+
+
+'''
+This function tells whether the threads of this interpreter run Python code in
+parallel, which only the free-threaded builds of CPython do.
+
+:returns: True if the interpreter runs without the global interpreter lock
+'''
+def is_free_threaded():
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+'''
+This class holds the counters of a stage of the pipeline: how many items it has
+produced, and how long it has been waiting for its input (starved) or for room
+in its output queue (blocked). The rest of its time is spent working.
+'''
+class Stage:
+    '''
+    :param name: the name of the stage
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.started = None
+        self.stopped = None
+        self.starved = 0.0
+        self.blocked = 0.0
+        # the exception that stopped the stage, if any
+        self.failure = None
+
+    '''
+    :returns: the dictionary of the metrics of the stage
+    '''
+    def get_metrics(self):
+        seconds = (self.stopped or time.perf_counter()) - self.started
+        busy = max(0.0, seconds - self.starved - self.blocked)
+        utilisation = None
+        if seconds > 0:
+            utilisation = round(busy / seconds, 3)
+        return {'items': self.items, 'busy_seconds': round(busy, 6),
+                'starved_seconds': round(self.starved, 6),
+                'blocked_seconds': round(self.blocked, 6),
+                'utilisation': utilisation}
+
+
+'''
+This class is a bounded queue between two stages. A stage that puts an item in
+a full queue waits until the next stage takes one out, so a slow stage holds
+back the stages before it instead of letting the items pile up. The depth of
+the queue is sampled every time an item is put in it, and the time spent
+waiting is added to the stage that waited.
+'''
+class StageQueue:
+    '''
+    :param capacity: the number of items the queue holds
+    '''
+    def __init__(self, capacity):
+        self.queue = queue.Queue(capacity)
+        self.capacity = capacity
+        self.puts = 0
+        self.total_depth = 0
+        self.max_depth = 0
+
+    '''
+    :param item: the item to put in the queue
+    :param stage: the stage putting the item in the queue
+    '''
+    def put(self, item, stage):
+        start = time.perf_counter()
+        self.queue.put(item)
+        stage.blocked = stage.blocked + time.perf_counter() - start
+        depth = self.queue.qsize()
+        self.puts = self.puts + 1
+        self.total_depth = self.total_depth + depth
+        self.max_depth = max(self.max_depth, depth)
+
+    '''
+    :param stage: the stage taking an item out of the queue
+    :returns: the next item of the queue
+    '''
+    def get(self, stage):
+        start = time.perf_counter()
+        item = self.queue.get()
+        stage.starved = stage.starved + time.perf_counter() - start
+        return item
+
+    '''
+    :returns: the dictionary of the metrics of the queue
+    '''
+    def get_metrics(self):
+        mean_depth = None
+        if self.puts:
+            mean_depth = round(self.total_depth / self.puts, 3)
+        return {'capacity': self.capacity, 'max_depth': self.max_depth,
+                'mean_depth': mean_depth}
+
+
+'''
+This class stands in for the lexer of the parser stage, when the files are
+scanned by a lexer stage of their own: it produces the token records that the
+lexer stage sends, a batch at a time, along with the lexical errors found up to
+the end of each batch, so a streamed parser (see Parser.parse_stream()) parses
+them as if it pulled them from a Lexer.
+'''
+class QueueLexer:
+    '''
+    :param pipeline: the pipeline whose lexer stage sends the batches
+    :param stage: the parser stage
+    '''
+    def __init__(self, pipeline, stage):
+        self.pipeline = pipeline
+        self.stage = stage
+        self.errors = []
+        self.error_offsets = []
+        # whether the lexer stage may still send batches of the current file
+        self.pending = False
+        # the number of the current file
+        self.number = None
+        # the pipeline takes no limits, so files have no time limit
+        self.deadline = None
+
+    '''
+    This method starts the records of the next file; the file has already been
+    announced by the lexer stage, so the input file is not used.
+
+    :param input_file: unused
+    :param keep_lines: unused, since the line starts are never sent
+    :returns: a generator of (kind, row, column, value, offset) records
+    '''
+    def scan_records(self, input_file, keep_lines=True):
+        self.errors = []
+        self.error_offsets = []
+        self.pending = True
+        return self.pull()
+
+    '''
+    This method produces the records of the batches of the current file, until
+    the lexer stage ends it. A file whose scan failed raises the exception of
+    the lexer.
+
+    :returns: a generator of (kind, row, column, value, offset) records
+    '''
+    def pull(self):
+        while True:
+            item = self.pipeline.batches.get(self.stage)
+            if item[0] == 'end':
+                self.pending = False
+                if item[1] is not None:
+                    raise item[1]
+                return
+            records, errors, error_offsets = item[1:]
+            self.errors.extend(errors)
+            self.error_offsets.extend(error_offsets)
+            yield from records
+
+    '''
+    This method skips the batches of the current file that have not been
+    parsed, when the parse stops early, and tells the lexer stage to stop
+    scanning it.
+    '''
+    def drain(self):
+        if not self.pending:
+            return
+        self.pipeline.skipped = self.number
+        while self.pipeline.batches.get(self.stage)[0] != 'end':
+            pass
+        self.pending = False
+
+
+'''
+This class parses a list of files in a pipeline of stages, each in a thread of
+its own, connected by bounded queues:
+- the reader stage reads the text of every file
+- the lexer stage scans every text, and sends its token records to the parser
+  stage in batches, as they are found
+- the parser stage parses the records as they arrive, with a streamed parser,
+  and produces the outcome of every file
+Reading a file then overlaps with the scanning and parsing of the files before
+it. Since the threads only run Python code in parallel on free-threaded builds
+of CPython, the lexer stage is only split from the parser stage on those; on
+the other builds, the parser stage scans the files itself, and only the reader
+stage runs alongside it, waiting on I/O. The outcomes are the same as those of
+coolbatch.parse_one(), in the order of the files.
+'''
+class Pipeline:
+    '''
+    :param filenames: the names of the files to parse
+    :param engine: the scanning engine to use
+    :param fail_fast: whether to stop every file at its first error
+    :param read_file: the function reading the text of a file; defaults to
+                      read_text()
+    :param lexer_stage: whether to scan the files in a stage of their own;
+                        defaults to whether the interpreter is free-threaded
+    '''
+    def __init__(self, filenames, engine=None, fail_fast=False,
+                 read_file=None, lexer_stage=None):
+        if read_file is None:
+            read_file = read_text
+        if lexer_stage is None:
+            lexer_stage = is_free_threaded()
+        self.filenames = filenames
+        self.engine = engine
+        self.fail_fast = fail_fast
+        self.read_file = read_file
+        self.texts = StageQueue(queue_depth)
+        self.batches = None
+        self.outcomes = StageQueue(queue_depth)
+        self.stages = [Stage('read')]
+        if lexer_stage:
+            self.batches = StageQueue(queue_depth)
+            self.stages.append(Stage('lex'))
+        self.stages.append(Stage('parse'))
+        # the number of the last file whose parse stopped early, whose scan the
+        # lexer stage can stop
+        self.skipped = None
+        self.started = None
+        self.stopped = None
+
+    '''
+    This method runs the pipeline, and produces the outcomes of the files as
+    soon as each of them is parsed. An unexpected exception in a stage is
+    raised here, once the stages after it have run out of items.
+
+    :returns: a generator of outcome dictionaries
+    '''
+    def run(self):
+        self.started = time.perf_counter()
+        work = [self.read_files, self.lex_files, self.parse_files]
+        if self.batches is None:
+            work = [self.read_files, self.parse_files]
+        outputs = [self.texts, self.batches, self.outcomes]
+        outputs = [output for output in outputs if output is not None]
+        threads = [threading.Thread(target=self.run_stage,
+                                    args=(stage, function, output),
+                                    name='pipeline-' + stage.name,
+                                    daemon=True)
+                   for stage, function, output in zip(self.stages, work,
+                                                      outputs)]
+        for thread in threads:
+            thread.start()
+        consumer = Stage('output')
+        while True:
+            outcome = self.outcomes.get(consumer)
+            if outcome is None:
+                break
+            yield outcome
+        for thread in threads:
+            thread.join()
+        self.stopped = time.perf_counter()
+        for stage in self.stages:
+            if stage.failure is not None:
+                raise stage.failure
+
+    '''
+    This method runs a stage, and ends its output queue, even if the stage
+    stops on an unexpected exception.
+
+    :param stage: the stage
+    :param function: the method doing the work of the stage
+    :param output: the output queue of the stage
+    '''
+    def run_stage(self, stage, function, output):
+        stage.started = time.perf_counter()
+        try:
+            function(stage)
+        except Exception as exception:
+            stage.failure = exception
+        finally:
+            output.put(None, stage)
+            stage.stopped = time.perf_counter()
+
+    '''
+    This method is the reader stage: it reads every file, and sends its text on,
+    or the exception raised if it could not be read, along with the time it
+    took to read it.
+
+    :param stage: the reader stage
+    '''
+    def read_files(self, stage):
+        for filename in self.filenames:
+            start = time.perf_counter()
+            try:
+                text = self.read_file(filename)
+                failure = None
+            except Exception as exception:
+                text = None
+                failure = exception
+            seconds = time.perf_counter() - start
+            self.texts.put((filename, text, failure, seconds), stage)
+            stage.items = stage.items + 1
+
+    '''
+    This method is the lexer stage: it announces every file to the parser
+    stage, and sends the records of its tokens in batches, each with the
+    lexical errors found since the last one. Every file ends with an 'end'
+    item, which holds the exception raised by the lexer, if any.
+
+    :param stage: the lexer stage
+    '''
+    def lex_files(self, stage):
+        lexer = coolparser.Lexer(self.engine)
+        number = 0
+        while True:
+            item = self.texts.get(stage)
+            if item is None:
+                return
+            filename, text, failure, seconds = item
+            number = number + 1
+            self.batches.put(('file', number, filename, failure, seconds),
+                             stage)
+            if failure is not None:
+                continue
+            try:
+                records = lexer.scan_records(io.StringIO(text),
+                                             keep_lines=False)
+                sent = 0
+                batch = []
+                for record in records:
+                    batch.append(record)
+                    if len(batch) < batch_size:
+                        continue
+                    self.batches.put(('tokens', batch, lexer.errors[sent:],
+                                      lexer.error_offsets[sent:]), stage)
+                    stage.items = stage.items + len(batch)
+                    sent = len(lexer.errors)
+                    batch = []
+                    if self.skipped == number:
+                        break
+                else:
+                    self.batches.put(('tokens', batch, lexer.errors[sent:],
+                                      lexer.error_offsets[sent:]), stage)
+                    stage.items = stage.items + len(batch)
+            except Exception as exception:
+                failure = exception
+            self.batches.put(('end', failure), stage)
+
+    '''
+    This method is the parser stage: it parses every file, from the batches
+    of the lexer stage if there is one, or else from its text, and sends its
+    outcome on.
+
+    :param stage: the parser stage
+    '''
+    def parse_files(self, stage):
+        if self.batches is None:
+            parser = coolparser.Parser(engine=self.engine,
+                                       fail_fast=self.fail_fast)
+            source = self.texts
+        else:
+            lexer = QueueLexer(self, stage)
+            parser = coolparser.Parser(lexer=lexer, stream=True,
+                                       fail_fast=self.fail_fast)
+            source = self.batches
+        while True:
+            item = source.get(stage)
+            if item is None:
+                return
+            if self.batches is None:
+                filename, text, failure, seconds = item
+            else:
+                kind, lexer.number, filename, failure, seconds = item
+            # the time of a file is the time it took to read and parse it, as
+            # in coolbatch.parse_one(), without the time it waited in between
+            start = time.perf_counter() - seconds
+            if failure is not None:
+                outcome = coolbatch.get_failure(filename, failure, start)
+            else:
+                try:
+                    if self.batches is None:
+                        result = parser.parse(io.StringIO(text))
+                    else:
+                        result = parser.parse(None)
+                    outcome = coolbatch.get_outcome(filename, result, start)
+                except Exception as exception:
+                    outcome = coolbatch.get_failure(filename, exception, start)
+                if self.batches is not None:
+                    lexer.drain()
+            self.outcomes.put(outcome, stage)
+            stage.items = stage.items + 1
+
+    '''
+    This method gathers the metrics of the pipeline: whether its stages run in
+    parallel, how busy every stage was, and how full every queue was.
+
+    :returns: the metrics dictionary
+    '''
+    def get_metrics(self):
+        seconds = (self.stopped or time.perf_counter()) - self.started
+        queues = [('texts', self.texts), ('batches', self.batches),
+                  ('outcomes', self.outcomes)]
+        return {'free_threaded': is_free_threaded(),
+                'seconds': round(seconds, 6),
+                'stages': {stage.name: stage.get_metrics()
+                           for stage in self.stages},
+                'queues': {name: stage_queue.get_metrics()
+                           for name, stage_queue in queues
+                           if stage_queue is not None}}
@@ -0,0 +1,243 @@
+import collections
+import json
+import sys
+import time
+import tracemalloc
+
+import coolparser
+
+# the methods of the parser that are not grammar rules, and are not counted
+uncounted_methods = ['__init__', 'reset', 'parse_file', 'parse',
+                     'parse_tokens', 'add_syntax_error', 'recover',
+                     'stop_parsing', 'parse_stream', 'fill_tokens']
+
+
+'''
+This class holds the profile of a parse: the wall time and the peak traced
+memory of every phase, the number of calls to every grammar function (as well
+as match(), check() and skip_to()), and the number of tokens skipped while
+recovering from syntax errors.
+'''
+class Profile:
+    def __init__(self):
+        # maps each phase to its (seconds, peak bytes) pair
+        self.phases = collections.OrderedDict()
+        self.calls = collections.Counter()
+        self.tokens_skipped = 0
+        self.tokens = 0
+        self.characters = 0
+
+    '''
+    This method runs one phase of the parse, and records its wall time and the
+    peak memory traced while it runs. Memory must be traced already.
+
+    :param name: the name of the phase
+    :param function: the function running the phase
+    :returns: the value returned by the function
+    '''
+    def run_phase(self, name, function):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        value = function()
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - before
+        self.phases[name] = (seconds, max(0, peak))
+        return value
+
+    '''
+    :returns: the profile as a dictionary, which can be written out as JSON
+    '''
+    def to_dict(self):
+        return {'phases': collections.OrderedDict(
+                    (name, {'seconds': round(seconds, 6), 'peak_bytes': peak})
+                    for name, (seconds, peak) in self.phases.items()),
+                'seconds': round(sum(seconds for seconds, peak in
+                                     self.phases.values()), 6),
+                'characters': self.characters, 'tokens': self.tokens,
+                'calls': dict(self.calls.most_common()),
+                'tokens_skipped': self.tokens_skipped}
+
+    '''
+    This method formats the profile as a human-readable table: the phases in
+    the order in which they ran, then the calls, most frequent first.
+
+    :returns: the list of lines of the table
+    '''
+    def format_table(self):
+        lines = ['%-20s %12s %16s' % ('phase', 'time (ms)',
+                                      'peak memory (KB)')]
+        for name, (seconds, peak) in self.phases.items():
+            lines.append('%-20s %12.3f %16.1f' % (name, 1000 * seconds,
+                                                  peak / 1024.0))
+        lines.append('%-20s %12.3f' % ('total', 1000 * sum(
+            seconds for seconds, peak in self.phases.values())))
+        lines.append('')
+        lines.append('%-20s %12s' % ('function', 'calls'))
+        for name, count in self.calls.most_common():
+            lines.append('%-20s %12d' % (name, count))
+        lines.append('')
+        lines.append('characters: ' + str(self.characters))
+        lines.append('tokens: ' + str(self.tokens))
+        lines.append('tokens skipped by recovery: ' +
+                     str(self.tokens_skipped))
+        return lines
+
+
+'''
+This function replaces the grammar functions of a parser (and its match(),
+check() and skip_to() methods) with wrappers that count their calls in the
+given profile. The wrappers are only set on this parser, and only while it is
+being profiled, so parsers that are not profiled run without any overhead.
+
+:param parser: the parser to instrument
+:param profile: the profile in which the calls are counted
+:returns: the attributes of the parser that were replaced, as a dictionary, so
+          they can be restored by restore()
+'''
+def instrument(parser, profile):
+    calls = profile.calls
+    replaced = {}
+
+    def count(name, method):
+        def counted(*arguments):
+            calls[name] = calls[name] + 1
+            return method(*arguments)
+        return counted
+
+    def count_skipped(method):
+        def counted(*arguments):
+            calls['skip_to'] = calls['skip_to'] + 1
+            start = parser.token_index
+            found = method(*arguments)
+            profile.tokens_skipped = (profile.tokens_skipped +
+                                      parser.token_index - start)
+            return found
+        return counted
+
+    for name, value in vars(coolparser.Parser).items():
+        if not callable(value) or name in uncounted_methods:
+            continue
+        replaced[name] = parser.__dict__.get(name)
+        method = getattr(parser, name)
+        if name == 'skip_to':
+            setattr(parser, name, count_skipped(method))
+        else:
+            setattr(parser, name, count(name, method))
+    # the iterative expression engine takes the place of expr_a(), and is
+    # counted under its own name
+    if parser.expressions == 'iterative':
+        parser.expr_a = parser.expr_iterative
+    return replaced
+
+
+'''
+This function undoes instrument().
+
+:param parser: the instrumented parser
+:param replaced: the dictionary returned by instrument()
+'''
+def restore(parser, replaced):
+    for name, value in replaced.items():
+        if value is None:
+            delattr(parser, name)
+        else:
+            setattr(parser, name, value)
+
+
+'''
+This function scans and parses a file one phase at a time, such that each phase
+can be measured on its own: the file is read, split into lexemes, matched to
+tokens and stored, and the tokens are then parsed, and the output is formatted
+(and written, if an output stream is given). Every phase runs to completion
+before the next one starts, so the profiled run holds more in memory than a
+normal, streamed one. Tracing memory also slows every phase down, by roughly
+the same factor.
+
+:param parser: the parser to profile
+:param filename: the name of the file to parse
+:param output: the stream to which the output of the parser is written, or
+               None to only format it
+:returns: a (result, profile) pair, where result is the ParseResult of the file
+'''
+def profile_file(parser, filename, output=None):
+    profile = Profile()
+    lexer = parser.lexer
+    limit = sys.getrecursionlimit()
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    try:
+        with open(filename, 'r') as input_file:
+            lines = profile.run_phase(
+                'read', lambda: list(lexer.read(input_file)))
+        profile.characters = sum(len(line) for offset, line in lines)
+        lexemes = profile.run_phase('lex', lambda: list(lexer.split(lines)))
+        del lines
+        records = profile.run_phase(
+            'match', lambda: list(lexer.match_lexemes(lexemes)))
+        del lexemes
+        tokens = profile.run_phase('store', lambda: store_records(lexer,
+                                                                  records))
+        del records
+        profile.tokens = len(tokens)
+
+        # the counting wrappers add a frame to every call of a grammar function
+        sys.setrecursionlimit(2 * limit)
+        replaced = instrument(parser, profile)
+        try:
+            result = profile.run_phase('parse',
+                                       lambda: parser.parse_tokens(tokens))
+        finally:
+            restore(parser, replaced)
+            sys.setrecursionlimit(limit)
+        profile.run_phase('output', lambda: write_result(result, output))
+    finally:
+        if not started:
+            tracemalloc.stop()
+    return result, profile
+
+
+'''
+This function stores token records in a TokenStore, as Lexer.scan() does.
+
+:param lexer: the lexer that produced the records
+:param records: the list of token records
+:returns: the TokenStore of the tokens
+'''
+def store_records(lexer, records):
+    tokens = coolparser.TokenStore()
+    for kind, row, column, value, offset in records:
+        tokens.append(kind, row, column, value, offset)
+    lexer.token_offsets = tokens.offsets
+    return tokens
+
+
+'''
+This function formats the outcome of a parse as the single file parser prints
+it, and writes it out.
+
+:param result: the ParseResult of the file
+:param output: the stream to write to, or None to only format the outcome
+'''
+def write_result(result, output):
+    if not result.errors:
+        lines = coolparser.format_file_structure(result)
+    else:
+        lines = coolparser.format_errors(result)
+    if output is not None:
+        output.write('\n'.join(lines) + '\n')
+
+
+'''
+This function writes a profile out, either as a table or as JSON.
+
+:param profile: the profile to write
+:param output_format: 'table' or 'json'
+:param output: the stream to write to
+'''
+def write_profile(profile, output_format, output):
+    if output_format == 'json':
+        output.write(json.dumps(profile.to_dict()) + '\n')
+    else:
+        output.write('\n'.join(profile.format_table()) + '\n')
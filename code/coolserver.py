@@ -0,0 +1,345 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import sys
+import time
+
+import coolbatch
+import coolcache
+import coolclient
+import coolparser
+import coolwatchdog
+
+# the longest request line accepted, in bytes, such that whole programs can be
+# sent to be parsed from memory
+max_request_bytes = 64 * 1024 * 1024
+# the number of most recent requests whose latencies are kept for the stats
+latency_window = 1024
+
+
+'''
+This class is a long-running parse server. It reads requests as lines of JSON,
+either from the clients of a Unix socket or from its standard input, and writes
+one line of JSON per response, tagged with the id of its request. Requests are
+handled concurrently, and answered as soon as they are done, so responses are
+not necessarily in the order of the requests. The requests are:
+- {"op": "parse_file", "file": ...} parses a file
+- {"op": "parse_text", "text": ...} parses a program sent in the request
+- {"op": "stats"} returns the statistics of the server
+- {"op": "shutdown"} stops the server, once the requests in progress are done
+Parse requests may add "format": "text", to also get the output of the single
+file parser in the response. Parsing is done by a pool of worker processes, each
+of which creates its parser (and compiles the scanner) once, when it starts.
+The workers are supervised by a watchdog (see coolwatchdog): a worker that dies
+while parsing a file only fails that request, and is replaced, as is a worker
+that goes over the time limit on every file, if there is one.
+'''
+class ParseServer:
+    '''
+    :param jobs: the number of worker processes; defaults to the number of cores
+    :param engine: the scanning engine to use
+    :param cache_directory: the directory of the parse cache, or None to
+                            disable caching
+    :param cache_bytes: the maximum size of the parse cache
+    :param limits: the limits on every file, as given to
+                   coolbatch.start_worker(); a worker that does not stop
+                   parsing a file by its time limit is killed
+    '''
+    def __init__(self, jobs=None, engine=None, cache_directory=None,
+                 cache_bytes=coolcache.default_max_bytes, limits=None):
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        self.jobs = jobs
+        timeout = None
+        if limits is not None:
+            timeout = limits.get('seconds')
+        self.watchdog = coolwatchdog.Watchdog(
+            jobs, (engine, cache_directory, cache_bytes, False, limits),
+            timeout)
+        self.watchdog.start()
+        # the indices of the idle workers of the watchdog, and the threads that
+        # wait for the busy ones, one per worker
+        self.idle = asyncio.Queue()
+        for index in range(jobs):
+            self.idle.put_nowait(index)
+        self.waiters = concurrent.futures.ThreadPoolExecutor(jobs)
+        self.started = time.time()
+        self.counts = collections.Counter()
+        self.latencies = collections.deque(maxlen=latency_window)
+        # the number of parse requests in progress
+        self.active = 0
+        self.stopping = None
+
+    '''
+    This method starts every worker process, by having each of them parse an
+    empty program, such that the first requests do not pay for it.
+    '''
+    async def warm_up(self):
+        indices = [await self.idle.get() for index in range(self.jobs)]
+        await asyncio.gather(*[self.parse_on(index, None, '')
+                               for index in indices])
+
+    '''
+    This method parses a file on the next idle worker.
+
+    :param filename: the name of the file
+    :param text: the text of the program, if it is parsed from memory instead
+                 of from the file
+    :returns: the outcome dictionary, as returned by coolbatch.parse_one()
+    '''
+    async def parse(self, filename, text=None):
+        return await self.parse_on(await self.idle.get(), filename, text)
+
+    '''
+    This method parses a file on the given idle worker, and waits for its
+    outcome in a thread, such that the other requests are still handled. The
+    worker is handed back to the idle workers once it is done (or, if the
+    watchdog had to replace it, the worker that took its place).
+
+    :param index: the index of the worker among those of the watchdog
+    :param filename: the name of the file
+    :param text: the text of the program, or None
+    :returns: the outcome dictionary
+    '''
+    async def parse_on(self, index, filename, text):
+        loop = asyncio.get_running_loop()
+        worker = self.watchdog.workers[index]
+        try:
+            worker.send(filename, text)
+            outcome = None
+            while outcome is None:
+                ready = await loop.run_in_executor(
+                    self.waiters, worker.connection.poll,
+                    self.watchdog.remaining(worker))
+                outcome = self.watchdog.collect(worker, ready)
+        finally:
+            self.idle.put_nowait(index)
+        return outcome
+
+    '''
+    This method handles a single request.
+
+    :param request: the request dictionary
+    :returns: the response dictionary
+    '''
+    async def handle(self, request):
+        operation = request.get('op')
+        self.counts[operation] = self.counts[operation] + 1
+
+        if operation == 'parse_file' or operation == 'parse_text':
+            start = time.perf_counter()
+            self.active = self.active + 1
+            try:
+                if operation == 'parse_file':
+                    outcome = await self.parse(request.get('file'))
+                else:
+                    outcome = await self.parse(request.get('file'),
+                                               request.get('text', ''))
+            finally:
+                self.active = self.active - 1
+            if request.get('format') == 'text':
+                outcome['output'] = coolbatch.format_outcome(outcome)
+            self.latencies.append(time.perf_counter() - start)
+            return outcome
+        if operation == 'stats':
+            return {'stats': self.get_stats()}
+        if operation == 'shutdown':
+            self.stopping.set()
+            return {'ok': True}
+        return {'error': 'Unknown operation \'' + str(operation) + '\'.'}
+
+    '''
+    This method gathers the statistics of the server: how long it has been
+    running, how many requests of each kind it has served, how many parse
+    requests are in progress, the latencies of the most recent parse requests,
+    and the metrics of the watchdog.
+
+    :returns: the statistics dictionary
+    '''
+    def get_stats(self):
+        stats = {'uptime': round(time.time() - self.started, 3),
+                 'workers': self.jobs, 'active': self.active,
+                 'requests': dict(self.counts)}
+        latency = coolbatch.get_latency(self.latencies)
+        if latency is not None:
+            stats['latency'] = latency
+        stats['watchdog'] = self.watchdog.get_metrics()
+        return stats
+
+    '''
+    This method handles a request line, and sends back its response.
+
+    :param line: the request line
+    :param send: the function writing a response line
+    '''
+    async def respond(self, line, send):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('A request must be a JSON object.')
+        except ValueError as exception:
+            response = {'id': None, 'error': 'Bad request: ' + str(exception)}
+        else:
+            try:
+                response = await self.handle(request)
+            except Exception as exception:
+                response = {'error': type(exception).__name__ + ': ' +
+                                     str(exception)}
+            response['id'] = request.get('id')
+        send(json.dumps(response) + '\n')
+
+    '''
+    This method reads request lines from a stream until it ends or the server
+    stops, handling every request concurrently, and waits for the requests in
+    progress to be answered.
+
+    :param reader: the asyncio stream reader of the requests
+    :param send: the function writing a response line
+    '''
+    async def serve_stream(self, reader, send):
+        tasks = set()
+        stop = asyncio.ensure_future(self.stopping.wait())
+        while True:
+            read = asyncio.ensure_future(reader.readline())
+            await asyncio.wait([read, stop],
+                               return_when=asyncio.FIRST_COMPLETED)
+            if not read.done():
+                read.cancel()
+                break
+            try:
+                line = read.result()
+            except ValueError:
+                send(json.dumps({'id': None,
+                                 'error': 'Bad request: line too long.'}) +
+                     '\n')
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            task = asyncio.ensure_future(self.respond(line, send))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        stop.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+    '''
+    This method serves the clients of a Unix socket, until a client asks the
+    server to shut down.
+
+    :param path: the path of the socket; an existing socket file is replaced
+    '''
+    async def serve_socket(self, path):
+        self.stopping = asyncio.Event()
+        await self.warm_up()
+        # the clients being served, which are given the time to answer the
+        # requests in progress when the server stops
+        clients = set()
+
+        async def serve_client(reader, writer):
+            def send(line):
+                if not writer.is_closing():
+                    writer.write(line.encode('utf-8'))
+            clients.add(asyncio.current_task())
+            try:
+                await self.serve_stream(reader, send)
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+                clients.discard(asyncio.current_task())
+
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(serve_client, path,
+                                                 limit=max_request_bytes)
+        os.chmod(path, 0o600)
+        try:
+            await self.stopping.wait()
+        finally:
+            server.close()
+            if clients:
+                await asyncio.wait(clients)
+            await server.wait_closed()
+            if os.path.exists(path):
+                os.unlink(path)
+
+    '''
+    This method serves the requests read from the standard input, writing the
+    responses to the standard output, until the input ends or a request asks the
+    server to shut down.
+    '''
+    async def serve_stdio(self):
+        self.stopping = asyncio.Event()
+        await self.warm_up()
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=max_request_bytes)
+        await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+        def send(line):
+            sys.stdout.write(line)
+            sys.stdout.flush()
+
+        await self.serve_stream(reader, send)
+
+    def close(self):
+        self.watchdog.stop()
+        self.waiters.shutdown()
+
+
+'''
+This function runs the server command line.
+
+:param arguments: the command line arguments; defaults to sys.argv
+:returns: the exit status
+'''
+def main(arguments=None):
+    argument_parser = argparse.ArgumentParser(
+        description='Serve COOL parse requests from a pool of warm workers.')
+    argument_parser.add_argument('--socket', default=None,
+                                 help='the path of the Unix socket to listen '
+                                      'on (defaults to a per-user socket)')
+    argument_parser.add_argument('--stdio', action='store_true',
+                                 help='serve requests from standard input '
+                                      'instead of a socket')
+    argument_parser.add_argument('-j', '--jobs', type=int, default=None,
+                                 help='the number of worker processes '
+                                      '(defaults to the number of cores)')
+    argument_parser.add_argument('--scanner',
+                                 choices=coolparser.scanner_engines,
+                                 default=coolparser.scanner_engine,
+                                 help='the scanning engine to use')
+    argument_parser.add_argument('--cache', metavar='DIRECTORY',
+                                 help='cache parse results in this directory')
+    argument_parser.add_argument('--cache-size', type=int,
+                                 default=coolcache.default_max_bytes // 2 ** 20,
+                                 help='the maximum size of the cache, in MB')
+    coolbatch.add_limit_arguments(argument_parser)
+    arguments = argument_parser.parse_args(arguments)
+    limits = coolbatch.get_limits(arguments)
+
+    server = ParseServer(arguments.jobs, arguments.scanner, arguments.cache,
+                         arguments.cache_size * 2 ** 20, limits)
+    try:
+        if arguments.stdio:
+            asyncio.run(server.serve_stdio())
+        else:
+            path = arguments.socket
+            if path is None:
+                path = coolclient.default_socket_path()
+            asyncio.run(server.serve_socket(path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,334 @@
+import array
+import bisect
+import io
+import multiprocessing
+import os
+import re
+
+import coolincremental
+import coolparser
+
+# files smaller than this are parsed in a single process, since starting the
+# worker processes takes longer than parsing them
+min_split_size = 1024 * 1024
+# the number of ranges handed to every worker process, such that the workers
+# stay busy when the classes differ in size
+ranges_per_job = 4
+# the parts of a program that the pre-scan looks at: strings (whose braces do
+# not count), escaped characters and arrows (which could otherwise be taken for
+# the start of a string or of a comment), comments, braces, and lines that
+# start with the class keyword
+boundary_pattern = re.compile(
+    r'"(?:\\\S|\\(?!\S)|[^"\\\n])*"|\\\S|<-|--[^\n]*|\(\*|[{}]|'
+    r'^[ \t\f\v\r]*class(?!\w)', re.MULTILINE)
+
+# the parser used by the current worker process; it is created once per worker,
+# when the pool starts, and reused for every range the worker is given
+worker_parser = None
+
+
+'''
+This function finds the lines of a program at which a top-level class starts:
+the lines that start with the class keyword, outside of any braces. Strings
+never span lines, so a line never starts inside one, and the comments, which
+may, are skipped as the lexer skips them (see coolparser.skip_comment()). The
+pre-scan only counts braces, so it can be wrong about a program with syntax
+errors, in which case the ranges are parsed again (see merge_ranges()).
+
+:param text: the text of the program
+:returns: the list of the offsets at which the lines start, in order, except
+          for the first line of the program
+'''
+def find_boundaries(text):
+    boundaries = []
+    depth = 0
+    position = 0
+    # the search starts over after every block comment
+    while True:
+        for found in boundary_pattern.finditer(text, position):
+            first = text[found.start()]
+            if first == '{':
+                depth = depth + 1
+            elif first == '}':
+                # a stray closing brace does not hide the classes after it
+                depth = max(0, depth - 1)
+            elif first == '(':
+                position = coolparser.skip_comment(text, found.end(), 1)[1]
+                break
+            elif first not in '"\\<-' and depth == 0 and found.start() > 0:
+                boundaries.append(found.start())
+        else:
+            return boundaries
+
+
+'''
+This function splits a program into ranges of whole top-level classes, of
+roughly equal size.
+
+:param text: the text of the program
+:param jobs: the number of worker processes the ranges are handed to
+:returns: the list of the offsets at which the ranges start, starting with 0
+'''
+def split_ranges(text, jobs):
+    size = max(1, len(text) // (jobs * ranges_per_job))
+    starts = [0]
+    for boundary in find_boundaries(text):
+        if boundary - starts[-1] >= size:
+            starts.append(boundary)
+    return starts
+
+
+'''
+This function prepares a worker process of the pool, by creating the parser it
+will use for all of its ranges.
+
+:param engine: the scanning engine to use
+:param expressions: the expression engine to use
+:param grammar: the grammar file to parse with, or None
+:param recovery: how to recover from syntax errors
+'''
+def start_worker(engine, expressions, grammar, recovery):
+    global worker_parser
+    worker_parser = coolparser.Parser(engine=engine, expressions=expressions,
+                                      grammar=grammar, recovery=recovery)
+
+
+'''
+This function scans and parses a range of a program in a worker process. The
+tokens and the errors are moved to their coordinates and offsets in the whole
+program. Unless the range is the last one, the first line of the next range is
+scanned too, and the first token of the next range is kept, followed by the
+end of file, such that the parse stops there if it reaches it as the start of
+a class (see Parser.enter_unit()). The range was then parsed exactly as in the
+whole program, provided that the previous ranges were, so it is clean. Parsing
+fails otherwise, or reports an error past the range, in which case the range
+has to be parsed again, in the whole program.
+
+:param task: a (text, length, offset, row) tuple, where text holds the range,
+             followed by the first line of the next range, if any, length is
+             the length of the range, offset is the offset of the range in the
+             program, and row is the number of lines before it
+:returns: a (clean, result) pair, where result is the ParseResult of the range,
+          whose tokens end with the EOF token only for the last range
+'''
+def parse_range(task):
+    text, length, offset, row = task
+    parser = worker_parser
+    lexer = parser.lexer
+    tokens = lexer.scan(io.StringIO(text))
+    # the lexical errors of the next range are left to it
+    errors = []
+    error_offsets = []
+    for message, error_offset in zip(lexer.errors, lexer.error_offsets):
+        if error_offset < length:
+            coordinate = coolparser.get_coordinates(error_offset,
+                                                    lexer.line_starts)
+            errors.append(coolincremental.shift_message(
+                message, coordinate, (coordinate[0] + row, coordinate[1])))
+            error_offsets.append(error_offset + offset)
+
+    stop = None
+    if length < len(text):
+        stop = min(bisect.bisect_left(tokens.offsets, length),
+                   len(tokens) - 1)
+        for column in [tokens.kinds, tokens.rows, tokens.columns,
+                       tokens.values, tokens.offsets]:
+            del column[stop + 1:]
+        tokens.append(coolparser.kind_codes['eof'], tokens.rows[stop],
+                      tokens.columns[stop], None, tokens.offsets[stop])
+    if row > 0:
+        tokens.rows = array.array('I', [token_row + row
+                                        for token_row in tokens.rows])
+    if offset > 0:
+        tokens.offsets = array.array('q', [token_offset + offset
+                                           for token_offset in tokens.offsets])
+
+    parser.reset(tokens)
+    parser.errors.extend(errors)
+    if stop is not None:
+        parser.stop_points = {stop: 0}
+    try:
+        parser.program_0()
+        clean = stop is None or (
+            parser.stopped_at == 0 and
+            tokens.kinds[stop] == coolparser.kind_codes['class'] and
+            all(error_token < stop for error_token in parser.error_tokens))
+    except Exception:
+        clean = False
+    if stop is not None:
+        for column in [tokens.kinds, tokens.rows, tokens.columns,
+                       tokens.values, tokens.offsets]:
+            del column[stop:]
+    return clean, coolparser.ParseResult(
+        tokens, None, None, parser.classes, parser.methods, parser.errors,
+        units=parser.units, error_offsets=error_offsets,
+        error_tokens=parser.error_tokens, features=parser.features)
+
+
+'''
+This function appends the tokens of a range to the tokens of the program,
+interning their values in the string table of the program.
+
+:param tokens: the TokenStore of the program
+:param store: the TokenStore of the range
+'''
+def append_tokens(tokens, store):
+    indices = []
+    for string in store.strings:
+        index = tokens.string_indices.get(string)
+        if index is None:
+            index = len(tokens.strings)
+            tokens.strings.append(string)
+            tokens.string_indices[string] = index
+        indices.append(index)
+    tokens.kinds.extend(store.kinds)
+    tokens.rows.extend(store.rows)
+    tokens.columns.extend(store.columns)
+    tokens.values.extend(array.array('i', [-1 if value < 0 else indices[value]
+                                           for value in store.values]))
+    tokens.offsets.extend(store.offsets)
+
+
+'''
+This function merges the results of the ranges of a program into the result of
+the whole program, in order. The tokens and the lexical errors of a range never
+depend on the other ranges, since lexemes never span lines, and the ranges
+never start in a comment (see find_boundaries()). The classes, methods and
+syntax errors of a clean range are taken as they are, as long as the range is
+reached as the start of a class; any other range is parsed again in this
+process, from its first token, in the state that the ranges before it left,
+just as coolincremental.reparse() does, up to the start of the first range that
+the parse reaches as the start of a class. The outcome is always
+the same as that of parsing the whole program in a single process.
+
+:param parser: the parser used to parse the ranges again
+:param text: the text of the program
+:param results: the (clean, result) pairs of the ranges, as returned by
+                parse_range()
+:returns: the ParseResult of the program
+'''
+def merge_ranges(parser, text, results):
+    tokens = coolparser.TokenStore()
+    # the index of the first token of every range
+    range_starts = []
+    errors = []
+    error_offsets = []
+    for clean, result in results:
+        range_starts.append(len(tokens))
+        append_tokens(tokens, result.tokens)
+        errors.extend(result.errors[:len(result.error_offsets)])
+        error_offsets.extend(result.error_offsets)
+    line_starts = [0]
+    coolincremental.find_lines(text, 0, len(text), line_starts)
+
+    classes = []
+    methods = []
+    syntax_errors = []
+    error_tokens = []
+    units = []
+    features = []
+    index = 0
+    while index < len(results):
+        clean, result = results[index]
+        if clean:
+            start = range_starts[index]
+            for token_index, class_count, error_count in result.units:
+                units.append((token_index + start, class_count + len(classes),
+                              error_count + len(error_tokens)))
+            classes.extend(result.classes)
+            methods.extend(result.methods)
+            syntax_errors.extend(result.errors[len(result.error_offsets):])
+            error_tokens.extend(error_token + start
+                                for error_token in result.error_tokens)
+            features.extend(feature + start for feature in result.features)
+            index = index + 1
+            continue
+
+        parser.reset(tokens)
+        parser.token_index = range_starts[index]
+        parser.errors = errors + syntax_errors
+        parser.error_tokens = error_tokens
+        parser.classes = classes
+        parser.methods = methods
+        parser.units = units
+        parser.features = features
+        parser.stop_points = {range_starts[later]: later
+                              for later in range(index + 1, len(results))}
+        parser.program_0()
+        syntax_errors = parser.errors[len(errors):]
+        if parser.stopped_at is None:
+            break
+        index = parser.stopped_at
+
+    errors = errors + syntax_errors
+    ast = None
+    if parser.build_ast and not errors:
+        import coolast
+        ast = coolast.build_tree(tokens)
+    return coolparser.ParseResult(tokens, tokens.offsets, line_starts, classes,
+                                  methods, errors, ast, units, error_offsets,
+                                  error_tokens, features)
+
+
+'''
+This function parses a program held in memory, split at its top-level classes
+into ranges that are scanned and parsed across a pool of worker processes, and
+merged back in order. The workers are configured like the given parser. Small
+programs, programs with a single class, parses that stop after a number of
+errors (which depends on the errors of every range before), and streamed parses
+are parsed in this process instead.
+
+:param parser: the parser whose settings are used, and which parses the
+               program when it is not split
+:param text: the text of the program
+:param jobs: the number of worker processes; defaults to the number of cores
+:param min_size: the size of the smallest program that is split; defaults to
+                 the module-level min_split_size setting
+:returns: the ParseResult of the program, the same as that of parser.parse()
+'''
+def parse_text(parser, text, jobs=None, min_size=None):
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if min_size is None:
+        min_size = min_split_size
+    starts = [0]
+    if (len(text) >= min_size and parser.max_errors is None and
+            not parser.stream):
+        starts = split_ranges(text, jobs)
+    if len(starts) == 1:
+        return parser.parse(io.StringIO(text))
+
+    tasks = []
+    row = 0
+    for index, start in enumerate(starts):
+        if index > 0:
+            row = row + text.count('\n', starts[index - 1], start)
+        if index + 1 == len(starts):
+            tasks.append((text[start:], len(text) - start, start, row))
+            continue
+        end = starts[index + 1]
+        line_end = text.find('\n', end)
+        if line_end < 0:
+            line_end = len(text)
+        tasks.append((text[start:line_end + 1], end - start, start, row))
+
+    with multiprocessing.Pool(min(jobs, len(tasks)), start_worker,
+                              (parser.lexer.engine, parser.expressions,
+                               parser.grammar, parser.recovery)) as pool:
+        results = pool.map(parse_range, tasks, 1)
+    return merge_ranges(parser, text, results)
+
+
+'''
+This function parses a file like parse_text().
+
+:param parser: the parser whose settings are used
+:param filename: the name of the file to parse
+:param jobs: the number of worker processes; defaults to the number of cores
+:param min_size: the size of the smallest file that is split
+:returns: the ParseResult of the file
+'''
+def parse_file(parser, filename, jobs=None, min_size=None):
+    with open(filename, 'r') as input_file:
+        text = input_file.read()
+    return parse_text(parser, text, jobs, min_size)
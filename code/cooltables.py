@@ -0,0 +1,156 @@
+# This module is generated by coolcore.write_scanner_tables(), from the
+# scanner rules of coolcore; run python coolparser.py --write-tables after
+# changing them, rather than editing it.
+
+# the names of the token kinds, in the order of their codes
+token_names = (
+    'class',
+    'else',
+    'fi',
+    'if',
+    'in',
+    'inherits',
+    'isvoid',
+    'let',
+    'loop',
+    'pool',
+    'then',
+    'while',
+    'case',
+    'esac',
+    'new',
+    'of',
+    'not',
+    'true',
+    'false',
+    '{',
+    '}',
+    ':',
+    ';',
+    ',',
+    '<-',
+    '=>',
+    '@',
+    '-',
+    '/',
+    '~',
+    '<',
+    '<=',
+    '=',
+    '(',
+    ')',
+    '.',
+    '+',
+    '*',
+    '"',
+    'escaped_char',
+    'integer',
+    'type_id',
+    'obj_id',
+    'string',
+    'eof',
+)
+
+# the (token, pattern) pairs of the scanner rules, in order
+scanner_rules = (
+    ('class', '^class$'),
+    ('else', '^else$'),
+    ('fi', '^fi$'),
+    ('if', '^if$'),
+    ('in', '^in$'),
+    ('inherits', '^inherits$'),
+    ('isvoid', '^isvoid$'),
+    ('let', '^let$'),
+    ('loop', '^loop$'),
+    ('pool', '^pool$'),
+    ('then', '^then$'),
+    ('while', '^while$'),
+    ('case', '^case$'),
+    ('esac', '^esac$'),
+    ('new', '^new$'),
+    ('of', '^of$'),
+    ('not', '^not$'),
+    ('true', '^true$'),
+    ('false', '^false$'),
+    ('{', '^{$'),
+    ('}', '^}$'),
+    (':', '^:$'),
+    (';', '^;$'),
+    (',', '^,$'),
+    ('<-', '^<-$'),
+    ('=>', '^=>$'),
+    ('@', '^@$'),
+    ('-', '^-$'),
+    ('/', '^/$'),
+    ('~', '^~$'),
+    ('<', '^<$'),
+    ('<=', '^<=$'),
+    ('=', '^=$'),
+    ('(', '^\\($'),
+    (')', '^\\)$'),
+    ('.', '^\\.$'),
+    ('+', '^\\+$'),
+    ('*', '^\\*$'),
+    ('"', '^\\"$'),
+    ('escaped_char', '^\\\\.$'),
+    ('integer', '^[0-9]+$'),
+    ('type_id', '^[A-Z]\\w*$'),
+    ('obj_id', '^[a-z]\\w*$'),
+    ('char', '^.$'),
+    ('error', '.*'),
+)
+
+# the pattern that takes the place of the char rule when lexemes are matched to
+# tokens, which identifies strings
+string_rule = '^".*"$'
+
+# the combined pattern of the master scanner engine
+scanner_pattern = (
+    '(?P<string>"(?:\\\\\\S|\\\\(?!\\S)|[^"\\\\\\n])*")|(?P<identifier>[A-'
+    'Za-z]\\w*)|(?P<integer>[0-9]+)|(?P<escaped_char>\\\\\\S)|(?P<lin'
+    'e_comment>--[^\\n]*)|(?P<comment>\\(\\*)|(?P<symbol><\\-|=>|<=)|'
+    '(?P<char>\\S)'
+)
+
+# the lexemes that match a fixed rule, mapped to their tokens
+fixed_tokens = {
+    'class': 'class',
+    'else': 'else',
+    'fi': 'fi',
+    'if': 'if',
+    'in': 'in',
+    'inherits': 'inherits',
+    'isvoid': 'isvoid',
+    'let': 'let',
+    'loop': 'loop',
+    'pool': 'pool',
+    'then': 'then',
+    'while': 'while',
+    'case': 'case',
+    'esac': 'esac',
+    'new': 'new',
+    'of': 'of',
+    'not': 'not',
+    'true': 'true',
+    'false': 'false',
+    '{': '{',
+    '}': '}',
+    ':': ':',
+    ';': ';',
+    ',': ',',
+    '<-': '<-',
+    '=>': '=>',
+    '@': '@',
+    '-': '-',
+    '/': '/',
+    '~': '~',
+    '<': '<',
+    '<=': '<=',
+    '=': '=',
+    '(': '(',
+    ')': ')',
+    '.': '.',
+    '+': '+',
+    '*': '*',
+    '"': '"',
+}
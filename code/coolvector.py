@@ -0,0 +1,453 @@
+import itertools
+import re
+
+import numpy
+
+import coolparser
+import cooltables
+
+# the classes of characters, as found by the lookup table
+space_class = 0
+newline_class = 1
+letter_class = 2
+digit_class = 3
+# the other characters that continue identifiers: underscores, and letters and
+# digits outside of ASCII
+word_class = 4
+# any other character that is not a whitespace, which starts a symbol or is a
+# lexeme on its own
+operator_class = 5
+# the characters that start the lexemes found by span_pattern
+quote_class = 6
+backslash_class = 7
+# the tokens of the lexemes that are not fixed ones, by their kind
+default_tokens = ['error', 'type_id', 'obj_id', 'integer', 'escaped_char',
+                  'string']
+# the kinds of the tokens that keep their lexeme as their value
+valued_kinds = [coolparser.kind_codes[token]
+                for token in ['type_id', 'obj_id', 'integer', 'string']]
+# the size of the blocks in which the input file is read, in characters
+block_size = 64 * 1024
+
+# the symbols of two characters, as (first, second) pairs of code points; the
+# scanner has no longer symbols
+symbol_pairs = [(ord(symbol[0]), ord(symbol[1]))
+                for symbol in cooltables.fixed_tokens
+                if len(symbol) == 2 and not symbol.isalpha()]
+
+
+'''
+This function finds the regular expression of a rule of the scanner pattern.
+
+:param name: the name of the rule
+:returns: the regular expression of the rule, as a named group
+'''
+def get_rule(name):
+    pattern = cooltables.scanner_pattern
+    start = pattern.index('(?P<' + name + '>')
+    depth = 0
+    position = start
+    while True:
+        character = pattern[position]
+        if character == '\\':
+            position = position + 1
+        elif character == '(':
+            depth = depth + 1
+        elif character == ')':
+            depth = depth - 1
+            if depth == 0:
+                return pattern[start:position + 1]
+        position = position + 1
+
+
+# the lexemes that can only be found from left to right, which start with a
+# quotation mark or a backslash: strings, escaped characters, and lone
+# quotation marks and backslashes; the comments are found along with them, and
+# so are the arrows, which are only matched such that the '-' they end with
+# does not start a line comment
+span_pattern = re.compile(get_rule('string') + '|' + get_rule('escaped_char') +
+                          '|["\\\\]|(?P<arrow><-)|' +
+                          get_rule('line_comment') + '|' + get_rule('comment'))
+
+
+'''
+This function gives the class of a character.
+
+:param character: the character
+:returns: the class of the character
+'''
+def classify_character(character):
+    if character == '\n':
+        return newline_class
+    if character == '"':
+        return quote_class
+    if character == '\\':
+        return backslash_class
+    if character.isspace():
+        return space_class
+    if 'A' <= character <= 'Z' or 'a' <= character <= 'z':
+        return letter_class
+    if '0' <= character <= '9':
+        return digit_class
+    # the \w class of the scanner pattern
+    if character.isalnum() or character == '_':
+        return word_class
+    return operator_class
+
+
+# the class of every ASCII character
+ascii_classes = numpy.array([classify_character(chr(code))
+                             for code in range(128)], dtype=numpy.uint8)
+
+
+'''
+This function loads a block of text as an array of its code points, with a
+byte per character when the block is ASCII, as it usually is.
+
+:param block: the text
+:returns: the array of the code points of the characters of the block
+'''
+def load_codes(block):
+    try:
+        return numpy.frombuffer(block.encode('ascii'), dtype=numpy.uint8)
+    except UnicodeEncodeError:
+        return numpy.frombuffer(block.encode('utf-32-le'), dtype=numpy.uint32)
+
+
+'''
+This function classifies every character of a block at once, with the lookup
+table for ASCII characters, and classify_character() for every distinct
+character outside of ASCII.
+
+:param codes: the code points of the characters of the block
+:returns: the array of the classes of the characters
+'''
+def classify_codes(codes):
+    if codes.dtype == numpy.uint8:
+        return ascii_classes[codes]
+    high = codes >= 128
+    classes = ascii_classes[numpy.where(high, 0, codes)]
+    if high.any():
+        distinct, inverse = numpy.unique(codes[high], return_inverse=True)
+        classes[high] = numpy.array([classify_character(chr(code))
+                                     for code in distinct.tolist()],
+                                    dtype=numpy.uint8)[inverse]
+    return classes
+
+
+'''
+This function reads the input file in blocks of whole lines, and produces the
+same lines as coolparser.read_lines(), except that many of them come at once.
+The start of every line is found from the newlines of the block, with a single
+search of its code points.
+
+:param input_file: the input file
+:param starts: the list to which the line start offsets are appended
+:param size: the number of characters read at a time
+:returns: a generator of (offset, block) pairs, where every block holds whole
+          lines, with their newline characters
+'''
+def read_blocks(input_file, starts, size=None):
+    if size is None:
+        size = block_size
+    offset = 0
+    # the pieces of the last line read, which may continue in the next block
+    pieces = []
+    ended = True
+    while True:
+        data = input_file.read(size)
+        if not data:
+            break
+        cut = data.rfind('\n') + 1
+        if cut == 0:
+            pieces.append(data)
+            continue
+        pieces.append(data[:cut])
+        block = ''.join(pieces)
+        pieces = [data[cut:]]
+        newlines = numpy.flatnonzero(load_codes(block) == 10)
+        starts.append(offset)
+        starts.extend((newlines[:-1] + (offset + 1)).tolist())
+        yield offset, block
+        offset = offset + len(block)
+    pending = ''.join(pieces)
+    if pending:
+        newlines = numpy.flatnonzero(load_codes(pending) == 10)
+        starts.append(offset)
+        starts.extend((newlines + (offset + 1)).tolist())
+        yield offset, pending
+        offset = offset + len(pending)
+        ended = False
+    # an empty file, or one that ends with a newline, has an empty last line
+    if not starts or ended:
+        starts.append(offset)
+
+
+'''
+This function marks the characters covered by the given spans of a block.
+
+:param span_starts: the offsets of the first characters of the spans
+:param span_ends: the offsets just after the spans
+:param count: the number of characters of the block
+:returns: the array telling whether every character of the block is covered
+'''
+def cover(span_starts, span_ends, count):
+    depth = numpy.zeros(count + 1, dtype=numpy.int8)
+    depth[span_starts] = 1
+    depth[span_ends] -= 1
+    return numpy.cumsum(depth[:-1], dtype=numpy.int8) > 0
+
+
+'''
+This function finds the lexemes of a block with vectorised operations. Only the
+lexemes that start with a quotation mark or a backslash are found by a regular
+expression, since escaped characters can only be told apart from left to
+right; they are few, and no other lexeme holds those characters, so they are
+found first, along with the comments, and the rest of the block is split
+around them:
+- every run of word characters holds integers (digits), and characters that are
+  lexemes on their own (underscores, and letters and digits outside of ASCII),
+  up to its first ASCII letter, from which on it is an identifier
+- every other character is a lexeme on its own, unless it starts a symbol of
+  two characters, and does not end the symbol started by the character before
+  it
+These are the lexemes that the scanner pattern finds, from the left, so the
+lexemes, their tokens and their offsets are those of Lexer.split_master().
+Block comments are skipped by coolparser.skip_comment(), and may continue in
+the next block.
+
+:param block: the text of the block, made of whole lines
+:param fixed_tokens: the lexemes that match a fixed scanner rule, and their
+                     tokens
+:param depth: the number of block comments open at the start of the block
+:returns: a (lexemes, tokens, starts, ends, lines, depth, opened) tuple, with
+          the lists of the lexemes and their tokens, the arrays of their
+          offsets, of the offsets just after them and of the line starts, in
+          the block, the number of block comments open at the end of the
+          block, and the offset of the outermost comment opened in the block
+          that the block ends in, or None
+'''
+def find_lexemes(block, fixed_tokens, depth=0):
+    codes = load_codes(block)
+    count = len(codes)
+    empty = numpy.zeros(0, dtype=numpy.int64)
+    if count == 0:
+        return [], [], empty, empty, empty, depth, None
+    classes = classify_codes(codes)
+    lines = numpy.concatenate(
+        ([0], numpy.flatnonzero(classes == newline_class) + 1))
+
+    # the characters covered by strings and escaped characters, and by
+    # comments; the search starts over after every block comment
+    span_starts = []
+    span_ends = []
+    comment_starts = []
+    comment_ends = []
+    opened = None
+    position = 0
+    if depth:
+        depth, position = coolparser.skip_comment(block, 0, depth)
+        comment_starts.append(0)
+        comment_ends.append(position)
+    while not depth:
+        for result in span_pattern.finditer(block, position):
+            rule = result.lastgroup
+            if rule == 'arrow':
+                continue
+            if rule == 'line_comment':
+                comment_starts.append(result.start())
+                comment_ends.append(result.end())
+                # only the last block of a file can end in a line comment
+                if result.end() == count:
+                    opened = result.start()
+                continue
+            if rule == 'comment':
+                comment_starts.append(result.start())
+                depth, position = coolparser.skip_comment(block, result.end(),
+                                                          1)
+                comment_ends.append(position)
+                if depth:
+                    opened = result.start()
+                break
+            span_starts.append(result.start())
+            span_ends.append(result.end())
+        else:
+            break
+    spanned = numpy.zeros(count, dtype=bool)
+    span_start = numpy.zeros(count, dtype=bool)
+    if span_starts:
+        spanned = cover(span_starts, span_ends, count)
+        span_start[span_starts] = True
+    # the characters outside of the spans and of the comments
+    free = ~spanned
+    if comment_starts:
+        free &= ~cover(comment_starts, comment_ends, count)
+
+    word = ((classes == letter_class) | (classes == digit_class) |
+            (classes == word_class)) & free
+    run_start = word.copy()
+    run_start[1:] &= ~word[:-1]
+    # the first letter of every run of word characters; the runs are reduced
+    # together with the characters after them, which are no letters
+    run_starts = numpy.flatnonzero(run_start)
+    identifier = numpy.zeros(count, dtype=bool)
+    if len(run_starts):
+        positions = numpy.arange(count)
+        letters = numpy.where(classes == letter_class, positions, count)
+        first_letters = numpy.minimum.reduceat(letters, run_starts)
+        runs = numpy.maximum(numpy.cumsum(run_start) - 1, 0)
+        identifier = word & (positions >= first_letters[runs])
+    digit = word & (classes == digit_class) & ~identifier
+
+    # a character continues the lexeme of the character before it
+    continued = numpy.zeros(count, dtype=bool)
+    continued[1:] = ((identifier[1:] & identifier[:-1]) |
+                     (digit[1:] & digit[:-1]) |
+                     (spanned[1:] & ~span_start[1:]))
+    operator = (classes == operator_class) & free
+    pairs = numpy.zeros(count, dtype=bool)
+    for first, second in symbol_pairs:
+        pairs[:-1] |= (codes[:-1] == first) & (codes[1:] == second)
+    pairs[:-1] &= operator[:-1] & operator[1:]
+    # a symbol cannot start on the second character of another one
+    for position in (numpy.flatnonzero(pairs[1:] & pairs[:-1]) + 1).tolist():
+        if pairs[position - 1]:
+            pairs[position] = False
+    continued[1:] |= pairs[:-1]
+
+    lexeme = word | operator | spanned
+    following = numpy.zeros(count, dtype=bool)
+    following[:-1] = continued[1:]
+    starts = numpy.flatnonzero(lexeme & ~continued)
+    ends = numpy.flatnonzero(lexeme & ~following) + 1
+    # the token of every lexeme that is not a fixed one follows from the class
+    # of its first character
+    firsts = classes[starts]
+    long = ends - starts > 1
+    kinds = numpy.where(firsts == digit_class, 3, 0)
+    kinds[firsts == letter_class] = 2
+    kinds[(firsts == letter_class) & (codes[starts] >= 65) &
+          (codes[starts] <= 90)] = 1
+    kinds[(firsts == backslash_class) & long] = 4
+    strings = numpy.flatnonzero((firsts == quote_class) & long)
+    kinds[strings] = 5
+    defaults = [default_tokens[kind] for kind in kinds.tolist()]
+    lexemes = [block[start:end] for start, end in zip(starts.tolist(),
+                                                      ends.tolist())]
+    tokens = list(map(fixed_tokens.get, lexemes, defaults))
+    for index in strings.tolist():
+        lexemes[index] = ''.join(lexemes[index].split())
+    return lexemes, tokens, starts, ends, lines, depth, opened
+
+
+'''
+This function splits the blocks of a file into lexemes (see find_lexemes()). A
+block comment that is still open at the end of the file becomes a lexeme of its
+own, as in Lexer.split_master().
+
+:param blocks: the (offset, block) pairs of the input file
+:param fixed_tokens: the lexemes that match a fixed scanner rule, and their
+                     tokens
+:returns: a generator of (lexeme, token, offset, end) tuples
+'''
+def split_blocks(blocks, fixed_tokens):
+    depth = 0
+    # the offset of the outermost block comment open, and of the end of the
+    # file
+    comment = None
+    end = 0
+    for offset, block in blocks:
+        lexemes, tokens, starts, ends, lines, depth, opened = find_lexemes(
+            block, fixed_tokens, depth)
+        if opened is not None:
+            comment = offset + opened
+        yield from zip(lexemes, tokens, (starts + offset).tolist(),
+                       (ends + offset).tolist())
+        end = offset + len(block)
+    if depth:
+        yield '(*', 'comment', comment, end
+
+
+'''
+This function matches the lexemes of the blocks of a file to tokens, as
+Lexer.match_lexemes() does, but finds the row, the column and the kind of every
+lexeme of a block at once. The lexical errors are added to the lexer, including
+that of a block comment left open at the end of the file.
+
+:param lexer: the lexer scanning the file
+:param blocks: the (offset, block) pairs of the input file
+:param keep_lines: whether to keep the start of every line in line_starts; if
+                   False, only the starts of the last few lines are kept
+:returns: a generator of (kind, row, column, value, offset) records, ending with
+          the EOF record
+'''
+def match_blocks(lexer, blocks, keep_lines=True):
+    kind_codes = coolparser.kind_codes
+    starts = lexer.line_starts
+    # the row of the first line of the block
+    row = 1
+    # the end of the last lexeme, and its coordinates
+    end = 0
+    eof_coordinate = None
+    found_tokens = False
+    # the number of block comments open, and the offset and the coordinates of
+    # the outermost one
+    depth = 0
+    comment = None
+    comment_coordinate = None
+
+    for offset, block in blocks:
+        lexemes, tokens, begins, ends, lines, depth, opened = find_lexemes(
+            block, lexer.fixed_tokens, depth)
+        if opened is not None:
+            comment = offset + opened
+            comment_row = int(numpy.searchsorted(lines, opened,
+                                                 side='right')) - 1
+            comment_coordinate = (row + comment_row,
+                                  opened - int(lines[comment_row]) + 1)
+        elif not depth:
+            comment = None
+        if lexemes:
+            rows = numpy.searchsorted(lines, begins, side='right') - 1
+            columns = begins - lines[rows] + 1
+            rows = rows + row
+            end = offset + int(ends[-1])
+            eof_coordinate = (int(rows[-1]),
+                              int(columns[-1] + ends[-1] - begins[-1]))
+            kinds = numpy.array(list(map(kind_codes.get, tokens,
+                                         itertools.repeat(-1, len(tokens)))))
+            values = numpy.array(lexemes, dtype=object)
+            values[~numpy.isin(kinds, valued_kinds)] = None
+            errors = numpy.flatnonzero(kinds < 0)
+            if len(errors):
+                for index in errors.tolist():
+                    lexer.errors.append(
+                        'Lexical error: Unknown token \'' + lexemes[index] +
+                        '\' at position ' +
+                        str((int(rows[index]), int(columns[index]))) + '.')
+                    lexer.error_offsets.append(offset + int(begins[index]))
+                kept = kinds >= 0
+                kinds = kinds[kept]
+                rows = rows[kept]
+                columns = columns[kept]
+                values = values[kept]
+                begins = begins[kept]
+            if len(kinds):
+                found_tokens = True
+            yield from zip(kinds.tolist(), rows.tolist(), columns.tolist(),
+                           values.tolist(), (begins + offset).tolist())
+        row = row + block.count('\n')
+        if not keep_lines and len(starts) > coolparser.line_window:
+            del starts[:-coolparser.line_window]
+
+    lexer.open_comment = comment
+    # the file ends in the comment, on its last line
+    if depth:
+        lexer.errors.append('Lexical error: Unterminated comment at position ' +
+                            str(comment_coordinate) + '.')
+        lexer.error_offsets.append(comment)
+        end = offset + len(block)
+        eof_coordinate = (row, end - starts[-1] + 1)
+    if not found_tokens:
+        eof_coordinate = (0, 0)
+    yield kind_codes['eof'], eof_coordinate[0], eof_coordinate[1], None, end
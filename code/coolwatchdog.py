@@ -0,0 +1,258 @@
+import multiprocessing
+import multiprocessing.connection
+import time
+
+import coolbatch
+import coolparser
+
+# the time that a worker is given past the time limit of a file, to stop the
+# parse and report the limit itself, before the watchdog kills it
+grace_seconds = 1.0
+# the longest time that the watchdog waits for an outcome before it checks on
+# the workers again, in seconds
+poll_seconds = 0.1
+
+
+'''
+This function runs in a supervised worker process: it prepares the worker as
+coolbatch does, then parses the files that the watchdog sends it, one at a
+time, and sends back their outcomes, until it is sent None. Every file is sent
+as a (filename, text) pair, as taken by coolbatch.parse_one().
+
+:param connection: the end of the pipe between the worker and the watchdog
+                   that the worker uses
+:param arguments: the arguments of coolbatch.start_worker()
+'''
+def run_worker(connection, arguments):
+    coolbatch.start_worker(*arguments)
+    while True:
+        request = connection.recv()
+        if request is None:
+            return
+        connection.send(coolbatch.parse_one(*request))
+
+
+'''
+This class is a worker process of the watchdog, along with the pipe it is sent
+files through, and the file it is parsing, if any.
+'''
+class Worker:
+    '''
+    :param arguments: the arguments of coolbatch.start_worker()
+    '''
+    def __init__(self, arguments):
+        self.connection, connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=run_worker,
+                                               args=(connection, arguments),
+                                               daemon=True)
+        self.process.start()
+        connection.close()
+        # the time at which the worker was sent the file it is parsing, as
+        # given by time.perf_counter(), or None if it is idle, and the name of
+        # the file
+        self.started = None
+        self.filename = None
+
+    '''
+    This method sends a file to the worker.
+
+    :param filename: the name of the file
+    :param text: the text of the program, if it is parsed from memory instead
+                 of from the file
+    '''
+    def send(self, filename, text=None):
+        self.filename = filename
+        self.started = time.perf_counter()
+        self.connection.send((filename, text))
+
+    '''
+    This method receives the outcome of the file the worker was parsing.
+
+    :returns: the outcome dictionary, or None if the worker died before sending
+              it
+    '''
+    def receive(self):
+        try:
+            outcome = self.connection.recv()
+        except EOFError:
+            return None
+        self.started = None
+        return outcome
+
+    '''
+    This method stops the worker: an idle worker is asked to exit, while a busy
+    one is killed at once.
+    '''
+    def stop(self):
+        if self.started is None and self.process.is_alive():
+            try:
+                self.connection.send(None)
+            except OSError:
+                pass
+            self.process.join(grace_seconds)
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+'''
+This class supervises the pool of worker processes that parse files for
+coolbatch.run_batch() and coolserver. A worker that dies (e.g. when it runs out
+of memory) gives its file a failure outcome, and is replaced by a new one,
+rather than bringing the whole pool down. Every file may also have a time
+limit. The workers check the limit themselves, and stop parsing a file that
+goes over it (see coolparser.LimitExceeded), but a worker can still get stuck
+where it does not check it, in a single long call that never returns. The
+watchdog kills any worker that has not sent back the outcome of its file by the
+time limit, plus grace_seconds, gives the file a limit outcome of its own, and
+replaces the worker too. Either way, the other files are not held up.
+'''
+class Watchdog:
+    '''
+    :param jobs: the number of worker processes
+    :param arguments: the arguments of coolbatch.start_worker(), including the
+                      limits on every file
+    :param timeout: the time that every file may take, in seconds, or None if
+                    the workers are only replaced when they die
+    '''
+    def __init__(self, jobs, arguments, timeout=None):
+        self.jobs = jobs
+        self.arguments = arguments
+        self.timeout = timeout
+        self.workers = []
+        # the number of workers killed for going over the time limit, and of
+        # workers that died by themselves
+        self.killed = 0
+        self.crashed = 0
+
+    '''
+    This method starts the workers.
+    '''
+    def start(self):
+        self.workers = [Worker(self.arguments) for index in range(self.jobs)]
+
+    '''
+    This method stops the workers, killing those that are still busy.
+    '''
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+    '''
+    This method parses the given files across the workers, and yields their
+    outcomes as soon as each file is finished, so the outcomes are not
+    necessarily in the order of the files. The workers are started first, and
+    stopped once the last outcome has been produced.
+
+    :param filenames: the names of the files to parse
+    :returns: a generator of outcome dictionaries, as returned by
+              coolbatch.parse_one()
+    '''
+    def run(self, filenames):
+        pending = iter(filenames)
+        self.start()
+        try:
+            for worker in self.workers:
+                self.assign(worker, pending)
+            while True:
+                busy = [worker for worker in self.workers
+                        if worker.started is not None]
+                if not busy:
+                    return
+                ready = multiprocessing.connection.wait(
+                    [worker.connection for worker in busy], poll_seconds)
+                for worker in busy:
+                    outcome = self.collect(worker, worker.connection in ready)
+                    if outcome is not None:
+                        yield outcome
+                for worker in self.workers:
+                    if worker.started is None:
+                        self.assign(worker, pending)
+        finally:
+            self.stop()
+
+    '''
+    This method sends the next file to an idle worker, if there is one left.
+
+    :param worker: the idle worker
+    :param pending: the iterator over the files that have not been sent yet
+    '''
+    def assign(self, worker, pending):
+        filename = next(pending, None)
+        if filename is not None:
+            worker.send(filename)
+
+    '''
+    This method gives the time left before a busy worker goes over the time
+    limit, along with the grace period.
+
+    :param worker: the busy worker
+    :returns: the time left, in seconds, or None if there is no time limit
+    '''
+    def remaining(self, worker):
+        if self.timeout is None:
+            return None
+        return max(0.0, worker.started + self.timeout + grace_seconds -
+                   time.perf_counter())
+
+    '''
+    This method collects the outcome of the file that a busy worker is parsing,
+    once the worker has sent it back, has died, or has gone over the time
+    limit; a worker that died or went over the limit is replaced.
+
+    :param worker: the busy worker
+    :param ready: whether the connection of the worker is ready to be read,
+                  which it also is once the worker has died
+    :returns: the outcome dictionary, or None if the worker is still parsing
+              the file within its time limit
+    '''
+    def collect(self, worker, ready):
+        if ready:
+            outcome = worker.receive()
+            if outcome is None:
+                outcome = self.replace(worker, False)
+            return outcome
+        if self.remaining(worker) == 0.0:
+            return self.replace(worker, True)
+        return None
+
+    '''
+    This method replaces a worker that is stuck or dead with a new one, in the
+    same place in the list of the workers, and gives the outcome of the file it
+    was parsing.
+
+    :param worker: the worker to replace
+    :param stuck: whether the worker is killed for going over the time limit,
+                  rather than having died
+    :returns: the outcome dictionary of the file of the worker
+    '''
+    def replace(self, worker, stuck):
+        filename = worker.filename
+        worker.stop()
+        if stuck:
+            self.killed = self.killed + 1
+            outcome = coolbatch.get_limit_outcome(
+                filename, coolparser.LimitExceeded('seconds', self.timeout),
+                worker.started)
+            outcome['killed'] = True
+        else:
+            self.crashed = self.crashed + 1
+            outcome = coolbatch.get_failure(
+                filename, ChildProcessError(
+                    'the worker exited with code ' +
+                    str(worker.process.exitcode)), worker.started)
+        self.workers[self.workers.index(worker)] = Worker(self.arguments)
+        return outcome
+
+    '''
+    This method gathers the metrics of the watchdog: the number of workers that
+    were killed for going over the time limit, and of those that died by
+    themselves, all of which were replaced.
+
+    :returns: the metrics dictionary
+    '''
+    def get_metrics(self):
+        return {'workers': self.jobs, 'killed': self.killed,
+                'crashed': self.crashed,
+                'restarts': self.killed + self.crashed}
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the tests live next to the parser, one directory down, and share the program
+# generator of the benchmarks
+code_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, code_directory)
+sys.path.insert(0, os.path.join(code_directory, 'benchmarks'))
@@ -0,0 +1,74 @@
+import glob
+import os
+import random
+
+import generate
+
+# the directory of the parser, one directory up
+code_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the example programs that come with the parser
+example_files = sorted(glob.glob(os.path.join(code_directory, 'cool_examples',
+                                              '*.cl')))
+# the pieces inserted into the example programs to break them
+mutation_pieces = [';', ':', ',', '(', ')', '{', '}', '<-', '=>', '.', '@',
+                   'class', 'if', 'then', 'fi', 'let', 'in', 'case', 'esac',
+                   'x', 'Int', '1', '"s"', '#', '(*', '*)', '--']
+
+
+'''
+This function reads an example program.
+
+:param filename: the name of the file
+:returns: the text of the program
+'''
+def read_program(filename):
+    with open(filename) as program_file:
+        return program_file.read()
+
+
+'''
+This function breaks a program in a few random places, by deleting a slice of
+it or inserting a piece of COOL into it.
+
+:param text: the text of the program
+:param seed: the seed of the random number generator
+:param changes: the number of places to change
+:returns: the text of the broken program
+'''
+def mutate_program(text, seed, changes=2):
+    generator = random.Random(seed)
+    for change in range(changes):
+        position = generator.randrange(len(text) + 1)
+        if generator.random() < 0.5:
+            text = text[:position] + text[position + generator.randrange(1, 8):]
+        else:
+            text = (text[:position] + ' ' + generator.choice(mutation_pieces) +
+                    ' ' + text[position:])
+    return text
+
+
+'''
+This function gathers a corpus of programs, valid and broken: the example
+programs, mutations of them, and generated programs, some of whose methods have
+errors.
+
+:param mutations: the number of mutations of every example program
+:param generated: the number of generated programs
+:returns: a list of (name, text) pairs
+'''
+def get_programs(mutations=10, generated=10):
+    programs = []
+    for filename in example_files:
+        name = os.path.basename(filename)
+        text = read_program(filename)
+        programs.append((name, text))
+        for seed in range(mutations):
+            programs.append((name + '#' + str(seed),
+                             mutate_program(text, seed)))
+    for seed in range(generated):
+        generator = generate.ProgramGenerator(seed, methods=3, depth=seed % 6,
+                                              chain=3, strings=0.2,
+                                              errors=0.3)
+        programs.append(('generated#' + str(seed),
+                         ''.join(generator.generate_classes(5))))
+    return programs
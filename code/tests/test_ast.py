@@ -0,0 +1,94 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import coolast
+import coolparser
+import programs
+
+# expressions nested far deeper than the default recursion limit, and the
+# depth of the tree each of them gives
+deep_expressions = [('(' * 3000 + '1' + ')' * 3000, 4),
+                    (' + '.join(['1'] * 3000), 3003),
+                    ('~' * 3000 + '1', 3004),
+                    ('x <- ' * 3000 + '1', 3004),
+                    ('{ ' * 3000 + '1' + '; }' * 3000, 3004),
+                    ('let x : Int <- ' * 3000 + '1 in x' * 3000, 6004),
+                    ('f(' * 3000 + ')' * 3000, 3003),
+                    ('x' + '.f()' * 3000, 3004)]
+
+
+'''
+This function parses a program with the iterative expression engine, and
+builds its tree.
+
+:param text: the text of the program
+:returns: the ParseResult of the program
+'''
+def parse_text(text):
+    parser = coolparser.Parser(expressions='iterative', build_ast=True)
+    return parser.parse(io.StringIO(text))
+
+
+'''
+This function measures the depth of a tree.
+
+:param node: the root of the tree
+:returns: the number of nodes on the longest path from the root to a leaf
+'''
+def get_depth(node):
+    depth = 0
+    stack = [(node, 1)]
+    while stack:
+        value, value_depth = stack.pop()
+        if isinstance(value, list):
+            stack.extend((item, value_depth) for item in value)
+        elif isinstance(value, coolast.Node):
+            depth = max(depth, value_depth)
+            stack.extend((getattr(value, field), value_depth + 1)
+                         for field in value.fields)
+    return depth
+
+
+@pytest.mark.parametrize('filename', programs.example_files)
+def test_encodings_agree(filename):
+    result = parse_text(programs.read_program(filename))
+    assert result.ast is not None
+    converted = coolast.to_dict(result.ast, result.tokens)
+    assert coolast.to_json(result.ast, result.tokens) == json.dumps(converted)
+    assert coolast.write_json(converted) == json.dumps(converted)
+    encoded, strings = coolast.to_array(result.ast)
+    assert (coolast.to_dict(coolast.from_array(encoded, strings),
+                            result.tokens) == converted)
+
+
+@pytest.mark.parametrize('expression, depth', deep_expressions,
+                         ids=range(len(deep_expressions)))
+def test_deep_expressions_build_trees(expression, depth):
+    result = parse_text('class Main {\n  main() : Object {\n    ' + expression +
+                        '\n  };\n};\n')
+    assert result.errors == []
+    assert get_depth(result.ast) == depth
+    text = coolast.to_json(result.ast, result.tokens)
+    assert text == coolast.write_json(coolast.to_dict(result.ast,
+                                                      result.tokens))
+    encoded, strings = coolast.to_array(result.ast)
+    assert (coolast.to_json(coolast.from_array(encoded, strings),
+                            result.tokens) == text)
+
+
+def test_parser_writes_deep_tree(tmp_path):
+    path = tmp_path / 'deep.cl'
+    path.write_text('class Main {\n  main() : Object {\n    ' +
+                    deep_expressions[0][0] + '\n  };\n};\n')
+    completed = subprocess.run(
+        [sys.executable, os.path.join(programs.code_directory, 'coolparser.py'),
+         '--expressions', 'iterative', '--ast', str(path)],
+        capture_output=True, text=True)
+    assert completed.returncode == 0
+    assert completed.stderr == ''
+    assert completed.stdout.startswith('{"node": "Program"')
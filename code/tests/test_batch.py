@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+import coolbatch
+import coolindex
+import programs
+
+
+def test_expand_paths_lists_each_file_once():
+    directory = os.path.dirname(programs.example_files[0])
+    filenames = coolbatch.expand_paths([programs.example_files[0], directory,
+                                        os.path.join(directory, '*.cl')])
+    assert filenames[0] == programs.example_files[0]
+    assert sorted(filenames) == sorted(set(filenames))
+    assert len(filenames) == len(programs.example_files)
+
+
+@pytest.mark.parametrize('path', ['missing.cl', 'missing/*.cl'])
+def test_expand_paths_reports_unmatched_path(path, tmp_path):
+    with pytest.raises(ValueError):
+        coolbatch.expand_paths([programs.example_files[0],
+                                str(tmp_path / path)])
+
+
+def test_expand_paths_reports_empty_directory(tmp_path):
+    with pytest.raises(ValueError):
+        coolbatch.expand_paths([str(tmp_path)])
+
+
+def test_batch_reports_unmatched_path(tmp_path, capsys):
+    with pytest.raises(SystemExit) as raised:
+        coolbatch.main([str(tmp_path / 'missing.cl')])
+    assert raised.value.code == 2
+    assert 'no COOL files match' in capsys.readouterr().err
+
+
+def test_index_reports_unmatched_path(tmp_path, capsys):
+    with pytest.raises(SystemExit) as raised:
+        coolindex.main(['--index', str(tmp_path / 'index.json'),
+                        str(tmp_path / 'missing.cl')])
+    assert raised.value.code == 2
+    assert 'no COOL files match' in capsys.readouterr().err
+
+
+def test_batch_survives_worker_crash(monkeypatch):
+    parse_one = coolbatch.parse_one
+
+    # the workers are forked, so they run the replaced function too
+    def crash_on_first(filename, text=None):
+        if filename == programs.example_files[0]:
+            os._exit(3)
+        return parse_one(filename, text)
+
+    monkeypatch.setattr(coolbatch, 'parse_one', crash_on_first)
+    metrics = {}
+    outcomes = list(coolbatch.run_batch(programs.example_files, jobs=1,
+                                        metrics=metrics))
+    assert (sorted(outcome['file'] for outcome in outcomes) ==
+            sorted(programs.example_files))
+    crashed = [outcome for outcome in outcomes if 'exception' in outcome]
+    assert [outcome['file'] for outcome in crashed] == [
+        programs.example_files[0]]
+    assert 'exited with code 3' in crashed[0]['exception']
+    assert metrics['crashed'] == 1
+    assert metrics['killed'] == 0
@@ -0,0 +1,37 @@
+import glob
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import coolcache
+import programs
+
+
+'''
+This function computes the cache version with a copy of the modules of the
+parser, in a new interpreter, such that edited copies can be hashed.
+
+:param directory: the directory with the copy of the modules
+:returns: the version
+'''
+def get_copied_version(directory):
+    completed = subprocess.run(
+        [sys.executable, '-c',
+         'import coolcache; print(coolcache.get_version("master"))'],
+        cwd=directory, capture_output=True, text=True, check=True,
+        env=dict(os.environ, PYTHONPATH=str(directory)))
+    return completed.stdout.strip()
+
+
+@pytest.mark.parametrize('name', coolcache.source_modules)
+def test_version_covers_module_source(name, tmp_path):
+    for filename in glob.glob(os.path.join(programs.code_directory,
+                                           'cool*.py')):
+        shutil.copy(filename, tmp_path)
+    version = get_copied_version(tmp_path)
+    with open(tmp_path / (name + '.py'), 'a') as source_file:
+        source_file.write('\n# edited\n')
+    assert get_copied_version(tmp_path) != version
@@ -0,0 +1,79 @@
+import io
+
+import pytest
+
+import coolparser
+import coolvector
+import programs
+
+# the scanning engines, as (engine, block size) pairs; the vector engine is also
+# run with tiny blocks, such that comments span many of them
+try:
+    import numpy
+except ImportError:
+    numpy = None
+needs_numpy = pytest.mark.skipif(numpy is None, reason='needs numpy')
+engines = [('master', None), ('legacy', None),
+           pytest.param('vector', None, marks=needs_numpy),
+           pytest.param('vector', 1, marks=needs_numpy),
+           pytest.param('vector', 7, marks=needs_numpy)]
+# programs with comments, along with the kinds of their tokens and their errors
+commented_programs = [
+    ('x -- comment\ny', ['obj_id', 'obj_id', 'eof'], []),
+    ('-- only a comment', ['eof'], []),
+    ('x--y\n--\nz', ['obj_id', 'obj_id', 'eof'], []),
+    ('x <- -- comment', ['obj_id', '<-', 'eof'], []),
+    ('-- a (* b\nx', ['obj_id', 'eof'], []),
+    ('x (* comment *) y', ['obj_id', 'obj_id', 'eof'], []),
+    ('x (* a (* nested *) still *) y', ['obj_id', 'obj_id', 'eof'], []),
+    ('(* a\n (* b\n *) c\n *) class', ['class', 'eof'], []),
+    ('(* -- *) x', ['obj_id', 'eof'], []),
+    ('(* a *)(* b *)c', ['obj_id', 'eof'], []),
+    ('(***) x', ['obj_id', 'eof'], []),
+    ('x *) y', ['obj_id', '*', ')', 'obj_id', 'eof'], []),
+    ('"(*" x "--" y "*)"', ['string', 'obj_id', 'string', 'obj_id', 'string',
+                            'eof'], []),
+    ('(* never closed\nx', ['eof'],
+     ['Lexical error: Unterminated comment at position (1, 1).']),
+    ('x\n  (* (* *)\ny', ['obj_id', 'eof'],
+     ['Lexical error: Unterminated comment at position (2, 3).']),
+    ('(*)', ['eof'],
+     ['Lexical error: Unterminated comment at position (1, 1).'])]
+
+
+'''
+This function scans a program.
+
+:param text: the text of the program
+:param engine: the scanning engine
+:param block_size: the size of the blocks of the vector engine, or None
+:param monkeypatch: the pytest fixture to set the block size with
+:returns: the tokens, their offsets and the lexical errors of the program
+'''
+def scan_text(text, engine, block_size, monkeypatch):
+    if block_size is not None:
+        monkeypatch.setattr(coolvector, 'block_size', block_size)
+    lexer = coolparser.Lexer(engine)
+    tokens = lexer.scan(io.StringIO(text))
+    return ([tokens[index] for index in range(len(tokens))],
+            list(tokens.offsets), lexer.errors)
+
+
+@pytest.mark.parametrize('engine, block_size', engines)
+@pytest.mark.parametrize('text, kinds, errors', commented_programs)
+def test_comments_are_skipped(text, kinds, errors, engine, block_size,
+                              monkeypatch):
+    tokens, offsets, found_errors = scan_text(text, engine, block_size,
+                                              monkeypatch)
+    assert [token[0] for token in tokens] == kinds
+    assert found_errors == errors
+    assert (tokens, offsets, found_errors) == scan_text(text, 'master', None,
+                                                        monkeypatch)
+
+
+@pytest.mark.parametrize('engine, block_size', engines)
+@pytest.mark.parametrize('name, text', programs.get_programs())
+def test_engines_agree_on_programs(name, text, engine, block_size,
+                                   monkeypatch):
+    assert (scan_text(text, engine, block_size, monkeypatch) ==
+            scan_text(text, 'master', None, monkeypatch))
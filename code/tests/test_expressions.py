@@ -0,0 +1,131 @@
+import io
+import os
+
+import pytest
+
+import coolparser
+import programs
+
+# the expression engines, which must give the same results
+engines = ['recursive', 'iterative']
+# the grammar of the table engine
+grammar_file = os.path.join(programs.code_directory, 'grammarE.txt')
+# broken expressions, each of which ends up in a method body
+broken_expressions = ['1 +', '+ 1', '(1 + 2', '1 + 2)', 'x <- ', 'x <- <- 1',
+                      'if x then 1 else 2', 'if x then 1 fi',
+                      'while x loop 1', 'while x pool', '{ 1 }', '{ 1; 2 }',
+                      '{ }', 'let in 1', 'let x : Int <- in x',
+                      'let x : Int, in x', 'case x of esac',
+                      'case x of y : Int => 1 esac', 'case x of y => 1; esac',
+                      'new', 'new x', 'x.f(1,)', 'x.f(,1)', 'x@.f()',
+                      'x@Int f()', 'f(1 2)', 'not', '~', 'isvoid', '1 < < 2',
+                      '1 = = 2', '(((1)', '((1)))', 'x.(1)', '1 * (2 + )']
+
+
+'''
+This function parses a program with the given expression engine.
+
+:param text: the text of the program
+:param engine: the expression engine
+:returns: the classes, methods and errors of the program, or the name of the
+          exception raised while parsing it
+'''
+def parse_text(text, engine):
+    parser = coolparser.Parser(expressions=engine)
+    try:
+        result = parser.parse(io.StringIO(text))
+    except Exception as exception:
+        return type(exception).__name__
+    return result.classes, result.methods, result.errors
+
+
+'''
+This function wraps an expression into a method of a class.
+
+:param expression: the text of the expression
+:returns: the text of the program
+'''
+def wrap_expression(expression):
+    return ('class Main {\n  main() : Object {\n    ' + expression +
+            '\n  };\n};\n')
+
+
+@pytest.mark.parametrize('name, text', programs.get_programs())
+def test_engines_agree_on_programs(name, text):
+    assert parse_text(text, 'iterative') == parse_text(text, 'recursive')
+
+
+@pytest.mark.parametrize('expression', broken_expressions)
+def test_engines_agree_on_broken_expressions(expression):
+    text = wrap_expression(expression)
+    iterative = parse_text(text, 'iterative')
+    assert iterative == parse_text(text, 'recursive')
+    assert iterative[2]
+
+
+@pytest.mark.parametrize('opening, closing', [('(', ')'), ('{ ', '; }'),
+                                              ('not ', ''), ('~', ''),
+                                              ('x <- ', '')])
+def test_engines_agree_on_nesting(opening, closing):
+    for depth in [1, 10, 50]:
+        text = wrap_expression(opening * depth + '1' + closing * depth)
+        assert parse_text(text, 'iterative') == parse_text(text, 'recursive')
+        text = wrap_expression(opening * depth + '1' + closing * (depth - 1))
+        assert parse_text(text, 'iterative') == parse_text(text, 'recursive')
+
+
+@pytest.mark.parametrize('expression', [
+    ' + '.join(['1'] * 20001),
+    ' < '.join(['x.f(1)'] * 20001),
+    '(' * 5000 + '1' + ')' * 5000,
+    '{ ' * 5000 + '1' + '; }' * 5000,
+    'if x then ' * 5000 + '1' + ' else 2 fi' * 5000])
+def test_iterative_engine_handles_deep_expressions(expression):
+    classes, methods, errors = parse_text(wrap_expression(expression),
+                                          'iterative')
+    assert errors == []
+    assert classes == ['Main']
+    assert methods == [['main']]
+
+
+'''
+This function parses a program within a depth limit, with the given expression
+engine, or with the parse table of the default grammar.
+
+:param text: the text of the program
+:param engine: the expression engine, or 'table'
+:param max_depth: the depth limit
+:returns: whether the program is within the limit
+'''
+def within_depth(text, engine, max_depth):
+    if engine == 'table':
+        parser = coolparser.Parser(grammar=grammar_file,
+                                   max_depth=max_depth)
+    else:
+        parser = coolparser.Parser(expressions=engine, max_depth=max_depth)
+    try:
+        parser.parse(io.StringIO(text))
+    except coolparser.LimitExceeded:
+        return False
+    return True
+
+
+@pytest.mark.parametrize('engine', engines + ['table'])
+@pytest.mark.parametrize('opening, closing', [
+    ('(', ')'), ('{ ', '; }'), ('{ 1; ', '; }'), ('f(', ')'), ('x.f(1, ', ')'),
+    ('x <- ', ''), ('if ', ' then 1 else 2 fi'), ('while 1 loop ', ' pool'),
+    ('let x : Int <- ', ' in x'), ('let x : Int in ', ''),
+    ('case 1 of x : Int => ', '; esac')])
+def test_engines_agree_on_depth(engine, opening, closing):
+    # the method body is one expression deep, and every opening nests another
+    for depth in [3, 3000]:
+        text = wrap_expression(opening * (depth - 1) + '1 + ~1' +
+                               closing * (depth - 1))
+        assert within_depth(text, engine, depth)
+        assert not within_depth(text, engine, depth - 1)
+
+
+@pytest.mark.parametrize('engine', engines + ['table'])
+def test_examples_are_within_depth(engine):
+    for filename in programs.example_files:
+        assert within_depth(programs.read_program(filename), engine, 50)
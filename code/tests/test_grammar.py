@@ -0,0 +1,63 @@
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+import coolindex
+import coolparser
+import programs
+
+# the grammar the rule methods of the parser are written from
+grammar_file = os.path.join(programs.code_directory, 'grammarE.txt')
+# a grammar that does not compile, since it uses a misspelt rule
+broken_grammar_file = os.path.join(programs.code_directory, 'grammarD.txt')
+
+
+'''
+This function parses a program, with the rule methods or the table engine.
+
+:param text: the text of the program
+:param grammar: the grammar file of the table engine, or None to use the rule
+                methods
+:param recovery: how to recover from syntax errors
+:returns: the classes, methods, errors, units and error tokens of the program,
+          or the name of the exception raised while parsing it
+'''
+def parse_text(text, grammar, recovery):
+    parser = coolparser.Parser(grammar=grammar, recovery=recovery)
+    try:
+        result = parser.parse(io.StringIO(text))
+    except Exception as exception:
+        return type(exception).__name__
+    return (result.classes, result.methods, result.errors, result.units,
+            result.error_tokens)
+
+
+@pytest.mark.parametrize('recovery', ['first', 'follow'])
+@pytest.mark.parametrize('name, text', programs.get_programs())
+def test_table_engine_agrees_with_rule_methods(name, text, recovery):
+    assert (parse_text(text, grammar_file, recovery) ==
+            parse_text(text, None, recovery))
+
+
+def test_parser_reports_broken_grammar():
+    completed = subprocess.run(
+        [sys.executable, os.path.join(programs.code_directory, 'coolparser.py'),
+         '--grammar', broken_grammar_file, programs.example_files[0]],
+        capture_output=True, text=True)
+    assert completed.returncode == 2
+    assert 'argument --grammar' in completed.stderr
+    assert 'Exprc' in completed.stderr
+    assert 'Traceback' not in completed.stderr
+
+
+@pytest.mark.parametrize('grammar', [broken_grammar_file, 'missing.txt'])
+def test_index_reports_broken_grammar(grammar, tmp_path, capsys):
+    with pytest.raises(SystemExit) as raised:
+        coolindex.main(['--grammar', grammar, '--index',
+                        str(tmp_path / 'index.json'),
+                        programs.example_files[0]])
+    assert raised.value.code == 2
+    assert 'argument --grammar' in capsys.readouterr().err
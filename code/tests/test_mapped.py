@@ -0,0 +1,53 @@
+import mmap
+
+import pytest
+
+import coolparser
+
+# the size of the mapped chunks, which is rounded up to this
+granularity = mmap.ALLOCATIONGRANULARITY
+# inputs with carriage returns, at the end of the file and at the end of chunks
+inputs = [b'', b'\r', b'\r\r\r', b'\n\r', b'\r\n\r', b'class A {};\r',
+          b'class A {};\r\n', b'class A {};\r\nclass B {};\r',
+          b'x' * (granularity - 1) + b'\r',
+          b'x' * (granularity - 1) + b'\r\n\r',
+          b'x' * (granularity - 1) + b'\r\r' + b'y' * granularity + b'\r',
+          b'class A { x : Int; };\r\n' * 1000 + b'\r',
+          b'class A { x : String <- "\xc3\xa9"; };\r' * 1000]
+
+
+'''
+This function reads a file with the given reader of the lexer.
+
+:param path: the path of the file
+:param reader: a function that reads lines like read_lines()
+:returns: the lines, and the list of the offsets at which they start
+'''
+def read_file(path, reader):
+    starts = []
+    with open(path, encoding='utf-8') as input_file:
+        lines = list(reader(input_file, starts))
+    return lines, starts
+
+
+'''
+This function scans a file, whether through a memory map or not.
+
+:param path: the path of the file
+:param mapped: whether to read the file through a memory map
+:returns: the tokens and the line starts of the file
+'''
+def scan_file(path, mapped):
+    lexer = coolparser.Lexer(mapped=mapped, chunk_size=1)
+    with open(path, encoding='utf-8') as input_file:
+        tokens = list(lexer.scan(input_file))
+    return tokens, lexer.line_starts
+
+
+@pytest.mark.parametrize('data', inputs, ids=range(len(inputs)))
+def test_mapped_reader_agrees_with_line_reader(data, tmp_path):
+    path = tmp_path / 'input.cl'
+    path.write_bytes(data)
+    assert (read_file(path, lambda input_file, starts: coolparser.read_mapped(
+        input_file, starts, 1)) == read_file(path, coolparser.read_lines))
+    assert scan_file(path, True) == scan_file(path, False)
@@ -0,0 +1,62 @@
+import io
+import os
+
+import pytest
+
+import coolparser
+import coolsplit
+import programs
+
+# the grammar of the table engine
+grammar_file = os.path.join(programs.code_directory, 'grammarE.txt')
+# a program of many classes, and one of a class with many features, both of
+# which go well past the default recursion limit if the parser recurses once
+# per class or per feature
+long_programs = [
+    ('classes',
+     ''.join('class C%d inherits IO {\n  f() : Int { 1 };\n};\n' % index
+             for index in range(3000))),
+    ('features',
+     'class A {\n' +
+     ''.join('  f%d() : Int { %d };\n  x%d : Int <- 2;\n' %
+             (index, index, index) for index in range(3000)) + '};\n')]
+
+
+'''
+This function parses a program, serially or split into ranges.
+
+:param text: the text of the program
+:param grammar: the grammar file of the table engine, or None
+:param jobs: the number of worker processes to split the program across, or
+             None to parse it serially
+:returns: the classes, methods, errors and units of the program, or the name of
+          the exception raised while parsing it
+'''
+def parse_text(text, grammar, jobs):
+    parser = coolparser.Parser(grammar=grammar)
+    try:
+        if jobs is None:
+            result = parser.parse(io.StringIO(text))
+        else:
+            result = coolsplit.parse_text(parser, text, jobs, min_size=0)
+    except Exception as exception:
+        return type(exception).__name__
+    return result.classes, result.methods, result.errors, result.units
+
+
+@pytest.mark.parametrize('grammar', [None, grammar_file])
+@pytest.mark.parametrize('stream', [False, True])
+@pytest.mark.parametrize('name, text', long_programs)
+def test_long_programs_parse_serially(name, text, stream, grammar):
+    parser = coolparser.Parser(grammar=grammar, stream=stream)
+    result = parser.parse(io.StringIO(text))
+    assert result.errors == []
+    assert len(result.classes) == text.count('class ')
+    assert sum(len(methods) for methods in result.methods) == 3000
+
+
+@pytest.mark.parametrize('grammar', [None, grammar_file])
+@pytest.mark.parametrize('name, text', long_programs + programs.get_programs(
+    mutations=3, generated=5))
+def test_split_parse_matches_serial_parse(name, text, grammar):
+    assert parse_text(text, grammar, 2) == parse_text(text, grammar, None)
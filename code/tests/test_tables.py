@@ -0,0 +1,26 @@
+import os
+
+import coolparser
+import cooltables
+import programs
+
+
+def test_tables_match_scanner_rules():
+    assert coolparser.check_scanner_tables() == []
+
+
+def test_tables_module_is_written_from_scanner_rules(tmp_path):
+    filename = str(tmp_path / 'cooltables.py')
+    coolparser.write_scanner_tables(filename)
+    with open(filename) as written_file:
+        written = written_file.read()
+    with open(os.path.join(programs.code_directory,
+                           'cooltables.py')) as tables_file:
+        assert tables_file.read() == written
+
+
+def test_stale_tables_are_reported(monkeypatch):
+    monkeypatch.setattr(cooltables, 'scanner_pattern', '(?P<eof>$)')
+    monkeypatch.delattr(cooltables, 'fixed_tokens')
+    assert coolparser.check_scanner_tables() == ['scanner_pattern',
+                                                 'fixed_tokens']